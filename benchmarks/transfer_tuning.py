@@ -0,0 +1,81 @@
+"""Measures the transfer settings of the ClientService against a local TLS stand-in server.
+
+Downloads and uploads a blob over the loopback interface with each combination
+of block size (`sendblocksize` and `recvblocksize`), `socketbuffersize` and
+`tcpnodelay` and prints the throughput in MB/s:
+
+    python benchmarks/transfer_tuning.py --size 64 --repeat 3
+
+The stand-in server (tests/standin.py) is written in Python as well. So the
+absolute numbers are limited by both ends on the same machine. Compare the
+rows with each other rather than with a real link. Needs the openssl command
+line tool for the certificate.
+"""
+import argparse
+import io
+import itertools
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tests import standin  # noqa: E402
+
+BLOCKSIZES = (8 * 1024, 64 * 1024, 256 * 1024, 1024 * 1024)
+SOCKETBUFFERSIZES = (None, 4 * 1024 * 1024)
+TCPNODELAYS = (True, False)
+
+_MB = 1024 * 1024
+
+
+def measure(server, size, repeat, blocksize, socketbuffersize, tcpnodelay):
+    """Returns the tuple (download MB/s, upload MB/s), each the best of `repeat` runs. """
+    medservice = server.client_service(sendblocksize=blocksize, recvblocksize=blocksize,
+                                       socketbuffersize=socketbuffersize, tcpnodelay=tcpnodelay)
+    medservice.select_project(1)
+    data = b'\x5a' * size
+    downloads = []
+    uploads = []
+    for _ in range(repeat):
+        sink = io.BytesIO()
+        start = time.perf_counter()
+        medservice.download_shotfile(sink, 1, 2, shotlist_id=1, stage_id=2, shot_id=3, job_id=4)
+        downloads.append(time.perf_counter() - start)
+        if len(sink.getvalue()) != size:
+            raise Exception("Download incomplete: " + str(len(sink.getvalue())) + " of " + str(size) + " bytes.")
+
+        start = time.perf_counter()
+        medservice.update_shotjob_uploadfile(1, None, False, shotlist_id=1, stage_id=2, shot_id=3, job_id=4,
+                                             data=io.BytesIO(data))
+        uploads.append(time.perf_counter() - start)
+    medservice.close()
+    return size / _MB / min(downloads), size / _MB / min(uploads)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', type=int, default=64, help="MB per transfer (default 64)")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per setting, the best counts (default 3)")
+    args = parser.parse_args()
+    size = args.size * _MB
+    blob = bytes(range(256)) * (size // 256)
+
+    with standin.StandInServer() as server:
+        server.route(r'/dl/', lambda request: (200, {'Content-Type': 'application/octet-stream'}, blob))
+        server.route(r'/uploadSP/', lambda request: (200, {}, b''))
+        print("%10s %12s %11s %15s %13s" % ('blocksize', 'socketbuffer', 'tcpnodelay', 'download MB/s',
+                                             'upload MB/s'))
+        for blocksize, socketbuffersize, tcpnodelay in itertools.product(BLOCKSIZES, SOCKETBUFFERSIZES,
+                                                                         TCPNODELAYS):
+            download, upload = measure(server, size, args.repeat, blocksize, socketbuffersize, tcpnodelay)
+            print("%10s %12s %11s %15.1f %13.1f" % (_kb(blocksize), _kb(socketbuffersize), tcpnodelay,
+                                                    download, upload))
+
+
+def _kb(size):
+    return 'default' if size is None else str(size // 1024) + ' KB'
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+"""Internal module computing checksums of uploads and downloads on the fly.
+
+The data is hashed while it passes through anyway (in the upload body and in
+the loop writing a download to disk). So verifying a transfer doesn't need a
+second pass over the file.
+
+Algorithms: If the package 'xxhash' is installed then 'xxh3_128' is the
+default and 'xxh3_64', 'xxh64' and 'xxh32' are available in addition. Otherwise
+the default is 'blake2b'. All algorithms of hashlib ('sha256', 'md5', ..) can
+be used in both cases.
+
+Manifests are plain text files with one line per file in the format of the
+coreutils tools (sha256sum, b2sum, ..):
+
+    <hex digest>  <relative path with forward slashes>
+
+A manifest belongs next to the file or folder it describes and is named like it
+plus the extension '.<algorithm>' (for example "shot010.mov.blake2b").
+"""
+import hashlib
+import os
+
+try:
+    import xxhash
+except ImportError:  # optional dependency
+    xxhash = None
+
+__author__ = 'Michael Krotky'
+
+_XXHASH_ALGORITHMS = ('xxh3_128', 'xxh3_64', 'xxh64', 'xxh32')
+
+
+def default_algorithm():
+    return 'xxh3_128' if xxhash is not None else 'blake2b'
+
+
+def algorithm_name(checksum):
+    """Returns the algorithm for the `checksum` argument of the ClientService methods (True or a name). """
+    if checksum is True:
+        return default_algorithm()
+    if checksum in _XXHASH_ALGORITHMS and xxhash is None:
+        raise ValueError("The checksum algorithm '" + checksum + "' requires the package xxhash.")
+    if checksum not in _XXHASH_ALGORITHMS and checksum not in hashlib.algorithms_available:
+        raise ValueError("Unknown checksum algorithm: " + str(checksum))
+    return checksum
+
+
+class Checksum:
+    """Checksum of a single transfer. """
+
+    def __init__(self, checksum):
+        """`checksum` - True for the default algorithm or the name of an algorithm. """
+        self.algorithm = algorithm_name(checksum)
+        self._hasher = self._new_hasher()
+
+    def update(self, data):
+        self._hasher.update(data)
+
+    def restart(self):
+        """Discards the data hashed so far (the transfer is started again). """
+        self._hasher = self._new_hasher()
+
+    def hexdigest(self):
+        return self._hasher.hexdigest()
+
+    def wrap(self, body):
+        """Returns the upload `body` feeding this checksum with everything that is sent.
+
+        Bytes-like objects and containers are hashed right away because they
+        might be sent more than once (see '_transfer.ReplayableBody'). File
+        objects are hashed while they are read and iterators while they are
+        consumed.
+        """
+        if body is None:
+            return body
+        if isinstance(body, str):
+            self.update(body.encode('UTF-8'))
+            return body
+        if isinstance(body, (bytes, bytearray, memoryview)):
+            self.update(body)
+            return body
+        if hasattr(body, 'read'):
+            return HashingReader(body, self)
+        if iter(body) is body:
+            return self._hashed_chunks(body)
+        for chunk in body:
+            self.update(chunk)
+        return body
+
+    def _hashed_chunks(self, chunks):
+        for chunk in chunks:
+            self.update(chunk)
+            yield chunk
+
+    def _new_hasher(self):
+        if self.algorithm in _XXHASH_ALGORITHMS:
+            return getattr(xxhash, self.algorithm)()
+        return hashlib.new(self.algorithm)
+
+
+class HashingReader:
+    """Wraps a binary file object. Everything read is fed into the 'Checksum'.
+
+    Seeking back to the initial position (done before an upload is sent again)
+    restarts the checksum.
+    """
+
+    def __init__(self, file, checksum):
+        self._file = file
+        self._checksum = checksum
+        self._position = None
+        try:
+            if file.seekable():
+                self._position = file.tell()
+        except (AttributeError, OSError):
+            pass
+
+    def read(self, size=-1):
+        data = self._file.read(size)
+        self._checksum.update(data)
+        return data
+
+    def seekable(self):
+        return self._position is not None
+
+    def tell(self):
+        return self._file.tell()
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence != os.SEEK_SET or offset != self._position:
+            raise OSError("A hashed upload body can only be rewound to its initial position.")
+        self._file.seek(offset)
+        self._checksum.restart()
+        return offset
+
+
+def manifest_path(path, algorithm):
+    """Returns the path of the manifest belonging to the file or folder at `path`. """
+    return os.path.abspath(path) + '.' + algorithm
+
+
+def read_manifest(path):
+    """Returns the dict {relative path: hex digest} of the manifest at `path` or an empty dict. """
+    digests = {}
+    try:
+        with open(path, 'r', encoding='UTF-8') as file:
+            for line in file:
+                line = line.rstrip('\n')
+                if '  ' in line:
+                    digest, relpath = line.split('  ', 1)
+                    digests[relpath] = digest
+    except FileNotFoundError:
+        pass
+    return digests
+
+
+def update_manifest(path, digests):
+    """Adds (or replaces) the entries of the dict {relative path: hex digest} in the manifest at `path`.
+
+    So resumed transfers complete the manifest of the interrupted ones.
+    """
+    entries = read_manifest(path)
+    entries.update(digests)
+    tmppath = path + '.tmp'
+    with open(tmppath, 'w', encoding='UTF-8') as file:
+        for relpath in sorted(entries):
+            file.write(entries[relpath] + '  ' + relpath + '\n')
+    os.replace(tmppath, path)
+
+
+def relpath_key(*elements):
+    """Returns the manifest key for the path elements relative to the manifest's folder. """
+    return '/'.join(elements)
@@ -0,0 +1,66 @@
+"""Internal module for gzip compressed request and response bodies.
+
+The 'RemoteService' asks for gzip compressed responses (Accept-Encoding) and
+decompresses them chunk by chunk while they are read. So a large JSON response
+is never held compressed and decompressed at the same time.
+
+Request bodies are only compressed if a threshold is configured because the
+server has to support compressed requests (Content-Encoding). Only JSON bodies
+are compressed. Uploads of media files hardly get smaller.
+"""
+import gzip
+import zlib
+
+__author__ = 'Michael Krotky'
+
+GZIP = 'gzip'
+
+_LEVEL = 6  # the default of zlib. Higher levels cost much more time for a few percent.
+
+
+def is_compressible(body, contenttype):
+    """True if the request `body` is JSON that is fully in memory. """
+    return isinstance(body, (str, bytes, bytearray)) and contenttype.startswith('application/json')
+
+
+def compress(body):
+    """Returns the gzip compressed bytes of the str (UTF-8) or bytes `body`. """
+    if isinstance(body, str):
+        body = body.encode('UTF-8')
+    return gzip.compress(body, _LEVEL)
+
+
+class Decoder:
+    """Decompresses a response body chunk by chunk according to its Content-Encoding. """
+
+    def __init__(self, contentencoding):
+        """`contentencoding` (str) - value of the Content-Encoding header. None or 'identity' means uncompressed.
+
+        Raises ValueError for encodings that were not asked for.
+        """
+        contentencoding = (contentencoding or 'identity').strip().lower()
+        if contentencoding == 'identity':
+            self._decompressor = None
+        elif contentencoding in (GZIP, 'x-gzip'):
+            self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        else:
+            raise ValueError("Unsupported Content-Encoding: " + contentencoding)
+
+    @property
+    def identity(self):
+        return self._decompressor is None
+
+    def decode(self, chunk):
+        """Returns the decompressed data of the next `chunk` (may be empty). """
+        if self._decompressor is None:
+            return chunk
+        return self._decompressor.decompress(chunk)
+
+    def flush(self):
+        """Returns the remaining data at the end of the body. Raises zlib.error if the body is truncated. """
+        if self._decompressor is None:
+            return b''
+        data = self._decompressor.flush()
+        if not self._decompressor.eof:
+            raise zlib.error("The compressed response body is incomplete.")
+        return data
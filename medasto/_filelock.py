@@ -0,0 +1,121 @@
+"""Internal module providing exclusive locks on local files.
+
+The locks are advisory and work across processes. On POSIX systems fcntl.flock
+is used, on Windows msvcrt.locking. Both are part of the standard library of
+the corresponding platform.
+"""
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+__author__ = 'Michael Krotky'
+
+
+class FileLock:
+    """Exclusive lock on the file `lockpath`.
+
+    The file is created (with permissions restricted to the current user) if it
+    doesn't exist yet. It is never deleted because another process might be
+    waiting for it. The same object may be shared by several threads: they
+    wait for each other like for another process. Can be used as context manager:
+
+        with FileLock(path):
+            ..
+    """
+
+    def __init__(self, lockpath):
+        self.lockpath = lockpath
+        self._fd = None
+        self._threadlock = threading.Lock()  # the file lock is per process. So the threads take turns first.
+
+    def acquire(self, blocking=True, timeout=None):
+        """Returns True if the lock was acquired.
+
+        If `blocking` is False then the method returns False immediately if
+        another process holds the lock. If a `timeout` (seconds) is given then
+        the method gives up after that time and returns False.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        if not self._threadlock.acquire(blocking, -1 if timeout is None or not blocking else timeout):
+            return False
+        try:
+            fd = os.open(self.lockpath, os.O_RDWR | os.O_CREAT, 0o600)
+        except:
+            self._threadlock.release()
+            raise
+        try:
+            if blocking and deadline is None:
+                _lock(fd, True)
+                self._fd = fd
+                return True
+            delay = 0.005
+            while True:
+                if _lock(fd, False):
+                    self._fd = fd
+                    return True
+                if not blocking or (deadline is not None and time.monotonic() >= deadline):
+                    os.close(fd)
+                    self._threadlock.release()
+                    return False
+                time.sleep(delay)
+                delay = min(delay * 2, 0.2)
+        except:
+            os.close(fd)
+            self._threadlock.release()
+            raise
+
+    def release(self):
+        if self._fd is None:
+            return
+        fd, self._fd = self._fd, None
+        try:
+            _unlock(fd)
+        finally:
+            os.close(fd)
+            self._threadlock.release()
+
+    def is_held(self):
+        return self._fd is not None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+
+def _lock(fd, blocking):
+    """Returns True if the lock on `fd` was acquired. """
+    if fcntl is not None:
+        flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+        try:
+            fcntl.flock(fd, flags)
+            return True
+        except (BlockingIOError, InterruptedError):
+            return False
+    else:
+        mode = msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK
+        while True:
+            try:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, mode, 1)
+                return True
+            except OSError:
+                if not blocking:
+                    return False
+                # LK_LOCK gives up after 10 seconds. So keep on trying..
+
+
+def _unlock(fd):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
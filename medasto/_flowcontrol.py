@@ -0,0 +1,354 @@
+"""Internal module limiting the load a '_remoteservice.RemoteService' puts on the server.
+
+Three independent mechanisms are available. All are disabled by default:
+
+    PriorityScheduler - limits the number of connections and distributes them
+    among the priority classes constants.PRIORITY_*. Each class has a number
+    of reserved connections that only it can use. The remaining connections
+    are shared and handed out to the waiting request of the highest priority
+    first. Downloads of lower priority pause between chunks while requests
+    of higher priority are in flight.
+
+    TokenBucket - limits the number of requests per second. Short bursts up to
+    the size of the bucket are allowed.
+
+    AdaptiveConcurrencyLimit - limits the number of requests in flight at the
+    same time. The limit is adjusted the same way TCP adjusts its congestion
+    window (additive increase, multiplicative decrease): As long as the
+    responses arrive quickly the limit grows by one per round of requests. If
+    the server starts to struggle the limit is halved. The server is
+    considered struggling if a request fails with a connection error or an
+    unknown status code or if the time to the first byte of the response
+    exceeds `tolerance` times the lowest recent time to the first byte.
+
+So batch jobs using many threads settle at the concurrency the server can
+currently sustain. Threads that exceed the limit simply wait.
+
+Streamed downloads are consumed at the pace of the caller, who may send other
+requests meanwhile (for example a get_assetjob(..) per element of
+iter_asset_list(..)). Therefore a download gives its concurrency permit back
+as soon as the response headers have arrived (the time to the first byte is
+all the 'AdaptiveConcurrencyLimit' needs). And a thread that already holds a
+connection of the 'PriorityScheduler' never waits for a second one. Otherwise
+such a thread would wait for itself.
+"""
+import collections
+import threading
+import time
+from . import _transportstats
+from . import constants
+
+__author__ = 'Michael Krotky'
+
+
+class TokenBucket:
+    """Thread safe token bucket. Tokens can be requests or bytes. """
+
+    def __init__(self, rate, burst=None):
+        """
+        `rate` (float) - tokens added per second.
+
+        `burst` (float) - capacity of the bucket. Defaults to `rate` (one second worth of tokens).
+        """
+        self._lock = threading.Lock()
+        self.rate = None
+        self.burst = None
+        self.set_rate(rate, burst)
+        self._tokens = self.burst
+        self._last = time.monotonic()
+
+    def set_rate(self, rate, burst=None):
+        """Changes the rate (and burst) at runtime. Waiting threads pick up the new rate. """
+        if rate <= 0:
+            raise ValueError("The rate must be greater than 0.")
+        with self._lock:
+            self.rate = float(rate)
+            self.burst = float(burst if burst is not None else max(rate, 1))
+
+    def acquire(self, tokens=1):
+        """Blocks until the tokens are available and takes them.
+
+        Requests for more tokens than the bucket can hold wait for a full
+        bucket and leave a debt that delays the following requests.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                needed = min(tokens, self.burst)
+                if self._tokens >= needed:
+                    self._tokens -= tokens
+                    return
+                wait = (needed - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class AdaptiveConcurrencyLimit:
+    """Thread safe AIMD limit of the requests in flight. """
+
+    DECREASE_FACTOR = 0.5
+
+    def __init__(self, initial=4, minimum=1, maximum=64, tolerance=2.0, window=100):
+        """
+        `initial`, `minimum`, `maximum` (int) - start value and bounds of the limit.
+
+        `tolerance` (float) - a time to the first byte above `tolerance` times the lowest
+        of the last `window` times of the same route counts as overload. Each route has
+        its own baseline because a large list query is always slower than a small getter.
+        """
+        self.minimum = minimum
+        self.maximum = maximum
+        self.tolerance = tolerance
+        self.limit = float(initial)
+        self.inflight = 0
+        self._condition = threading.Condition()
+        self.window = window
+        self._latencies = {}  # key: route, value: deque with the last times to the first byte
+        self._lastdecrease = 0.0
+
+    def acquire(self):
+        with self._condition:
+            while self.inflight >= int(self.limit):
+                self._condition.wait()
+            self.inflight += 1
+
+    def release(self, latency, overload, route=None):
+        """
+        `latency` (float) - time to the first byte of the response or None if unknown.
+
+        `route` (str) - see _transportstats.route_of(..). The `latency` is only compared with this route.
+
+        `overload` (bool) - True if the request failed in a way that indicates an overloaded server.
+        """
+        with self._condition:
+            saturated = self.inflight >= int(self.limit)
+            self.inflight -= 1
+            now = time.monotonic()
+            if latency is not None:
+                latencies = self._latencies.get(route)
+                if latencies is None:
+                    latencies = self._latencies[route] = collections.deque(maxlen=self.window)
+                baseline = min(latencies) if len(latencies) > 0 else latency
+                latencies.append(latency)
+                if latency > baseline * self.tolerance:
+                    overload = True
+            if overload:
+                # at most one decrease per round trip. Otherwise all requests of the
+                # same round would halve the limit again and again.
+                if now - self._lastdecrease > (latency or 0.0):
+                    self.limit = max(float(self.minimum), self.limit * self.DECREASE_FACTOR)
+                    self._lastdecrease = now
+            elif saturated:
+                # only grow if the current limit is actually used
+                self.limit = min(float(self.maximum), self.limit + 1.0 / self.limit)
+            self._condition.notify_all()
+
+
+class PriorityScheduler:
+    """Thread safe distribution of a limited number of connections among the priority classes. """
+
+    PRIORITIES = (constants.PRIORITY_INTERACTIVE, constants.PRIORITY_NORMAL, constants.PRIORITY_BULK)
+    MAX_YIELD = 0.5  # seconds a download pauses at most between two chunks
+
+    def __init__(self, maxconnections, reserved=None):
+        """
+        `maxconnections` (int) - maximum number of requests in flight.
+
+        `reserved` (dict) - key: priority, value: number of connections reserved for this
+        priority. Defaults to a quarter for INTERACTIVE and NORMAL and an eighth for BULK
+        (at least one for INTERACTIVE). The defaults always leave at least one connection
+        shared. Raises ValueError if a priority would get no connection at all.
+        """
+        if maxconnections < 1:
+            raise ValueError("At least one connection is needed.")
+        if reserved is None:
+            reserved = {constants.PRIORITY_INTERACTIVE: max(1, maxconnections // 4),
+                        constants.PRIORITY_NORMAL: maxconnections // 4,
+                        constants.PRIORITY_BULK: maxconnections // 8}
+            # keep one connection shared. Otherwise the priorities without reservation could never start.
+            for priority in reversed(self.PRIORITIES):
+                if sum(reserved.values()) < maxconnections:
+                    break
+                reserved[priority] = max(0, reserved[priority] - (sum(reserved.values()) - maxconnections + 1))
+        reserved = {priority: reserved.get(priority, 0) for priority in self.PRIORITIES}
+        if sum(reserved.values()) > maxconnections:
+            raise ValueError("More connections reserved than available.")
+        if sum(reserved.values()) == maxconnections and min(reserved.values()) == 0:
+            raise ValueError("No shared connection is left for the priorities without reserved connections.")
+        self.maxconnections = maxconnections
+        self.reserved = reserved
+        self.inflight = {priority: 0 for priority in self.PRIORITIES}
+        self.waiting = {priority: 0 for priority in self.PRIORITIES}
+        self._condition = threading.Condition()
+
+    def acquire(self, priority, nested=False):
+        """Waits for a connection. `nested` (bool) - the thread already holds one. It gets another one
+        immediately (even above `maxconnections`) because it would otherwise wait for itself.
+        """
+        with self._condition:
+            if nested:
+                self.inflight[priority] += 1
+                return
+            self.waiting[priority] += 1
+            try:
+                while not self._may_start_locked(priority):
+                    self._condition.wait()
+            finally:
+                self.waiting[priority] -= 1
+                # lower priorities might have waited for this request to start
+                self._condition.notify_all()
+            self.inflight[priority] += 1
+
+    def release(self, priority):
+        with self._condition:
+            self.inflight[priority] -= 1
+            self._condition.notify_all()
+
+    def yield_to_higher(self, priority):
+        """Blocks (at most MAX_YIELD seconds) while requests of a higher priority are in flight or waiting. """
+        deadline = None
+        with self._condition:
+            while self._higher_active_locked(priority):
+                now = time.monotonic()
+                if deadline is None:
+                    deadline = now + self.MAX_YIELD
+                elif now >= deadline:
+                    return
+                self._condition.wait(deadline - now)
+
+    def _may_start_locked(self, priority):
+        if self.inflight[priority] < self.reserved[priority]:
+            return True
+        shared = self.maxconnections - sum(self.reserved.values())
+        shared_used = sum(max(0, self.inflight[p] - self.reserved[p]) for p in self.PRIORITIES)
+        if shared_used >= shared:
+            return False
+        # the shared connections go to the highest priority first
+        return not any(self.waiting[p] > 0 for p in self.PRIORITIES if p < priority)
+
+    def _higher_active_locked(self, priority):
+        return any(self.inflight[p] > 0 or self.waiting[p] > 0 for p in self.PRIORITIES if p < priority)
+
+
+class FlowController:
+    """Combines the optional limits of a RemoteService. """
+
+    def __init__(self, is_overload, ratelimiter=None, concurrencylimit=None, scheduler=None):
+        """
+        `is_overload` (callable) - returns True if the given Exception indicates an overloaded server.
+        """
+        self.ratelimiter = ratelimiter
+        self.concurrencylimit = concurrencylimit
+        self.scheduler = scheduler
+        self._is_overload = is_overload
+        self._local = threading.local()
+        self._heldlock = threading.Lock()
+        self._held = {}  # key: thread ident, value: number of connections the thread holds
+
+    @property
+    def priority(self):
+        """Priority (constants.PRIORITY_*) of the requests of the current thread. """
+        return getattr(self._local, 'priority', constants.PRIORITY_NORMAL)
+
+    @priority.setter
+    def priority(self, priority):
+        if priority not in PriorityScheduler.PRIORITIES:
+            raise ValueError("Unknown priority: " + str(priority))
+        self._local.priority = priority
+
+    def yield_to_higher(self):
+        """Called by long transfers between two chunks. See 'PriorityScheduler'. """
+        if self.scheduler is not None:
+            self.scheduler.yield_to_higher(self.priority)
+
+    def slot(self, method, url):
+        """Context manager waiting for the permission to send a request.
+
+            with flowcontroller.slot(method, url) as timing:
+                ..
+
+        Returns a new '_transportstats.RequestTiming' for the request. Its
+        time to the first byte and the raised Exception (if any) feed the
+        'AdaptiveConcurrencyLimit'. Streamed downloads call response_started()
+        of the slot once the response headers have arrived.
+        """
+        return _Slot(self, method, url)
+
+    def _hold(self, ident, delta):
+        """Adds `delta` to the connections held by the thread. Returns the number held before. """
+        with self._heldlock:
+            held = self._held.get(ident, 0)
+            if held + delta > 0:
+                self._held[ident] = held + delta
+            else:
+                self._held.pop(ident, None)
+            return held
+
+    def stats(self):
+        """Returns a dict {'rate': float or None, 'limit': int or None, 'inflight': int or None,
+        'connections': dict or None}. 'connections' maps each priority to the dict
+        {'inflight': int, 'waiting': int, 'reserved': int}.
+        """
+        limit = self.concurrencylimit
+        connections = None
+        if self.scheduler is not None:
+            with self.scheduler._condition:
+                connections = {p: {'inflight': self.scheduler.inflight[p], 'waiting': self.scheduler.waiting[p],
+                                   'reserved': self.scheduler.reserved[p]} for p in PriorityScheduler.PRIORITIES}
+        return {'rate': None if self.ratelimiter is None else self.ratelimiter.rate,
+                'limit': None if limit is None else int(limit.limit),
+                'inflight': None if limit is None else limit.inflight,
+                'connections': connections}
+
+
+class _Slot:
+
+    def __init__(self, controller, method, url):
+        self._controller = controller
+        self._method = method
+        self._url = url
+        self._timing = None
+        self._priority = controller.priority
+        self._ident = None
+        self._permit = False  # holds a permit of the 'AdaptiveConcurrencyLimit'
+
+    def __enter__(self):
+        self._ident = threading.get_ident()
+        nested = self._controller._hold(self._ident, 1) > 0
+        try:
+            if self._controller.scheduler is not None:
+                self._controller.scheduler.acquire(self._priority, nested)
+            try:
+                if self._controller.ratelimiter is not None:
+                    self._controller.ratelimiter.acquire()
+                if self._controller.concurrencylimit is not None and not nested:
+                    self._controller.concurrencylimit.acquire()
+                    self._permit = True
+            except:
+                if self._controller.scheduler is not None:
+                    self._controller.scheduler.release(self._priority)
+                raise
+        except:
+            self._controller._hold(self._ident, -1)
+            raise
+        self._timing = _transportstats.RequestTiming(self._method, self._url)
+        return self._timing
+
+    def response_started(self):
+        """Gives the concurrency permit back early. Called by streamed downloads after the response headers. """
+        self._release_permit(None)
+
+    def _release_permit(self, exc_val):
+        if self._permit:
+            self._permit = False
+            overload = exc_val is not None and self._controller._is_overload(exc_val)
+            self._controller.concurrencylimit.release(self._timing.phases.get('wait'), overload, self._timing.route)
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        try:
+            self._release_permit(exc_val)
+        finally:
+            self._controller._hold(self._ident, -1)
+            if self._controller.scheduler is not None:
+                self._controller.scheduler.release(self._priority)
@@ -0,0 +1,135 @@
+"""Internal module building the list of files and empty folders of a folder upload.
+
+The listing uses os.scandir(). The type of an entry comes with the listing and
+its size from DirEntry.stat() (free on Windows, one stat call elsewhere). The
+sibling folders of a level can be listed by a thread pool. This hides the
+latency of network filesystems where each listing or stat call is a round trip.
+
+The optional cache keeps the listing of each folder together with the
+modification time of the folder. A folder whose modification time hasn't
+changed since is not listed again. Only one stat call per folder is needed
+then. Adding, removing or renaming entries changes the modification time of
+the folder. Overwriting a file in place doesn't. So the cache is only suitable
+for trees whose files are written once (renders, caches, ..).
+
+The entries are numbered in the order of os.walk(..) (files of a folder first,
+then its subfolders). The file ids of the same unchanged tree are therefore the
+same with and without workers or cache.
+"""
+import concurrent.futures
+import os
+import threading
+import time
+
+__author__ = 'Michael Krotky'
+
+# folders modified less than this number of seconds ago are not cached. Filesystems with a coarse time
+# resolution could otherwise hide changes made right after the listing.
+_RACY_SECONDS = 2.0
+
+
+class FolderScanner:
+
+    def __init__(self, workers=None, cache=False):
+        """`workers` (int) - threads listing sibling folders. None lists in the calling thread.
+
+        `cache` (bool) - reuse the listings of unchanged folders. See the doc string of this module.
+        """
+        self.workers = workers
+        self._cache = {} if cache else None
+        self._lock = threading.Lock()
+
+    def scan(self, folderpath):
+        """Returns a tuple ( pathlist, filedict ). See ClientService._get_folder_structure(..). """
+        if not os.path.isdir(folderpath):
+            raise Exception("Given path '" + folderpath + "' does not exist or is not a folder.")
+        listings = self._list_tree(folderpath)
+
+        pathlist = []
+        filedict = {}
+        fileid = 1  # server reqires to start counting at 1 or above.
+        stack = [(folderpath, ())]
+        while stack:
+            path, elements = stack.pop()
+            listing = listings[path]
+            if listing.empty:
+                pathlist.append({'id': fileid, 'elements': elements, 'size': 0, 'isdir': True})
+                fileid += 1
+                continue
+            for name, size in listing.files:
+                pathlist.append({'id': fileid, 'elements': elements + (name,), 'size': size})
+                filedict[fileid] = os.path.join(path, name)
+                fileid += 1
+            for name in reversed(listing.subdirs):
+                stack.append((os.path.join(path, name), elements + (name,)))
+        return pathlist, filedict
+
+    def clear_cache(self):
+        if self._cache is not None:
+            with self._lock:
+                self._cache.clear()
+
+    def _list_tree(self, folderpath):
+        """Returns the dict {folder path: '_Listing'} of all folders below (and including) `folderpath`. """
+        listings = {}
+        level = [folderpath]
+        executor = None
+        if self.workers is not None and self.workers > 1:
+            executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.workers,
+                                                             thread_name_prefix='medasto-scan')
+        try:
+            while level:
+                if executor is not None and len(level) > 1:
+                    results = list(executor.map(self._list_folder, level))
+                else:
+                    results = [self._list_folder(path) for path in level]
+                nextlevel = []
+                for path, listing in zip(level, results):
+                    listings[path] = listing
+                    nextlevel.extend(os.path.join(path, name) for name in listing.subdirs)
+                level = nextlevel
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        return listings
+
+    def _list_folder(self, path):
+        if self._cache is None:
+            return _Listing.scan(path)
+        key = os.path.abspath(path)
+        mtime = os.stat(path).st_mtime_ns
+        with self._lock:
+            cached = self._cache.get(key)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        listing = _Listing.scan(path)
+        if time.time() - mtime / 1e9 > _RACY_SECONDS:
+            with self._lock:
+                self._cache[key] = (mtime, listing)
+        return listing
+
+
+class _Listing:
+    """Files (name, size) and subfolders (names) of a single folder. """
+
+    __slots__ = ('files', 'subdirs', 'empty')
+
+    def __init__(self, files, subdirs, empty):
+        self.files = files
+        self.subdirs = subdirs
+        self.empty = empty
+
+    @classmethod
+    def scan(cls, path):
+        files = []
+        subdirs = []
+        empty = True
+        with os.scandir(path) as entries:
+            for entry in entries:
+                empty = False
+                if entry.is_dir():
+                    if not entry.is_symlink():  # like os.walk(..) symbolic links to folders are not followed
+                        subdirs.append(entry.name)
+                else:
+                    files.append((entry.name, entry.stat().st_size))
+        return cls(files, subdirs, empty)
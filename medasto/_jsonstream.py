@@ -0,0 +1,117 @@
+"""Internal module decoding a JSON array incrementally from a stream of byte chunks.
+
+json.loads(..) needs the whole document as str. For a list of tens of thousands
+of shots the response bytes, the decoded str and the resulting objects are in
+memory at the same time. iter_array(..) decodes the elements of the top level
+array one after the other while the chunks arrive. Only the undecoded rest of
+the text and the current element are held.
+
+Each element is decoded with json.JSONDecoder.raw_decode(..). An element is
+only accepted if it is followed by ',' or ']' in the buffer. So a number cut
+off at the end of a chunk is never taken for the complete number.
+"""
+import codecs
+import json
+
+__author__ = 'Michael Krotky'
+
+_WHITESPACE = ' \t\n\r'
+
+
+def iter_array(chunks, object_hook=None):
+    """Generator yielding the elements of the JSON array in `chunks` (iterable of bytes-like objects, UTF-8).
+
+    `object_hook` - see json.loads(..).
+
+    Raises json.JSONDecodeError (a ValueError) if the document is not a valid array.
+    """
+    return _ArrayReader(chunks, object_hook).elements()
+
+
+class _ArrayReader:
+
+    def __init__(self, chunks, object_hook):
+        self._chunks = iter(chunks)
+        self._utf8 = codecs.getincrementaldecoder('UTF-8')()
+        self._decoder = json.JSONDecoder(object_hook=object_hook)
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+
+    def elements(self):
+        if self._next_char() != '[':
+            self._fail("Expecting '['")
+        self._pos += 1
+        if self._next_char() == ']':
+            self._pos += 1
+            self._expect_end()
+            return
+        while True:
+            yield self._decode_element()
+            char = self._next_char()
+            self._pos += 1
+            if char == ']':
+                self._expect_end()
+                return
+            if char != ',':
+                self._pos -= 1
+                self._fail("Expecting ',' delimiter")
+
+    def _decode_element(self):
+        # text needed before the next try. Grows after each failed try so long elements aren't decoded too often.
+        needed = 0
+        while True:
+            self._next_char()
+            if len(self._buffer) - self._pos >= needed or self._eof:
+                try:
+                    element, end = self._decoder.raw_decode(self._buffer, self._pos)
+                except json.JSONDecodeError:
+                    if self._eof:
+                        raise
+                    needed = 2 * (len(self._buffer) - self._pos)
+                else:
+                    if self._followed_by_delimiter(end):
+                        self._pos = end
+                        return element
+                    if self._eof:
+                        self._pos = end
+                        self._fail("Expecting ',' delimiter")
+                    needed = len(self._buffer) - self._pos + 1
+            self._read()
+
+    def _followed_by_delimiter(self, end):
+        while end < len(self._buffer):
+            if self._buffer[end] not in _WHITESPACE:
+                return self._buffer[end] in ',]'
+            end += 1
+        return False
+
+    def _next_char(self):
+        """Skips whitespace and returns the next char ('' at the end of the document). """
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buffer) or self._eof:
+                return self._buffer[self._pos:self._pos + 1]
+            self._read()
+
+    def _read(self):
+        if self._eof:
+            self._fail("Unexpected end of the document")
+        if self._pos > 0:
+            self._buffer = self._buffer[self._pos:]
+            self._pos = 0
+        for chunk in self._chunks:
+            text = self._utf8.decode(chunk)
+            if text:
+                self._buffer += text
+                return
+        self._buffer += self._utf8.decode(b'', final=True)
+        self._eof = True
+
+    def _expect_end(self):
+        if self._next_char() != '':
+            self._fail("Extra data")
+
+    def _fail(self, msg):
+        raise json.JSONDecodeError(msg, self._buffer, self._pos)
@@ -10,15 +10,28 @@ import http.client
 import logging
 import ssl
 import base64
+import contextlib
 import json
-import shutil
+import socket
 import os
+import threading
 import time
+import zlib
+from . import _compression
+from . import _flowcontrol
+from . import _revalidation
+from . import _sessioncache
+from . import _sessionkeeper
+from . import _singleflight
+from . import _transfer
+from . import _transportstats
 
 __author__ = 'Michael Krotky'
 
 LOG_LEVEL = logging.WARN
 
+DEFAULT_BLOCKSIZE = 64 * 1024
+
 
 class RemoteService:
 
@@ -26,66 +39,253 @@ class RemoteService:
     _API_CONTEXT = "api"
 
     logger = logging.getLogger(__name__)
-
-    def __init__(self, customerid, username, password, wait_after_error=10, max_tries_on_error=10):
+    _log_configured = False
+
+    def __init__(self, customerid, username, password, wait_after_error=10, max_tries_on_error=10,
+                 slow_request_threshold=None, session_cache_path=None, lazy_connect=False,
+                 keepalive_session_timeout=None, keepalive_max_idle=4 * 3600, coalesce_gets=False,
+                 max_request_rate=None, request_burst=None, adaptive_concurrency=None,
+                 max_connections=None, reserved_connections=None, max_upload_rate=None, max_download_rate=None,
+                 send_blocksize=DEFAULT_BLOCKSIZE, recv_blocksize=DEFAULT_BLOCKSIZE, socket_sndbuf=None,
+                 socket_rcvbuf=None, tcp_nodelay=True, accept_gzip=True, compress_threshold=None,
+                 conditional_gets=False):
         """
         Does not tolerate errors --> fails on the first encountered error.
 
         A connection to the Medasto Server must be available when creating an instance of this class.
+        The only exceptions are a `session_cache_path` with a cached session for the given credentials
+        (no request is sent at all) and `lazy_connect`.
+
+        `slow_request_threshold` (float) - requests taking longer than this many seconds are logged
+        with their timing breakdown. None disables the slow request log.
+
+        `session_cache_path` (str) - file for persisting the server url and the session across
+        processes. See module _sessioncache. None disables the cache.
+
+        `lazy_connect` (bool) - if True then the constructor only stores the configuration. The
+        server url lookup and the login happen with the first request or with connect().
+
+        `keepalive_session_timeout` (float) - expected idle timeout (seconds) of sessions on the server.
+        If given then a '_sessionkeeper.SessionKeeper' sends heartbeats shortly before the session
+        would expire. It stops sending them after `keepalive_max_idle` seconds without any request.
+
+        `coalesce_gets` (bool) - if True then identical GET requests of several threads that are in
+        flight at the same time are sent only once. All threads receive the same response, which
+        might have been requested before a write of the joining thread.
+
+        `max_request_rate` (float) - maximum number of requests per second. Bursts of up to
+        `request_burst` requests are allowed. None disables the rate limit. See module _flowcontrol.
+
+        `adaptive_concurrency` (int) - upper bound of an adaptive limit of the requests in flight.
+        None disables the limit. See module _flowcontrol.
+
+        `max_connections` (int) - maximum number of connections distributed among the priority
+        classes. `reserved_connections` (dict) maps priorities to their reserved connections.
+        None disables the priority scheduling. See module _flowcontrol.
+
+        `max_upload_rate`, `max_download_rate` (float) - global bandwidth limits in bytes per second
+        for the bodies of uploads and downloads. None means unlimited. See module _transfer.
+
+        `send_blocksize` (int) - bytes read from an upload body and sent at once.
+        `recv_blocksize` (int) - bytes read at once from a download (the default chunk size).
+        `socket_sndbuf`, `socket_rcvbuf` (int) - sizes of the socket buffers (SO_SNDBUF / SO_RCVBUF)
+        which are set before connecting. None leaves them to the operating system.
+        `tcp_nodelay` (bool) - disables Nagle's algorithm (TCP_NODELAY).
+
+        `accept_gzip` (bool) - asks for gzip compressed responses. See module _compression.
+        `compress_threshold` (int) - JSON request bodies of at least this many bytes are sent gzip
+        compressed. None disables the compression of requests. It is disabled automatically if the
+        server rejects a compressed body (415).
+
+        `conditional_gets` (bool) - request_json(..) revalidates cached results with the validators
+        of the previous response. See module _revalidation.
         """
 
-        # log configuration..
+        # log configuration (only once because the logger is shared by all instances)..
         self.logger.setLevel(LOG_LEVEL)
-        consoleout = logging.StreamHandler()
-        consoleout.setLevel(LOG_LEVEL)
-        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-        consoleout.setFormatter(formatter)
-        self.logger.addHandler(consoleout)
+        if not RemoteService._log_configured:
+            RemoteService._log_configured = True
+            consoleout = logging.StreamHandler()
+            consoleout.setLevel(LOG_LEVEL)
+            formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+            consoleout.setFormatter(formatter)
+            self.logger.addHandler(consoleout)
 
         self.customerid = customerid
         self.wait_after_error = wait_after_error
         self.max_tries_on_error = max_tries_on_error
         self.iscancel = False
+        self.slow_request_threshold = slow_request_threshold
+        self.transport_stats = _transportstats.TransportStats()
+        self.coalesce_gets = coalesce_gets
+        self._singleflight = _singleflight.SingleFlight()
+        self._flowcontrol = _flowcontrol.FlowController(
+            self._is_overload,
+            None if max_request_rate is None else _flowcontrol.TokenBucket(max_request_rate, request_burst),
+            None if adaptive_concurrency is None else _flowcontrol.AdaptiveConcurrencyLimit(
+                initial=min(4, adaptive_concurrency), maximum=adaptive_concurrency),
+            None if max_connections is None else _flowcontrol.PriorityScheduler(max_connections, reserved_connections))
+        self.bandwidth = _transfer.BandwidthLimits(max_upload_rate, max_download_rate)
+        self.send_blocksize = send_blocksize
+        self.recv_blocksize = recv_blocksize
+        self.tcp_nodelay = tcp_nodelay
+        self.accept_gzip = accept_gzip
+        self.compress_threshold = compress_threshold
+        self._validators = _revalidation.ValidatorCache() if conditional_gets else None
+        self._socket_options = []
+        if socket_sndbuf is not None:
+            self._socket_options.append((socket.SOL_SOCKET, socket.SO_SNDBUF, socket_sndbuf))
+        if socket_rcvbuf is not None:
+            self._socket_options.append((socket.SOL_SOCKET, socket.SO_RCVBUF, socket_rcvbuf))
 
         self._sessionid = None
         self._userid = -1
         self.current_projectid = -1
+        self.last_use_time = None  # time.monotonic() of the last request() or download() call
+        self.last_request_time = time.monotonic()  # of the last request sent to the server (incl. heartbeats)
 
         userandpassb64 = base64.b64encode((username + ":" + password).encode('UTF-8'))
         self._credentialsb64 = userandpassb64.decode(encoding='UTF-8')
 
+        self.serverurl = None
+        self._connected = False
+        self._connect_lock = threading.Lock()
+        self._sessioncache = None
+        self._serverurl_from_cache = False
+        if session_cache_path is not None:
+            self._sessioncache = _sessioncache.SessionCache(session_cache_path, customerid, self._credentialsb64)
+
+        if not lazy_connect:
+            self.connect()
+
+        self._sessionkeeper = None
+        if keepalive_session_timeout is not None:
+            self._sessionkeeper = _sessionkeeper.SessionKeeper(
+                self, keepalive_session_timeout, keepalive_max_idle)
+            self._sessionkeeper.start()
+
+    def close(self):
+        """Stops background activities like the session keeper. Never raises Exceptions.
+
+        The session on the server is not touched. It simply expires.
+        """
+        try:
+            if self._sessionkeeper is not None:
+                self._sessionkeeper.stop(timeout=5)
+        except:
+            self.logger.info("Error while closing %s.", RemoteService.__name__, exc_info=True)
+
+    def heartbeat(self):
+        """Sends a cheap authenticated request without counting as usage.
+
+        If the session has already expired then a new one is created (including the
+        selection of the current project). Connection problems are raised as
+        ConnectionMedEx without retrying.
+        """
+        self._ensure_connected()
+        try:
+            self._dorequest("project-list")
+        except PleaseAuthenticateMedEx:
+            self.logger.info("Session expired before the heartbeat. Trying to authenticate..")
+            self._reniewsession()
+
+    def connect(self):
+        """Looks up the server url and logs in unless this already happened.
+
+        Thread safe. Only the first invocation sends requests to the server. Raises
+        BadCredentialsMedEx immediately. Other login errors are logged and are
+        treated like an expired session with the next request. If the server url
+        cannot be looked up then the http.client.HTTPException is raised.
+        """
+        if self._connected:
+            return
+        with self._connect_lock:
+            if self._connected:
+                return
+            if self._sessioncache is not None and self._load_cached_session():
+                self._connected = True
+                return
+
+            self.serverurl = self._lookup_serverurl()
+            try:
+                self._login()
+            except BadCredentialsMedEx:
+                raise  # calling code must know this asap
+            except (UserSessionsExceededMedEx, ConnectionMedEx, MedastoException):
+                self.logger.warning("Recoverable error when connecting %s. Execution will continue.",
+                                    RemoteService.__name__, exc_info=True)
+            # set only now so concurrent callers wait for the login above..
+            self._connected = True
+
+    def _ensure_connected(self):
+        """Same as connect() but raises a ConnectionMedEx if the server url cannot be looked up. """
+        if self._connected:
+            return
+        try:
+            self.connect()
+        except (http.client.HTTPException, OSError) as ex:
+            raise ConnectionMedEx from ex
+
+    def _lookup_serverurl(self):
+        """Returns the server url of the customer as published on the redirect server. """
+        conn = None
         try:
             conn = http.client.HTTPConnection(self._REDIRECT_URL)
-            conn.request("GET", "/" + customerid + ".txt")
+            conn.request("GET", "/" + self.customerid + ".txt")
             res = conn.getresponse()
             content = res.read()
             contentstr = content.decode(encoding='UTF-8')
-            self.serverurl = contentstr[:contentstr.index("/")]
+            return contentstr[:contentstr.index("/")]
         except http.client.HTTPException as ex:
             print(ex)
             raise
-        else:
-            try:
-                self._login()
-            except BadCredentialsMedEx:
-                raise  # calling code must know this asap
-            except (UserSessionsExceededMedEx, ConnectionMedEx, MedastoException):
-                self.logger.logwarn("Recoverable error when instantiating class %s. Execution will continue.",
-                                    RemoteService.__name__, exc_info=True)
         finally:
             if conn is not None:
                 conn.close()
 
+    def _load_cached_session(self):
+        """Returns True if the server url and the session could be taken from the session cache. """
+        try:
+            entry = self._sessioncache.load()
+        except (OSError, ValueError):
+            self.logger.warning("Error while reading the session cache.", exc_info=True)
+            return False
+        if entry is None:
+            return False
+        self.serverurl = entry['serverurl']
+        self._sessionid = entry['sessionid']
+        self._userid = entry['userid']
+        self._serverurl_from_cache = True
+        return True
+
+    def _store_cached_session(self):
+        """Writes the current session to the session cache (if any). Never raises Exceptions. """
+        if self._sessioncache is None:
+            return
+        try:
+            self._sessioncache.store(self.serverurl, self._sessionid, self._userid)
+        except:
+            self.logger.warning("Error while writing the session cache.", exc_info=True)
+
     def _login(self):
+        timing = _transportstats.RequestTiming("GET", "login")
+        conns = None
         try:
             authvalue = "AuthRequest " + self._credentialsb64
             headers = {"Authorization": authvalue}
-            conns = self._connection()
+            conns = self._connection(timing)
+            conns.connect()
             conns.request("GET", self._relbaseurl(), headers=headers)
+            timing.lap('send')
             res = conns.getresponse()
+            timing.lap('wait')
+            res.read()
+            timing.lap('transfer')
+            timing.failed = res.status != 260
             if res.status == 260:
                 self._sessionid = res.getheader("SessionId")
                 self._userid = res.getheader("UserId")
+                self._store_cached_session()
             elif res.status == 462:
                 raise BadCredentialsMedEx
             elif res.status == 464:
@@ -100,9 +300,18 @@ class RemoteService:
         finally:
             if conns is not None:
                 conns.close()
+            self._record_timing(timing)
 
     def _reniewsession(self):
         try:
+            if self._serverurl_from_cache:
+                # the cached session was rejected. So the cached server url might be outdated as well..
+                self._serverurl_from_cache = False
+                try:
+                    self.serverurl = self._lookup_serverurl()
+                except (http.client.HTTPException, OSError):
+                    self.logger.warning("Error while looking up the server url. Keeping the cached one.",
+                                        exc_info=True)
             self._login()
 
             if self.current_projectid != -1:
@@ -117,14 +326,75 @@ class RemoteService:
             self.logger.warn("Error while creating a new session.", exc_info=True)
 
     def request(self, url, method='GET', body=None, contenttype='application/json', accept='application/json',
-                extra_headers=None, decode_response=True):
+                extra_headers=None, decode_response=True, return_meta=False):
+        """Returns the response body (str or bytes).
+
+        If `return_meta` is True then a tuple (body, dict) is returned. The dict
+        contains the 'status' and the validators 'etag' and 'lastmodified' (None
+        if missing). A 304 response (only possible for conditional requests)
+        is returned with an empty body.
+        """
+        self.last_use_time = time.monotonic()
+        if self.coalesce_gets and method == 'GET' and (body is None or isinstance(body, str)):
+            headers_key = None if extra_headers is None else tuple(sorted(extra_headers.items()))
+            # the priority is part of the key. Otherwise an interactive request could wait for a bulk one.
+            key = (self.current_projectid, url, body, contenttype, accept, headers_key, decode_response, return_meta,
+                   self._flowcontrol.priority)
+            return self._singleflight.do(key, lambda: self._request_with_retries(
+                url, method, body, contenttype, accept, extra_headers, decode_response, return_meta))
+        return self._request_with_retries(url, method, body, contenttype, accept, extra_headers, decode_response,
+                                          return_meta)
+
+    def request_json(self, url, method='GET', body=None, object_hook=None):
+        """Returns the decoded JSON response (see json.loads(..) for the `object_hook`).
+
+        With `conditional_gets` the results of GET requests are cached and
+        revalidated. The same (cached) objects are then returned as long as the
+        response doesn't change.
+        """
+        if self._validators is None or method != 'GET':
+            return json.loads(self.request(url, method, body), object_hook=object_hook)
+        key = (self.current_projectid, url, body, object_hook)
+        entry = self._validators.get(key)
+        content, meta = self.request(url, method, body, extra_headers=None if entry is None else entry.headers(),
+                                     decode_response=False, return_meta=True)
+        if meta['status'] == 304 and entry is not None:
+            self._validators.count('notmodified')
+            return entry.value
+        bodyhash = _revalidation.body_hash(content)
+        if entry is not None and entry.bodyhash == bodyhash:
+            # the server ignored the validators (or didn't send any) but nothing changed
+            self._validators.count('unchanged')
+            value = entry.value
+        else:
+            value = json.loads(content.decode(encoding='UTF-8'), object_hook=object_hook)
+        self._validators.put(key, _revalidation.Entry(meta['etag'], meta['lastmodified'], bodyhash, value))
+        return value
 
+    def conditional_stats(self):
+        """Returns {'requests': int, 'notmodified': int, 'unchanged': int, 'entries': int} or None if disabled. """
+        return None if self._validators is None else self._validators.stats()
+
+    @property
+    def coalesced_requests(self):
+        """Number of GET requests that were served by an identical request of another thread. """
+        return self._singleflight.saved
+
+    def _request_with_retries(self, url, method, body, contenttype, accept, extra_headers, decode_response,
+                              return_meta=False):
         tries = 0
         last_ex = None
+        replayable = _transfer.ReplayableBody(body)
         while (tries < self.max_tries_on_error) and (not self.iscancel):
+            if tries > 0 and not replayable.rewind():
+                # parts of the body have already been consumed and cannot be sent again
+                break
             try:
-                result = self._dorequest(url, method, body, contenttype, accept, extra_headers, decode_response)
-                return result
+                self._ensure_connected()
+                meta = {} if return_meta else None
+                result = self._dorequest(url, method, replayable.body, contenttype, accept, extra_headers,
+                                         decode_response, meta)
+                return (result, meta) if return_meta else result
 
             except PleaseAuthenticateMedEx as ex:
                 #  login + select project + try again
@@ -134,6 +404,10 @@ class RemoteService:
             except InsuffAuthMedEx as ex:
                 #  insufficient permissions for this reqeust would certainly cause the same problem again. So abort..
                 raise
+            except CompressionRefusedMedEx as ex:
+                #  the compression of requests has been disabled. So send it again uncompressed..
+                last_ex = ex
+                self.logger.warning("The server doesn't accept compressed requests. Compression disabled.")
             except ConnectionMedEx as ex:
                 #  connection related errors have a chance to recover. So give it another try..
                 last_ex = ex
@@ -157,35 +431,115 @@ class RemoteService:
             raise last_ex
 
     def _dorequest(self, url, method='GET', body=None, contenttype='application/json', accept='application/json',
-                   extra_headers=None, decode_response=True):
-        try:
-            headers = self._headers_default_and_custom(extra_headers, contenttype, accept)
-            conns = self._connection()
-            rel_url = self._relbaseurl() + url
-            conns.request(method, rel_url, body, headers)
-            res = conns.getresponse()
-            self._check_httpstatuscode(res)  # raises Exceptions
-            if decode_response:
-                return res.read().decode(encoding='UTF-8')
-            else:
-                return res.read()
+                   extra_headers=None, decode_response=True, meta=None):
+        """Sends the request once. Fills the dict `meta` (if given) with the status and the validators. """
+        with self._flowcontrol.slot(method, url) as timing:
+            conns = None
+            try:
+                headers = self._headers_default_and_custom(extra_headers, contenttype, accept)
+                conns = self._connection(timing)
+                rel_url = self._relbaseurl() + url
+                compressed = False
+                if _compression.is_compressible(body, contenttype):
+                    data = body.encode('UTF-8') if isinstance(body, str) else body
+                    logical = len(data)  # bytes, not the characters of a str
+                    threshold = self.compress_threshold
+                    if threshold is not None and logical >= threshold:
+                        body = _compression.compress(data)
+                        headers['Content-Encoding'] = _compression.GZIP
+                        compressed = True
+                    self.transport_stats.record_bytes('sent', len(body) if compressed else logical, logical)
+                elif self.bandwidth.needs_operation(_transfer.UPLOAD):
+                    # only upload payloads. JSON bodies (compressed or not) count neither against the upload
+                    # limits nor for the progress.
+                    body = _transfer.throttled_body(body, self.bandwidth.new_operation(_transfer.UPLOAD))
+                conns.connect()
+                conns.request(method, rel_url, body, headers)
+                timing.lap('send')
+                res = conns.getresponse()
+                timing.lap('wait')
+                if compressed and res.status == 415:
+                    self.compress_threshold = None
+                    raise CompressionRefusedMedEx("Unsupported Media Type (415) for a compressed request body.")
+                if meta is not None:
+                    meta.update(status=res.status, etag=res.getheader('ETag'),
+                                lastmodified=res.getheader('Last-Modified'))
+                if res.status == 304 and meta is not None:
+                    content = res.read()
+                else:
+                    self._check_httpstatuscode(res)  # raises Exceptions
+                    content = self._read_content(res)
+                timing.lap('transfer')
+                timing.failed = False
+                if decode_response:
+                    return content.decode(encoding='UTF-8')
+                else:
+                    return content
+
+            except http.client.HTTPException as ex:
+                raise ConnectionMedEx from ex
+            except zlib.error as ex:
+                raise ConnectionMedEx("Corrupt compressed response body.") from ex
+            except (ServerProcessingMedEx, PleaseAuthenticateMedEx, InsuffAuthMedEx, MedastoException):
+                raise
+            finally:
+                if conns is not None:
+                    conns.close()
+                self._record_timing(timing)
 
-        except http.client.HTTPException as ex:
-            raise ConnectionMedEx from ex
-        except (ServerProcessingMedEx, PleaseAuthenticateMedEx, InsuffAuthMedEx, MedastoException):
+    def download(self, url, filepath, method='GET', body=None, contenttype='application/json',
+                 accept='application/json, application/octet-stream', extra_headers=None, hasher=None):
+        """Downloads into a new file at `filepath`. The incomplete file is deleted on errors. """
+        file = open(filepath, 'xb')  # outside of the try block: an existing file must not be deleted
+        try:
+            with file:
+                self.download_to(url, file, method, body, contenttype, accept, extra_headers, hasher=hasher)
+        except:
+            self._removefilequietly(filepath)
             raise
-        finally:
-            if conns is not None:
-                conns.close()
 
-    def download(self, url, filepath, method='GET', body=None, contenttype='application/json',
-                 accept='application/json, application/octet-stream', extra_headers=None):
+    def download_to(self, url, fileobj, method='GET', body=None, contenttype='application/json',
+                    accept='application/json, application/octet-stream', extra_headers=None,
+                    chunksize=None, hasher=None):
+        """Writes the response body into the writable binary file object `fileobj`.
 
+        If a `hasher` (for example a '_checksum.Checksum') is given then it is
+        fed with the body while it is written.
+        """
+        with contextlib.closing(self.iter_download(url, method, body, contenttype, accept, extra_headers,
+                                                   chunksize, reusebuffer=True)) as chunks:
+            for chunk in chunks:
+                if hasher is not None:
+                    hasher.update(chunk)
+                fileobj.write(chunk)
+
+    def iter_download(self, url, method='GET', body=None, contenttype='application/json',
+                      accept='application/json, application/octet-stream', extra_headers=None,
+                      chunksize=None, reusebuffer=False):
+        """Generator yielding the response body in chunks of up to `chunksize` bytes.
+
+        If the transfer breaks off then the request is sent again and the bytes
+        that have already been yielded are skipped. So the consumer doesn't
+        notice retries. The generator occupies a connection until it is
+        exhausted or closed.
+
+        `chunksize` defaults to `recv_blocksize`. If `reusebuffer` is True then
+        the response is read into one buffer which is reused for all chunks. The
+        yielded memoryviews are only valid until the next chunk is requested.
+        """
+        if chunksize is None:
+            chunksize = self.recv_blocksize
+        self.last_use_time = time.monotonic()
+        received = 0
         tries = 0
         last_ex = None
         while (tries < self.max_tries_on_error) and (not self.iscancel):
             try:
-                self._dodownload(url, filepath, method, body, contenttype, accept, extra_headers)
+                self._ensure_connected()
+                for chunk in self._dodownload(url, method, body, contenttype, accept, extra_headers, chunksize,
+                                              received, reusebuffer):
+                    received += len(chunk)
+                    yield chunk
                 return
 
             except PleaseAuthenticateMedEx as ex:
@@ -210,39 +564,123 @@ class RemoteService:
                 raise
             finally:
                 tries += 1
-            # all other Exceptions that haven't been caught should abort immediatelly. This could be for example a
-            # filesystem IO Error which will very likely not recover the next time.
+            # all other Exceptions that haven't been caught should abort immediatelly. Errors of the consumer
+            # (for example a filesystem IO Error while writing the chunks) don't even reach this generator.
 
         # so loop finished either because self.isCancel was set to true or self.maxtriesiferror was reached.
         if last_ex is not None:
             # Giving up by rethrowing the last exception..
             raise last_ex
 
-    def _dodownload(self, url, filepath, method='GET', body=None, contenttype='application/json',
-                    accept='application/json, application/octet-stream', extra_headers=None):
-        try:
-            headers = self._headers_default_and_custom(extra_headers, contenttype, accept)
-            conns = self._connection()
-            rel_url = self._relbaseurl() + url
-            conns.request(method, rel_url, body, headers)
-            res = conns.getresponse()
-            self._check_httpstatuscode(res)  # raises Exceptions
+    def open_download(self, url, method='GET', body=None, contenttype='application/json',
+                      accept='application/json, application/octet-stream', extra_headers=None,
+                      buffersize=None):
+        """Returns a readable binary stream ('_transfer.DownloadStream') of the response body.
+
+        `buffersize` defaults to `recv_blocksize`.
+        """
+        if buffersize is None:
+            buffersize = self.recv_blocksize
+        # the stream copies each chunk before it asks for the next one. So the buffer can be reused.
+        return _transfer.DownloadStream(
+            self.iter_download(url, method, body, contenttype, accept, extra_headers, buffersize, reusebuffer=True),
+            buffersize)
+
+    def _dodownload(self, url, method, body, contenttype, accept, extra_headers, chunksize, skip, reusebuffer):
+        """Generator yielding the chunks of the (decompressed) response body. The first `skip` bytes are dropped. """
+        slot = self._flowcontrol.slot(method, url)
+        with slot as timing:
+            conns = None
+            wire = 0
+            logical = 0
             try:
-                with open(filepath, 'xb') as file:
-                    shutil.copyfileobj(res, file)
-            except:
-                self._removefilequietly(filepath)
+                headers = self._headers_default_and_custom(extra_headers, contenttype, accept)
+                conns = self._connection(timing)
+                rel_url = self._relbaseurl() + url
+                conns.connect()
+                conns.request(method, rel_url, body, headers)
+                timing.lap('send')
+                res = conns.getresponse()
+                timing.lap('wait')
+                self._check_httpstatuscode(res)  # raises Exceptions
+                # the consumer may send other requests while it reads. See module _flowcontrol.
+                slot.response_started()
+                decoder = self._decoder(res)
+                operation = self.bandwidth.new_operation(_transfer.DOWNLOAD)
+                if reusebuffer:
+                    buffer = bytearray(chunksize)
+                    view = memoryview(buffer)
+                while True:
+                    if reusebuffer:
+                        chunk = view[:res.readinto(buffer)]
+                    else:
+                        chunk = res.read(chunksize)
+                    if not chunk:
+                        chunk = decoder.flush()
+                        if not chunk:
+                            break
+                    else:
+                        operation.throttle(len(chunk))
+                        wire += len(chunk)
+                        chunk = decoder.decode(chunk)
+                    logical += len(chunk)
+                    if skip > 0:
+                        if len(chunk) <= skip:
+                            skip -= len(chunk)
+                            continue
+                        chunk = chunk[skip:]
+                        skip = 0
+                    yield chunk
+                    self._flowcontrol.yield_to_higher()
+                timing.lap('transfer')
+                timing.failed = False
+
+            except http.client.HTTPException as ex:
+                raise ConnectionMedEx from ex
+            except zlib.error as ex:
+                raise ConnectionMedEx("Corrupt compressed response body.") from ex
+            except (ServerProcessingMedEx, PleaseAuthenticateMedEx, InsuffAuthMedEx, MedastoException):
                 raise
-
-        except http.client.HTTPException as ex:
-            raise ConnectionMedEx from ex
-        except (ServerProcessingMedEx, PleaseAuthenticateMedEx, InsuffAuthMedEx, MedastoException):
-            raise
-        finally:
-            conns.close()
+            finally:
+                if conns is not None:
+                    conns.close()
+                self.transport_stats.record_bytes('received', wire, logical)
+                self._record_timing(timing)
+
+    @staticmethod
+    def _is_overload(ex):
+        """Connection problems and unknown status codes (like 503) indicate an overloaded server. """
+        return isinstance(ex, (ConnectionMedEx, ConnectionError, socket.timeout)) or type(ex) is MedastoException
+
+    def flow_stats(self):
+        return self._flowcontrol.stats()
+
+    @property
+    def priority(self):
+        """Priority (constants.PRIORITY_*) of the requests sent by the current thread. """
+        return self._flowcontrol.priority
+
+    @priority.setter
+    def priority(self, priority):
+        self._flowcontrol.priority = priority
+
+    def _record_timing(self, timing):
+        """Adds the given timing to the transport_stats and logs slow requests. Never raises Exceptions. """
+        self.last_request_time = time.monotonic()
+        try:
+            timing.finish()
+            self.transport_stats.record(timing)
+            if self.slow_request_threshold is not None and timing.phases['total'] >= self.slow_request_threshold:
+                self.logger.warning("Slow request: %s", timing)
+        except:
+            self.logger.info("Error while recording the request timing.", exc_info=True)
 
     def _headers_default_and_custom(self, custom_headers, contenttype, accept):
-        headers = {"Authorization": "Session " + self._sessionid, "Content-Type": contenttype, "Accept": accept}
+        # without a session (failed login) the server answers 460 which triggers a new login.
+        sessionid = self._sessionid if self._sessionid is not None else ""
+        headers = {"Authorization": "Session " + sessionid, "Content-Type": contenttype, "Accept": accept}
+        if self.accept_gzip:
+            headers["Accept-Encoding"] = _compression.GZIP
         if custom_headers is not None:
             headers.update(custom_headers)
         return headers
@@ -258,7 +696,7 @@ class RemoteService:
         #     464: 'HTTP_CODE_USERSESSIONS_EXCEEDED     # only possible when trying to login
         if httpresponse.status >= 299:
             if httpresponse.status == 299:
-                resbytes = httpresponse.read()
+                resbytes = self._read_content(httpresponse)
                 resstr = resbytes.decode(encoding='UTF-8')
                 resjsonobj = json.loads(resstr)
                 errormsg = resjsonobj['ERROR']
@@ -271,11 +709,39 @@ class RemoteService:
                 raise MedastoException(
                     "Bad Statuscode (" + str(httpresponse.status) + ") of http request: " + httpresponse.geturl())
 
-    def _connection(self):
+    def _read_content(self, httpresponse):
+        """Reads and decompresses the whole response body. Adds the sizes to the transport_stats. """
+        decoder = self._decoder(httpresponse)
+        if decoder.identity:
+            content = httpresponse.read()
+            wire = len(content)
+        else:
+            parts = []
+            wire = 0
+            while True:
+                chunk = httpresponse.read(self.recv_blocksize)
+                if not chunk:
+                    break
+                wire += len(chunk)
+                parts.append(decoder.decode(chunk))
+            parts.append(decoder.flush())
+            content = b''.join(parts)
+        self.transport_stats.record_bytes('received', wire, len(content))
+        return content
+
+    @staticmethod
+    def _decoder(httpresponse):
+        try:
+            return _compression.Decoder(httpresponse.getheader('Content-Encoding'))
+        except ValueError as ex:
+            raise MedastoException(str(ex)) from ex
+
+    def _connection(self, timing=None):
         context = ssl.SSLContext(ssl.PROTOCOL_TLSv1)
         context.verify_mode = ssl.CERT_NONE
         context.check_hostname = False
-        return http.client.HTTPSConnection(self.serverurl, context=context)
+        return _TimedHTTPSConnection(self.serverurl, context=context, timing=timing, blocksize=self.send_blocksize,
+                                     socket_options=self._socket_options, tcp_nodelay=self.tcp_nodelay)
 
     def _relbaseurl(self):
         return "/" + self.customerid + "/" + self._API_CONTEXT + "/"
@@ -307,6 +773,57 @@ class RemoteService:
                 self.logger.info("Error while cleaning up a file quietly.", exc_info=True)
 
 
+class _TimedHTTPSConnection(http.client.HTTPSConnection):
+    """HTTPSConnection that records the TCP connect and the TLS handshake separately.
+
+    The phases are added to the given `timing` ('_transportstats.RequestTiming').
+    The `socket_options` (tuples of level, option, value) are set before the
+    socket connects. Some of them (like the buffer sizes) have no full effect
+    afterwards.
+    """
+
+    def __init__(self, host, context=None, timing=None, blocksize=8192, socket_options=(), tcp_nodelay=True):
+        http.client.HTTPSConnection.__init__(self, host, context=context, blocksize=blocksize)
+        self._timing = timing
+        self._socket_options = socket_options
+        self._tcp_nodelay = tcp_nodelay
+        if len(socket_options) > 0:
+            self._create_connection = self._create_tuned_connection
+
+    def connect(self):
+        http.client.HTTPConnection.connect(self)  # sets TCP_NODELAY
+        if not self._tcp_nodelay:
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 0)
+        if self._timing is not None:
+            self._timing.lap('connect')
+        server_hostname = self._tunnel_host if self._tunnel_host else self.host
+        self.sock = self._context.wrap_socket(self.sock, server_hostname=server_hostname)
+        if self._timing is not None:
+            self._timing.lap('tls')
+
+    def _create_tuned_connection(self, address, timeout, source_address=None):
+        """Same as socket.create_connection(..) but sets the socket options before connecting. """
+        host, port = address
+        last_error = None
+        for family, socktype, proto, _, sockaddr in socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM):
+            sock = socket.socket(family, socktype, proto)
+            try:
+                for level, option, value in self._socket_options:
+                    sock.setsockopt(level, option, value)
+                if timeout is not socket._GLOBAL_DEFAULT_TIMEOUT:
+                    sock.settimeout(timeout)
+                if source_address:
+                    sock.bind(source_address)
+                sock.connect(sockaddr)
+                return sock
+            except OSError as ex:
+                last_error = ex
+                sock.close()
+        if last_error is not None:
+            raise last_error
+        raise OSError("getaddrinfo returned an empty list for " + str(host))
+
+
 class MedastoException(Exception):
     # Subclasses that define an __init__ must call Exception.__init__
     # or define self.args.  Otherwise, str() will fail.
@@ -333,6 +850,10 @@ class ServerProcessingMedEx(MedastoException):
     pass
 
 
+class CompressionRefusedMedEx(MedastoException):
+    pass
+
+
 class ConnectionMedEx(MedastoException):
     pass
 
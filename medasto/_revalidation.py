@@ -0,0 +1,86 @@
+"""Internal module caching the validators and decoded results of GET requests.
+
+With conditional GETs enabled the 'RemoteService' keeps the validators of each
+response (ETag, Last-Modified) together with the decoded result. The next
+request of the same url sends them back (If-None-Match, If-Modified-Since). If
+the server answers 304 (Not Modified) the cached result is returned without
+any transfer or decoding.
+
+A server that ignores the conditional headers (or doesn't send validators)
+answers with the full body again. Then the hash of the body is compared with
+the cached one and an unchanged body isn't decoded again. So the transfer
+can't be saved in that case but the decoding can.
+
+The cache holds the last `maxentries` urls (least recently used are dropped).
+The cached results are returned to all callers and must not be modified.
+"""
+import collections
+import hashlib
+import threading
+
+__author__ = 'Michael Krotky'
+
+DEFAULT_MAXENTRIES = 1024
+
+
+def body_hash(content):
+    return hashlib.blake2b(content, digest_size=16).digest()
+
+
+class Entry:
+    """Validators and decoded result of one response. """
+
+    __slots__ = ('etag', 'lastmodified', 'bodyhash', 'value')
+
+    def __init__(self, etag, lastmodified, bodyhash, value):
+        self.etag = etag
+        self.lastmodified = lastmodified
+        self.bodyhash = bodyhash
+        self.value = value
+
+    def headers(self):
+        """Returns the conditional request headers (dict) or None if the server didn't send validators. """
+        headers = {}
+        if self.etag is not None:
+            headers['If-None-Match'] = self.etag
+        if self.lastmodified is not None:
+            headers['If-Modified-Since'] = self.lastmodified
+        return headers or None
+
+
+class ValidatorCache:
+    """Thread safe LRU cache of 'Entry' objects. """
+
+    def __init__(self, maxentries=DEFAULT_MAXENTRIES):
+        self.maxentries = maxentries
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()
+        self._counts = {'requests': 0, 'notmodified': 0, 'unchanged': 0}
+
+    def get(self, key):
+        with self._lock:
+            self._counts['requests'] += 1
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxentries:
+                self._entries.popitem(last=False)
+
+    def count(self, outcome):
+        """Counts a cache hit. `outcome` is 'notmodified' (304) or 'unchanged' (same body). """
+        with self._lock:
+            self._counts[outcome] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counts, entries=len(self._entries))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,94 @@
+"""Internal module for persisting sessions of the Medasto server on disk.
+
+Short lived scripts pay two extra round trips when a 'ClientService' is created:
+The lookup of the server url (redirect.medasto.com) and the login. If the
+'ClientService' is created with a `sessioncachepath` then the resolved server
+url and the session are stored in that file and the next process with the same
+customer id and credentials simply reuses them. Only if the server answers with
+HTTP_CODE_PLEASE_AUTHENTICATE (460) the server url is looked up again and a
+new login is performed.
+
+The cache file (and its lock file) are created with permissions for the
+current user only because a session is as good as the credentials as long as
+it is valid. All read-modify-write cycles are protected by a file lock so
+several processes can share one cache file.
+"""
+import hashlib
+import json
+import os
+import time
+from . import _filelock
+
+__author__ = 'Michael Krotky'
+
+
+class SessionCache:
+    """Reads and writes session entries of the cache file `cachepath`.
+
+    Each entry belongs to one customer id and one set of credentials. The
+    credentials themselves are never written to the file. They are only used
+    to build a hash value as key for the entry.
+    """
+
+    def __init__(self, cachepath, customerid, credentialsb64):
+        self.cachepath = cachepath
+        digest = hashlib.sha256((customerid + '\0' + credentialsb64).encode('UTF-8'))
+        self._key = digest.hexdigest()
+        self._lock = _filelock.FileLock(cachepath + '.lock')
+
+    def load(self):
+        """Returns a dict {'serverurl': str, 'sessionid': str, 'userid': str} or None. """
+        self._ensure_folder()
+        with self._lock:
+            entry = self._readall().get(self._key)
+        if entry is None or entry.get('sessionid') is None:
+            return None
+        return entry
+
+    def store(self, serverurl, sessionid, userid):
+        self._ensure_folder()
+        with self._lock:
+            entries = self._readall()
+            entries[self._key] = {'serverurl': serverurl, 'sessionid': sessionid, 'userid': userid,
+                                  'saved': int(time.time())}
+            self._writeall(entries)
+
+    def remove(self):
+        self._ensure_folder()
+        with self._lock:
+            entries = self._readall()
+            if entries.pop(self._key, None) is not None:
+                self._writeall(entries)
+
+    def _readall(self):
+        try:
+            with open(self.cachepath, 'r', encoding='UTF-8') as file:
+                entries = json.load(file)
+        except FileNotFoundError:
+            return {}
+        except ValueError:
+            # A corrupt cache file is not worth an error. The sessions are simply created again.
+            return {}
+        if not isinstance(entries, dict):
+            return {}
+        return entries
+
+    def _writeall(self, entries):
+        """Replaces the cache file atomically. Must be called while holding the lock. """
+        tmppath = self.cachepath + '.' + str(os.getpid()) + '.tmp'
+        fd = os.open(tmppath, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            with os.fdopen(fd, 'w', encoding='UTF-8') as file:
+                json.dump(entries, file)
+            os.replace(tmppath, self.cachepath)
+        except:
+            try:
+                os.remove(tmppath)
+            except OSError:
+                pass
+            raise
+
+    def _ensure_folder(self):
+        folderpath = os.path.dirname(os.path.abspath(self.cachepath))
+        if not os.path.isdir(folderpath):
+            os.makedirs(folderpath, mode=0o700)
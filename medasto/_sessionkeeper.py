@@ -0,0 +1,74 @@
+"""Internal module keeping the session of a '_remoteservice.RemoteService' alive.
+
+The Medasto server invalidates a session if it doesn't receive any request for
+a while. The next service method call then has to login again and select the
+current project before the actual request can be sent. Interactive tools which
+are idle most of the time pay this latency over and over.
+
+The 'SessionKeeper' is a daemon thread which sends a cheap authenticated request
+(a heartbeat) shortly before the session would expire. If the session has
+expired anyway (for example because the machine was suspended) the heartbeat
+renews it in the background so the next real call doesn't have to.
+
+Heartbeats are only sent as long as the service is actually used. If no service
+method has been called for `max_idle` seconds the keeper backs off and lets the
+session expire. It resumes as soon as the service is used again.
+"""
+import threading
+import time
+
+__author__ = 'Michael Krotky'
+
+
+class SessionKeeper(threading.Thread):
+
+    HEARTBEAT_RATIO = 0.9  # heartbeat after this fraction of the session timeout has passed without requests
+    MIN_WAIT = 1.0  # seconds
+
+    def __init__(self, remoteservice, session_timeout, max_idle):
+        """
+        `remoteservice` ('_remoteservice.RemoteService') - the service whose session is kept alive.
+
+        `session_timeout` (float) - seconds after which the server invalidates an unused session.
+
+        `max_idle` (float) - seconds without any service method call after which no more
+        heartbeats are sent.
+        """
+        threading.Thread.__init__(self, name='medasto-sessionkeeper', daemon=True)
+        self._remoteservice = remoteservice
+        self.interval = session_timeout * self.HEARTBEAT_RATIO
+        self.max_idle = max_idle
+        self._stopevent = threading.Event()
+        self.heartbeats = 0
+
+    def stop(self, timeout=None):
+        """Stops the thread and waits up to `timeout` seconds for it to finish. """
+        self._stopevent.set()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(timeout)
+
+    def run(self):
+        wait = self.interval
+        failures = 0
+        while not self._stopevent.wait(wait):
+            rs = self._remoteservice
+            now = time.monotonic()
+            if rs.last_use_time is None or now - rs.last_use_time > self.max_idle:
+                # never used or idle for a long time: let the session expire
+                wait = self.interval
+                continue
+            since_request = now - rs.last_request_time
+            if since_request < self.interval:
+                wait = max(self.interval - since_request, self.MIN_WAIT)
+                continue
+            try:
+                rs.heartbeat()
+            except Exception:
+                failures += 1
+                rs.logger.info("Heartbeat failed.", exc_info=True)
+                # back off exponentially but never wait longer than the regular interval
+                wait = min(self.MIN_WAIT * (2 ** failures), self.interval)
+            else:
+                failures = 0
+                self.heartbeats += 1
+                wait = self.interval
@@ -0,0 +1,57 @@
+"""Internal module for collapsing identical concurrent calls into one.
+
+If several threads invoke SingleFlight.do(..) with the same key at the same
+time then only the first one (the leader) executes the function. All others
+wait for it and receive the same result (or the same Exception).
+"""
+import threading
+
+__author__ = 'Michael Krotky'
+
+
+class SingleFlight:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}  # key: call key, value: _Call
+        self.saved = 0  # number of calls that were served by the call of another thread
+
+    def do(self, key, func):
+        """Returns the result of func() or of an identical call already in flight.
+
+        `key` must be hashable.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.saved += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+        except BaseException as ex:
+            call.error = ex
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+
+class _Call:
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
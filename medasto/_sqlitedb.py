@@ -0,0 +1,36 @@
+"""Internal module with the SQLite helpers of the upload journal and the upload queue.
+
+Each operation opens its own connection. So the databases can be shared by
+threads and processes. SQLite serializes the writes.
+"""
+import sqlite3
+
+__author__ = 'Michael Krotky'
+
+TIMEOUT = 30.0  # seconds to wait for a write lock of another process
+
+
+class Connection:
+    """Context manager returning a new sqlite3 connection. Commits (or rolls back) and closes on exit.
+
+    `immediate` (bool) - if True then the write lock is taken right away. So
+    read-modify-write cycles of several processes cannot interleave.
+    """
+
+    def __init__(self, path, immediate=False):
+        self._connection = sqlite3.connect(path, timeout=TIMEOUT)
+        self._connection.execute("PRAGMA foreign_keys = ON")
+        if immediate:
+            self._connection.execute("BEGIN IMMEDIATE")
+
+    def __enter__(self):
+        return self._connection
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        try:
+            if exc_type is None:
+                self._connection.commit()
+            else:
+                self._connection.rollback()
+        finally:
+            self._connection.close()
@@ -0,0 +1,251 @@
+"""Internal module for the bodies of uploads and downloads.
+
+Upload bodies can be str, bytes-like objects, binary file objects or iterables
+of bytes-like objects (sent with chunked transfer encoding). 'ReplayableBody'
+prepares them for being sent again after a failed try.
+
+Bandwidth shaping
+
+A 'BandwidthLimits' instance belongs to a '_remoteservice.RemoteService'. It
+holds one global 'TokenBucket' per direction (shared by all threads) and
+optional limits per operation which are set for the current thread only (see
+ClientService.bandwidth(..)). Each operation (a single upload or download) then
+gets its own bucket with that rate. JSON request bodies are not uploads in this
+sense. They are neither throttled nor reported as progress.
+
+The buckets are consulted for every chunk. So changing the limits at runtime
+also affects transfers that are already running. The size of a bucket (the
+burst) allows short bursts above the rate, for example small uploads that
+fit into the bucket completely.
+
+The same per chunk hook reports the progress: A callback set for the current
+thread (see ClientService.progress(..)) is called with the direction and the
+number of bytes of each chunk after the buckets granted it.
+"""
+import io
+import threading
+from . import _flowcontrol
+
+__author__ = 'Michael Krotky'
+
+UPLOAD = 'upload'
+DOWNLOAD = 'download'
+
+
+class BandwidthLimits:
+
+    def __init__(self, upload=None, download=None, burst=None):
+        """`upload`, `download` (float) - global limits in bytes per second. None means unlimited. """
+        self._lock = threading.Lock()
+        self._global = {UPLOAD: None, DOWNLOAD: None}
+        self._local = threading.local()
+        self.set_limit(UPLOAD, upload, burst)
+        self.set_limit(DOWNLOAD, download, burst)
+
+    def set_limit(self, direction, rate, burst=None):
+        """Changes the global limit of the given direction. None removes the limit. """
+        with self._lock:
+            bucket = self._global[direction]
+            if rate is None:
+                self._global[direction] = None
+            elif bucket is None:
+                self._global[direction] = _flowcontrol.TokenBucket(rate, burst)
+            else:
+                bucket.set_rate(rate, burst)
+
+    def limits(self):
+        """Returns the dict {'upload': bytes per second or None, 'download': bytes per second or None}. """
+        with self._lock:
+            return {direction: None if bucket is None else bucket.rate for direction, bucket in self._global.items()}
+
+    def set_operation_limits(self, upload, download):
+        """Sets the limits per operation for the current thread. Returns the previous ones as tuple. """
+        previous = self.operation_limits()
+        self._local.upload = upload
+        self._local.download = download
+        return previous
+
+    def operation_limits(self):
+        return getattr(self._local, 'upload', None), getattr(self._local, 'download', None)
+
+    def set_progress(self, callback):
+        """Sets the progress callback of the current thread. Returns the previous one. """
+        previous = self.progress()
+        self._local.progress = callback
+        return previous
+
+    def progress(self):
+        return getattr(self._local, 'progress', None)
+
+    def needs_operation(self, direction):
+        """True if the transfers of the current thread in `direction` have to pass a '_Operation'. """
+        upload, download = self.operation_limits()
+        return (self._global[direction] is not None or (upload if direction == UPLOAD else download) is not None
+                or self.progress() is not None)
+
+    def new_operation(self, direction):
+        """Returns a '_Operation' throttling a single transfer of the current thread. """
+        upload, download = self.operation_limits()
+        rate = upload if direction == UPLOAD else download
+        return _Operation(self, direction, None if rate is None else _flowcontrol.TokenBucket(rate), self.progress())
+
+
+class _Operation:
+
+    def __init__(self, limits, direction, bucket, progress=None):
+        self._limits = limits
+        self._direction = direction
+        self._bucket = bucket
+        self._progress = progress
+
+    def throttle(self, nbytes):
+        """Blocks until `nbytes` may be transferred. Then reports them to the progress callback (if any). """
+        if nbytes == 0:
+            return
+        globalbucket = self._limits._global[self._direction]
+        if globalbucket is not None:
+            globalbucket.acquire(nbytes)
+        if self._bucket is not None:
+            self._bucket.acquire(nbytes)
+        if self._progress is not None:
+            self._progress(self._direction, nbytes)
+
+
+class ReplayableBody:
+    """Makes an upload body resendable where possible.
+
+    Bytes-like objects and containers (lists, tuples, ..) are simply sent
+    again. Seekable file objects are rewound to their initial position. File
+    objects that cannot seek and iterators (for example generators) can only
+    be sent again as long as nothing has been consumed from them.
+    """
+
+    def __init__(self, body):
+        self.body = body
+        self._position = None
+        if body is None or isinstance(body, (str, bytes, bytearray, memoryview)):
+            return
+        if hasattr(body, 'read'):
+            try:
+                if body.seekable():
+                    self._position = body.tell()
+                    return
+            except (AttributeError, OSError):
+                pass
+            self.body = _CountingReader(body)
+        elif iter(body) is body:
+            self.body = _CountingIterator(body)
+
+    def rewind(self):
+        """Prepares the body for the next try. Returns False if it cannot be sent again. """
+        if self._position is not None:
+            self.body.seek(self._position)
+            return True
+        if isinstance(self.body, (_CountingReader, _CountingIterator)):
+            return self.body.count == 0
+        return True
+
+
+class _CountingReader:
+
+    def __init__(self, file):
+        self._file = file
+        self.count = 0
+
+    def read(self, size=-1):
+        data = self._file.read(size)
+        self.count += len(data)
+        return data
+
+
+class _CountingIterator:
+
+    def __init__(self, iterator):
+        self._iterator = iterator
+        self.count = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        chunk = next(self._iterator)
+        self.count += 1
+        return chunk
+
+
+def throttled_body(body, operation):
+    """Returns the upload `body` throttled by the given '_Operation'. str bodies are returned as they are. """
+    if hasattr(body, 'read'):
+        return ThrottledReader(body, operation)
+    if isinstance(body, (bytes, bytearray, memoryview)):
+        return _throttled_chunks(_slices(memoryview(body).cast('B'), 64 * 1024), operation)
+    if body is None or isinstance(body, str):
+        return body
+    return _throttled_chunks(body, operation)
+
+
+def _slices(view, size):
+    for start in range(0, len(view), size):
+        yield view[start:start + size]
+
+
+def _throttled_chunks(chunks, operation):
+    for chunk in chunks:
+        operation.throttle(memoryview(chunk).nbytes)
+        yield chunk
+
+
+class ThrottledReader:
+    """Wraps a binary file object. Every read(..) is throttled by the given '_Operation'. """
+
+    def __init__(self, file, operation):
+        self._file = file
+        self._operation = operation
+
+    def read(self, size=-1):
+        data = self._file.read(size)
+        self._operation.throttle(len(data))
+        return data
+
+
+class DownloadStream(io.BufferedReader):
+    """Readable binary stream over the chunks of a download (see RemoteService.iter_download(..)).
+
+    Closing the stream closes the underlying connection. iter_chunks() returns
+    the data in chunks of up to the buffer size.
+    """
+
+    def __init__(self, chunks, buffersize):
+        io.BufferedReader.__init__(self, _ChunkReader(chunks), buffersize)
+
+    def iter_chunks(self):
+        while True:
+            chunk = self.read1()
+            if not chunk:
+                return
+            yield chunk
+
+
+class _ChunkReader(io.RawIOBase):
+
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self._pending = memoryview(b'')
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if len(self._pending) == 0:
+            self._pending = memoryview(next(self._chunks, b''))
+            if len(self._pending) == 0:
+                return 0
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+    def close(self):
+        if not self.closed:
+            self._chunks.close()
+        io.RawIOBase.close(self)
@@ -0,0 +1,160 @@
+"""Internal module for recording transport timings of the remote calls.
+
+Every request that is executed by the '_remoteservice.RemoteService' is split
+into the following phases (all values in seconds):
+
+    connect  - establishing the TCP connection
+    tls      - the TLS handshake
+    send     - sending the request line, the headers and the body
+    wait     - waiting for the first byte of the response (server processing)
+    transfer - reading the response body
+    total    - sum of all the above (plus some negligible client overhead)
+
+The timings are collected per route. A route is the relative url of a request
+where all numeric path segments are replaced by '#'. So all invocations of
+for example ClientService.get_shotjob(..) end up in the same route no matter
+which shot was requested.
+
+In addition the bytes of the bodies are counted twice: as they travel over the
+wire (compressed) and as they are used by the client (logical). See module
+_compression.
+"""
+import collections
+import math
+import threading
+import time
+
+__author__ = 'Michael Krotky'
+
+PHASES = ('connect', 'tls', 'send', 'wait', 'transfer', 'total')
+
+ROUTE_ALL = '*'  # pseudo route which aggregates the timings of all routes
+
+
+def route_of(url):
+    """Returns the route (str) for the given relative `url`. """
+    segments = []
+    for segment in url.split('/'):
+        if len(segment) == 0:
+            continue
+        if segment.lstrip('-').isdigit():
+            segments.append('#')
+        else:
+            segments.append(segment)
+    return '/'.join(segments)
+
+
+class RequestTiming:
+    """Timings of a single request.
+
+    The phases are measured with lap(..). Each invocation assigns the time
+    elapsed since the previous lap (or since the creation of this object) to
+    the given phase. A request counts as failed until `failed` is explicitly
+    set to False.
+    """
+
+    def __init__(self, method, url):
+        self.method = method
+        self.route = route_of(url)
+        self.phases = {}
+        self.failed = True
+        self._start = time.perf_counter()
+        self._last = self._start
+
+    def lap(self, phase):
+        now = time.perf_counter()
+        self.phases[phase] = self.phases.get(phase, 0.0) + (now - self._last)
+        self._last = now
+
+    def finish(self):
+        self.phases['total'] = time.perf_counter() - self._start
+
+    def __str__(self):
+        parts = []
+        for phase in PHASES:
+            if phase in self.phases:
+                parts.append(phase + '=' + '{0:.3f}'.format(self.phases[phase]))
+        return self.method + ' ' + self.route + ' (' + ', '.join(parts) + ')'
+
+
+class TransportStats:
+    """Thread safe collection of rolling timing windows per route and phase.
+
+    Only the last `window` requests of each route are kept. So the percentiles
+    always reflect the recent behaviour of the connection to the server.
+    """
+
+    def __init__(self, window=500):
+        self.window = window
+        self._lock = threading.Lock()
+        self._samples = {}  # key: (route, phase), value: deque with seconds
+        self._counts = {}  # key: route, value: [requests(int), failed(int)]
+        self._bytes = {'sent': [0, 0], 'received': [0, 0]}  # value: [wire(int), logical(int)]
+
+    def record(self, timing):
+        """Adds the phases of the given 'RequestTiming' to the statistics. """
+        with self._lock:
+            for route in (timing.route, ROUTE_ALL):
+                counts = self._counts.setdefault(route, [0, 0])
+                counts[0] += 1
+                if timing.failed:
+                    counts[1] += 1
+                for phase, seconds in timing.phases.items():
+                    key = (route, phase)
+                    samples = self._samples.get(key)
+                    if samples is None:
+                        samples = collections.deque(maxlen=self.window)
+                        self._samples[key] = samples
+                    samples.append(seconds)
+
+    def record_bytes(self, direction, wire, logical):
+        """Adds the body sizes of one request. `direction` is 'sent' or 'received'. """
+        with self._lock:
+            counts = self._bytes[direction]
+            counts[0] += wire
+            counts[1] += logical
+
+    def byte_counts(self):
+        """Returns {'sent': {'wire': int, 'logical': int}, 'received': {'wire': int, 'logical': int}}. """
+        with self._lock:
+            return {direction: {'wire': counts[0], 'logical': counts[1]} for direction, counts in self._bytes.items()}
+
+    def routes(self):
+        """Returns a sorted list of all routes recorded so far (without ROUTE_ALL). """
+        with self._lock:
+            return sorted(route for route in self._counts if route != ROUTE_ALL)
+
+    def percentiles(self, route=ROUTE_ALL, quantiles=(50, 90, 99)):
+        """Returns a dict with the timings of the given `route`.
+
+        The returned dict looks like this:
+        {'requests': int, 'failed': int,
+         'connect': {'p50': seconds, 'p90': seconds, 'p99': seconds, 'max': seconds}, ..}
+
+        Phases without any samples are omitted.
+        """
+        with self._lock:
+            counts = self._counts.get(route, [0, 0])
+            result = {'requests': counts[0], 'failed': counts[1]}
+            for phase in PHASES:
+                samples = self._samples.get((route, phase))
+                if not samples:
+                    continue
+                ordered = sorted(samples)
+                dct = {}
+                for quantile in quantiles:
+                    dct['p' + str(quantile)] = _nearest_rank(ordered, quantile)
+                dct['max'] = ordered[-1]
+                result[phase] = dct
+            return result
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._counts.clear()
+            self._bytes = {'sent': [0, 0], 'received': [0, 0]}
+
+
+def _nearest_rank(ordered, quantile):
+    index = int(math.ceil(quantile / 100.0 * len(ordered))) - 1
+    return ordered[min(max(index, 0), len(ordered) - 1)]
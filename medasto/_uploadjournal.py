@@ -0,0 +1,146 @@
+"""Internal module recording running uploads in a local SQLite database.
+
+If a 'ClientService' is created with an `uploadjournalpath` then each upload of
+a file, folder or image sequence from disk is recorded before it starts and
+removed as soon as the server confirms its completion. The journal holds
+everything needed to continue an interrupted upload in another process:
+
+    file - the job (asset or shot ids), the appendage id, the local path and
+    the create_preview flag. Single files cannot be continued. They are sent
+    again if the appendage isn't online.
+
+    folder - the upload job id, the file id the server asked for last and the
+    mapping of all file ids to the relative paths sent with initFolderUpload.
+    The mapping is needed because the ids depend on the order in which the
+    folder was walked.
+
+    imageseq - the upload job id and the local folder (known as soon as
+    upload_imageseq_allfiles(..) is called).
+
+The journal can be shared by threads and processes (see '_sqlitedb').
+"""
+import json
+import os
+import sqlite3
+import time
+from . import _sqlitedb
+
+__author__ = 'Michael Krotky'
+
+KIND_FILE = 'file'
+KIND_FOLDER = 'folder'
+KIND_IMAGESEQ = 'imageseq'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS uploads (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    projectid INTEGER,
+    scope TEXT,
+    target TEXT,
+    appendage_id INTEGER,
+    localpath TEXT,
+    create_preview INTEGER,
+    uploadjob_id TEXT,
+    nextfile_id INTEGER,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS folderfiles (
+    upload_id INTEGER NOT NULL REFERENCES uploads(id) ON DELETE CASCADE,
+    file_id INTEGER NOT NULL,
+    relpath TEXT NOT NULL,
+    PRIMARY KEY (upload_id, file_id)
+);
+"""
+
+
+class UploadJournal:
+
+    def __init__(self, path):
+        self.path = path
+        folderpath = os.path.dirname(os.path.abspath(path))
+        if not os.path.isdir(folderpath):
+            os.makedirs(folderpath, mode=0o700)
+        with self._connect() as connection:
+            connection.executescript(_SCHEMA)
+
+    def begin(self, kind, projectid, appendage_id, localpath=None, scope=None, target=None, create_preview=None,
+              uploadjob_id=None, nextfile_id=None, filedict=None):
+        """Records a new upload and returns the id of the entry. Replaces older entries of the same appendage.
+
+        `target` (dict) - keyword arguments identifying the job (asset_list_id, ..).
+
+        `filedict` (dict) - folders only. key: file id, value: path relative to `localpath`.
+        """
+        now = time.time()
+        with self._connect() as connection:
+            if appendage_id is not None:
+                # an appendage has only one upload at a time. Older entries are stale (or resumed right now).
+                connection.execute("DELETE FROM uploads WHERE projectid IS ? AND appendage_id = ?",
+                                   (projectid, appendage_id))
+            cursor = connection.execute(
+                "INSERT INTO uploads (kind, projectid, scope, target, appendage_id, localpath, create_preview, "
+                "uploadjob_id, nextfile_id, created, updated) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (kind, projectid, scope, None if target is None else json.dumps(target), appendage_id,
+                 None if localpath is None else os.path.abspath(localpath),
+                 None if create_preview is None else int(create_preview),
+                 None if uploadjob_id is None else str(uploadjob_id), nextfile_id, now, now))
+            entry_id = cursor.lastrowid
+            if filedict is not None:
+                connection.executemany("INSERT INTO folderfiles (upload_id, file_id, relpath) VALUES (?, ?, ?)",
+                                       [(entry_id, fileid, relpath) for fileid, relpath in filedict.items()])
+        return entry_id
+
+    def find_uploadjob(self, uploadjob_id):
+        """Returns the id of the entry of the given upload job or None. """
+        with self._connect() as connection:
+            row = connection.execute("SELECT id FROM uploads WHERE uploadjob_id = ?",
+                                     (str(uploadjob_id),)).fetchone()
+        return None if row is None else row[0]
+
+    def set_localpath(self, entry_id, localpath):
+        self._update(entry_id, 'localpath', os.path.abspath(localpath))
+
+    def set_nextfile(self, entry_id, nextfile_id):
+        self._update(entry_id, 'nextfile_id', nextfile_id)
+
+    def finish(self, entry_id):
+        """Removes the entry. The upload is complete. """
+        with self._connect() as connection:
+            connection.execute("DELETE FROM uploads WHERE id = ?", (entry_id,))
+
+    def pending(self, projectid=None):
+        """Returns the entries (dicts) of all (or the given project's) unfinished uploads, oldest first. """
+        with self._connect() as connection:
+            connection.row_factory = sqlite3.Row
+            if projectid is None:
+                rows = connection.execute("SELECT * FROM uploads ORDER BY id").fetchall()
+            else:
+                rows = connection.execute("SELECT * FROM uploads WHERE projectid = ? ORDER BY id",
+                                          (projectid,)).fetchall()
+        entries = []
+        for row in rows:
+            entry = dict(row)
+            entry['target'] = None if entry['target'] is None else json.loads(entry['target'])
+            if entry['create_preview'] is not None:
+                entry['create_preview'] = bool(entry['create_preview'])
+            entries.append(entry)
+        return entries
+
+    def folderfiles(self, entry_id):
+        """Returns the dict {file id: relative path} of a folder upload. """
+        with self._connect() as connection:
+            rows = connection.execute("SELECT file_id, relpath FROM folderfiles WHERE upload_id = ?",
+                                      (entry_id,)).fetchall()
+        return dict(rows)
+
+    def _update(self, entry_id, column, value):
+        with self._connect() as connection:
+            connection.execute("UPDATE uploads SET " + column + " = ?, updated = ? WHERE id = ?",
+                               (value, time.time(), entry_id))
+
+    def _connect(self):
+        """Returns a new connection. Used as context manager it commits (or rolls back) and closes. """
+        return _sqlitedb.Connection(self.path)
+
@@ -39,6 +39,12 @@ obtained the instance the connection may drop without putting it in an
 inconsistent state. Of course the service won't be available until the connection
 is regained.
 
+If the instance is created at a time where the service might never be used (for
+example when a pipeline plugin is imported) then pass `lazyconnect`=True to the
+constructor. The constructor then only stores the arguments and the server is
+contacted with the first service method call. Use .connect() if you want to
+find out about connection problems or bad credentials at a certain point anyway.
+
 
 ------------ Specifying Assets, Stages and Shots as method arguments ---------
 
@@ -85,6 +91,114 @@ The service object will then continue to work with the new session. All this hap
 transparently in the background. Of course this implies that the credentials are
 kept in memory during the runtime of the script.
 
+Tools that are idle most of the time (for example GUI tools of the artists) can
+avoid the latency of a) and b) by passing the session timeout of the server (in
+seconds) as `sessionkeepalive` to the constructor. A background thread then
+sends a cheap request shortly before the session would expire. If no service
+method has been called for `keepalivemaxidle` seconds the thread stops doing so
+and lets the session expire until the instance is used again. Call .close() (or
+use the instance as context manager) when the instance is not needed anymore.
+
+
+-------------------------------- Session cache -------------------------------
+
+Creating an instance of 'ClientService' costs two round trips: The lookup of
+the server address and the login. Scripts that run only for a few seconds (for
+example on a render farm) can avoid both by passing a `sessioncachepath` to the
+constructor. The server address and the session are then stored in that file
+and the next 'ClientService' with the same customerid, username and password
+reuses them without sending any request. Only when the server rejects the
+cached session (see "Session timeout" above) the server address is looked up
+again and a new login is performed. The cache file is then updated.
+
+The file is only readable and writable by the current user and protected by a
+lock file (same path plus '.lock') so any number of processes can share it.
+Please keep in mind that all processes using the same credentials then also
+share the same session on the server. The "Concurrency" section below applies
+to them as if they were threads using the same 'ClientService' instance.
+
+
+----------------------------- Uploads from memory ----------------------------
+
+The methods uploading a single file (update_*_uploadfile(..),
+update_*_uploadpreview(..), update_stbsheet_setimage(..) and
+update_shot_addstbsheet(..)) don't require the content to be in a file. Pass
+`filepath`=None and the content as `data` instead:
+    bytes, bytearray or memoryview - sent as they are.
+    binary file object (io.BytesIO, ..) - read from its current position.
+    iterable of bytes (for example a generator) - sent with chunked transfer
+    encoding as the items arrive.
+
+If a connection problem occurs during the upload then the upload is repeated
+(see the next section). That works for bytes-like objects, lists and tuples
+and file objects that can seek (they are rewound to their initial position).
+Other file objects and iterators can only be repeated as long as nothing has
+been read from them. Otherwise the connection error is raised.
+
+
+--------------------------------- Checksums ----------------------------------
+
+The methods uploading or downloading files, folders and image sequences accept
+the argument `checksum`. Pass True (or the name of an algorithm like 'sha256')
+and the files are hashed while they are sent or written to disk. So verifying
+a transfer doesn't require reading the files a second time.
+
+The default algorithm is 'xxh3_128' if the optional package xxhash is
+installed and 'blake2b' otherwise. The methods return the hex digest (single
+files) or a dict {relative path: hex digest} (folders and image sequences) and
+write a manifest next to the file or folder, named like it plus the extension
+'.<algorithm>':
+
+    digests = medservice.download_shotfolder("/jobs/abc/sh010_comp", appendage_id, .., checksum='sha256')
+    # creates /jobs/abc/sh010_comp.sha256 which can be checked with
+    # cd /jobs/abc/sh010_comp && sha256sum -c ../sh010_comp.sha256
+
+The manifest uses the format of the coreutils tools (sha256sum, b2sum, ..).
+Resumed transfers only hash the files they actually transfer but add them to
+the existing manifest. Pass `manifest`=False if no manifest shall be written.
+
+
+------------------------------- Upload journal -------------------------------
+
+Uploads of folders and image sequences can be continued where they stopped as
+long as the upload job id is known. If the 'ClientService' is created with an
+`uploadjournalpath` then all uploads from disk are recorded in that SQLite file
+(appendage ids, upload job ids, local paths and the file ids of folders) until
+the server confirms their completion. After a crash (for example of a render
+farm node) the next process continues them:
+
+    medservice = ClientService("customerid", "user", "pw", uploadjournalpath="/var/lib/farm/uploads.db")
+    medservice.select_project(project_id)
+    medservice.resume_pending_uploads()
+
+Only the files the server is still missing are sent. Single files are sent
+again completely unless the appendage is already online. Image sequences are
+recorded when update_*_init_imageseq_upload(..) is called but can only be
+resumed after upload_imageseq_allfiles(..) has been called (it tells the
+journal where the image files are) unless an 'imageseq.ImageSequence' was
+passed to the init method. Uploads from `data` are not recorded.
+
+get_pending_uploads() lists the recorded uploads of the selected project and
+discard_pending_upload(..) removes an entry that shall not be resumed. Several
+processes can share one journal file.
+
+
+-------------------------------- Folder uploads ------------------------------
+
+Before the first byte of a folder is sent the whole folder is listed (the
+server needs all relative paths and sizes up front). On network filesystems
+with many thousands of files this can take a while. The constructor provides
+two settings:
+
+`scanworkers` - number of threads listing sibling folders at the same time.
+    Helps on network filesystems. None (default) lists in the calling thread.
+`scancache` - if True then the listing of each folder is kept together with
+    the modification time of the folder. Unchanged folders are not listed
+    again when the same tree is uploaded by this instance again (for example
+    after a failed try). Adding, removing or renaming files is noticed.
+    Overwriting a file in place isn't. So only enable it for trees whose files
+    are written once.
+
 
 -------------------- Error handling / connection problems --------------------
 
@@ -126,6 +240,23 @@ rights. Otherwise the service method might not return all the data that you
 expect. You must also assign that user to the service group "ROLESERVICE_API".
 This can be accomplished in the "Manage Users/Groups"-section of the GUI-Client.
 
+------------------------------ Transport timings -----------------------------
+
+Each request to the Medasto server is split into the phases 'connect' (TCP),
+'tls' (TLS handshake), 'send' (request incl. upload body), 'wait' (server
+processing until the first byte of the response arrives) and 'transfer'
+(response body incl. downloads). The service keeps the timings of the recent
+requests per route. A route is the requested url with all ids replaced by '#'
+(for example 'shotList/#/stage/#/shot/#/job/#/True/object' for get_shotjob).
+Use get_transport_stats(..) to get the percentiles of each phase. That way you
+can tell whether slow calls are caused by the network (connect, tls, transfer)
+or by the server (wait).
+
+If you pass `slowrequestthreshold` (seconds) to the constructor then every
+request taking longer than that is logged with its timing breakdown on the
+WARN level of the logger 'medasto._remoteservice'.
+
+
 -------------------------------- Concurrency ---------------------------------
 
 As long as you don't change the current project with .select_project(..) you
@@ -135,20 +266,155 @@ NOT access the instance concurrently. Method parameters refer always to
 the current selected project. If you invoke .select_project(..) while other
 threads are using some service methods of the same instance the server
 might receive parameters for the wrong project!
+With `coalescegets`=True identical read requests (for example
+.get_shot_jobdeflist()) that several threads send at the same time are sent to
+the server only once and all threads receive the same result. A thread may
+then get a result that was requested by another thread before its own last
+update. So turn it on only if the threads don't read what they have just
+written.
 
 If you need to work with several projects at the same time then you must create
 a separate instance of 'ClientService' for each project. And because Medasto
 allows only one session per user at the same time you will have to provide
 a separate username for each of the instances as well.
+The class 'SessionPool' in the module sessionpool does exactly this for you: It
+holds several credentials and leases project bound instances on demand.
+If many processes (for example render farm workers) need a 'ClientService' at
+the same time then use the class 'SessionLeaseManager' in the module
+sessionlease. It hands out one of several users per process and passes the
+sessions on from one process to the next.
+If several tools on the same workstation need Medasto then run a
+'GatewayServer' (module gateway) and let the tools use a 'GatewayClientService'.
+
+
+-------------------------------- Load control --------------------------------
+
+Many threads using the same 'ClientService' can overload the server. It then
+answers slowly or with unknown status codes. Two optional limits prevent this:
+
+`maxrequestrate` limits the requests per second (bursts of up to `requestburst`
+requests are allowed).
+
+`adaptiveconcurrency` limits the number of requests in flight at the same time.
+The limit starts low and grows as long as the server answers quickly. As soon
+as connection errors, unknown status codes or a rising response time show up
+the limit is halved. So batch jobs settle at the highest concurrency the server
+currently sustains. The given value is the upper bound of the limit. Threads
+above the limit wait. See .get_flow_stats() for the current limit.
+
+If a tool mixes requests somebody is waiting for with background transfers then
+pass `maxconnections` to the constructor and mark the requests with a priority:
+
+    with medservice.priority(constants.PRIORITY_BULK):
+        medservice.download_shotfile(..)  # prefetching thumbnails
+
+Each thread has the priority constants.PRIORITY_NORMAL unless changed this way.
+At most `maxconnections` requests are in flight at the same time. A part of them
+is reserved for each priority (see `reservedconnections`) so interactive
+requests (constants.PRIORITY_INTERACTIVE) never queue behind background
+transfers. The remaining connections go to the highest waiting priority first.
+At least one connection must remain unreserved unless every priority has its
+own reservation. The defaults always leave one.
+
+Streams (open_assetfile(..), iter_asset_list(..), ..) hold their connection
+until they are exhausted or closed. The thread reading a stream may send other
+requests in the meantime: It never waits for a connection it already holds
+itself and streams give their `adaptiveconcurrency` permit back as soon as the
+response has started. Other threads however wait while open streams occupy
+all connections. So close streams you stop reading.
+Downloads of lower priority pause between chunks while requests of a higher
+priority are in flight.
+
+
+---------------------------------- Bandwidth ---------------------------------
+
+Large uploads and downloads can saturate the line of a studio. Pass
+`maxuploadrate` and/or `maxdownloadrate` (bytes per second) to the constructor
+in order to limit all transfers of the instance together. The limits can be
+changed at any time with .set_bandwidth_limits(..), for example to let
+overnight jobs run at full speed. Running transfers adopt the new limits
+immediately. Short bursts above the limit are allowed.
+
+A single operation can be limited with the context manager .bandwidth(..).
+Only the transferred file contents are limited, not the small requests of the
+other service methods.
+
+
+--------------------------------- Compression --------------------------------
+
+Responses are requested gzip compressed (Accept-Encoding) and decompressed
+while they are read. Large JSON responses like the ones of
+get_shots_from_shotlist(..) with all optional fields shrink to a fraction.
+Pass `acceptgzip`=False to the constructor to turn it off.
+
+JSON request bodies (for example the list of all files of a folder upload)
+are only compressed if the constructor argument `compressthreshold` is given.
+Bodies of at least that many bytes are then sent gzip compressed. If the
+server rejects a compressed body the compression is turned off and the request
+is sent again uncompressed. Uploads of media files are never compressed.
+
+get_byte_stats() returns the bytes of the request and response bodies as they
+travelled over the wire and as they were used by the client. Uploads from
+files and iterators are not counted in 'sent'.
+
+
+---------------------------- Conditional requests ----------------------------
+
+Dashboards often poll the same objects (get_shotjob(..), get_stbsheets(..),
+..) although they rarely change. If the constructor argument
+`conditionalgets` is True then the results of the get_*(..) methods are kept
+together with the validators of the response (ETag, Last-Modified). The next
+call sends them back and the server answers 304 (Not Modified) if nothing has
+changed. The kept objects are returned then without any transfer.
+
+If the server ignores the validators the response is compared with the
+previous one and an unchanged response isn't decoded again. Either way an
+unchanged result is returned as the very same objects as before:
+
+    job = medservice.get_shotjob(..)
+    ..
+    if medservice.get_shotjob(..) is not job:
+        # the job has changed
+
+So please don't modify the returned objects if conditional requests are
+enabled. The results of the last 1024 urls are kept. get_conditional_stats()
+returns the number of requests and how many of them were answered from the
+kept results.
+
+
+------------------------------- Transfer tuning ------------------------------
+
+The defaults suit typical internet connections. On fast links (for example
+10 GbE to a data center) the per chunk overhead of Python limits the
+throughput. The constructor provides the following settings:
+
+`sendblocksize` - bytes read from a file and sent at once during uploads.
+`recvblocksize` - bytes read at once during downloads. Downloads read into a
+    reused buffer of this size.
+`socketbuffersize` - size of the send and receive buffers of the sockets
+    (SO_SNDBUF / SO_RCVBUF). None leaves them to the operating system which
+    usually adjusts them automatically. Only set it if the automatic
+    adjustment is disabled or limited on your system.
+`tcpnodelay` - True (default) sends small requests immediately.
+
+Larger block sizes (for example 1 MB) reduce the overhead but increase the
+memory usage per transfer and make bandwidth limits (see above) less smooth.
 
 """
+import contextlib
 import json
 import os
 import os.path
 import pathlib
+from . import _checksum
+from . import _folderscan
+from . import _jsonstream
 from . import _remoteservice
+from . import _transfer
+from . import _uploadjournal
 from . import domain
 from . import goodies
+from . import imageseq
 
 __author__ = 'Michael Krotky'
 
@@ -165,7 +431,17 @@ class ClientService:
     See the doc of this module for more info.
     """
 
-    def __init__(self, customerid, username, password, waitaftererror=10, maxtriesiferror=10):
+    _uploadjournal = None  # see the constructor argument `uploadjournalpath`
+    _folderscanner = _folderscan.FolderScanner()  # see the constructor arguments `scanworkers` and `scancache`
+
+    def __init__(self, customerid, username, password, waitaftererror=10, maxtriesiferror=10,
+                 slowrequestthreshold=None, sessioncachepath=None, lazyconnect=False,
+                 sessionkeepalive=None, keepalivemaxidle=4 * 3600, coalescegets=False,
+                 maxrequestrate=None, requestburst=None, adaptiveconcurrency=None,
+                 maxconnections=None, reservedconnections=None, maxuploadrate=None, maxdownloadrate=None,
+                 sendblocksize=_remoteservice.DEFAULT_BLOCKSIZE, recvblocksize=_remoteservice.DEFAULT_BLOCKSIZE,
+                 socketbuffersize=None, tcpnodelay=True, uploadjournalpath=None, scanworkers=None,
+                 scancache=False, acceptgzip=True, compressthreshold=None, conditionalgets=False):
         """Constructor.
 
         After creating this instance you must call .select_project().
@@ -183,9 +459,102 @@ class ClientService:
 
         `maxtriesiferror` (int) - see last paragraph of the section
         "Error handling / connection problems" in the doc string of this module.
+
+        `slowrequestthreshold` (float) - see the section "Transport timings" in
+        the doc string of this module.
+
+        `sessioncachepath` (str) - optional file for reusing the session in
+        other processes. See the section "Session cache" in the doc string of
+        this module.
+
+        `lazyconnect` (bool) - if True then the constructor doesn't send any
+        request. See the section "Introduction / Quickstart" in the doc string
+        of this module.
+
+        `sessionkeepalive` (float) - the session timeout of the server in
+        seconds. If given then the session is kept alive in the background.
+        See the section "Session timeout" in the doc string of this module.
+
+        `keepalivemaxidle` (float) - seconds without any service method call
+        after which the session is no longer kept alive.
+
+        `coalescegets` (bool) - if True then identical read requests of several
+        threads that are in flight at the same time are sent only once. Off by
+        default. See the section "Concurrency" in the doc string of this module.
+
+        `maxrequestrate` (float) - maximum number of requests per second.
+        Bursts of up to `requestburst` requests are allowed. See the section
+        "Load control" in the doc string of this module.
+
+        `adaptiveconcurrency` (int) - maximum number of requests in flight
+        which the adaptive limit may reach. See the section "Load control" in
+        the doc string of this module.
+
+        `maxconnections` (int) - maximum number of connections shared by the
+        priority classes. `reservedconnections` (dict) - number of connections
+        reserved per priority. See the section "Load control" in the doc string
+        of this module.
+
+        `maxuploadrate`, `maxdownloadrate` (float) - bandwidth limits in bytes
+        per second. See the section "Bandwidth" in the doc string of this module.
+
+        `sendblocksize`, `recvblocksize`, `socketbuffersize` (int) and
+        `tcpnodelay` (bool) - see the section "Transfer tuning" in the doc
+        string of this module.
+
+        `uploadjournalpath` (str) - optional SQLite file recording running
+        uploads. See the section "Upload journal" in the doc string of this
+        module.
+
+        `scanworkers` (int), `scancache` (bool) - see the section "Folder
+        uploads" in the doc string of this module.
+
+        `acceptgzip` (bool), `compressthreshold` (int) - see the section
+        "Compression" in the doc string of this module.
+
+        `conditionalgets` (bool) - see the section "Conditional requests" in
+        the doc string of this module.
         """
         self._rmtservice = _remoteservice.RemoteService(
-            customerid, username, password, waitaftererror, maxtriesiferror)
+            customerid, username, password, waitaftererror, maxtriesiferror,
+            slow_request_threshold=slowrequestthreshold, session_cache_path=sessioncachepath,
+            lazy_connect=lazyconnect, keepalive_session_timeout=sessionkeepalive,
+            keepalive_max_idle=keepalivemaxidle, coalesce_gets=coalescegets,
+            max_request_rate=maxrequestrate, request_burst=requestburst, adaptive_concurrency=adaptiveconcurrency,
+            max_connections=maxconnections, reserved_connections=reservedconnections,
+            max_upload_rate=maxuploadrate, max_download_rate=maxdownloadrate,
+            send_blocksize=sendblocksize, recv_blocksize=recvblocksize, socket_sndbuf=socketbuffersize,
+            socket_rcvbuf=socketbuffersize, tcp_nodelay=tcpnodelay, accept_gzip=acceptgzip,
+            compress_threshold=compressthreshold, conditional_gets=conditionalgets)
+        if uploadjournalpath is not None:
+            self._uploadjournal = _uploadjournal.UploadJournal(uploadjournalpath)
+        if scanworkers is not None or scancache:
+            self._folderscanner = _folderscan.FolderScanner(scanworkers, scancache)
+
+    def close(self):
+        """Stops background activities of this instance (like the session keeper).
+
+        The instance can still be used afterwards but nothing is done in the
+        background anymore. The instance can also be used as context manager
+        which calls this method on exit.
+        """
+        self._rmtservice.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def connect(self):
+        """Looks up the server and logs in if this hasn't happened yet.
+
+        Only needed for instances created with `lazyconnect`=True if you want
+        connection problems or wrong credentials to show up right away instead
+        of with the first service method call. Calling it more than once (also
+        from several threads) does no harm.
+        """
+        self._rmtservice.connect()
 
     def select_project(self, projectid):
         """You can get the available projects with .get_project_list()
@@ -199,17 +568,129 @@ class ClientService:
         """
         self._rmtservice.select_project(projectid)
 
+    def get_transport_stats(self, route=None):
+        """Returns the recent timings of the remote calls as dict.
+
+        If `route` is None then the timings of all requests are aggregated.
+        Otherwise only the requests of the given route are considered. The
+        available routes are returned by get_transport_routes().
+
+        The returned dict looks like this:
+        {'requests': int, 'failed': int,
+         'connect': {'p50': seconds, 'p90': seconds, 'p99': seconds, 'max': seconds},
+         'tls': {..}, 'send': {..}, 'wait': {..}, 'transfer': {..}, 'total': {..}}
+
+        See the section "Transport timings" in the doc string of this module.
+        """
+        if route is None:
+            return self._rmtservice.transport_stats.percentiles()
+        return self._rmtservice.transport_stats.percentiles(route)
+
+    def get_transport_routes(self):
+        """Returns a sorted list (str) of all routes that have been requested so far. """
+        return self._rmtservice.transport_stats.routes()
+
+    def get_byte_stats(self):
+        """Returns the sizes of the request and response bodies as dict:
+
+        {'sent': {'wire': bytes, 'logical': bytes}, 'received': {'wire': bytes, 'logical': bytes}}
+
+        See the section "Compression" in the doc string of this module.
+        """
+        return self._rmtservice.transport_stats.byte_counts()
+
+    def get_conditional_stats(self):
+        """Returns the statistics of the conditional requests as dict or None if they are disabled:
+
+        {'requests': int, 'notmodified': int, 'unchanged': int, 'entries': int}
+
+        See the section "Conditional requests" in the doc string of this module.
+        """
+        return self._rmtservice.conditional_stats()
+
+    def get_coalesced_request_count(self):
+        """Returns the number of read requests that didn't have to be sent because
+        an identical request of another thread was in flight at the same time.
+        """
+        return self._rmtservice.coalesced_requests
+
+    def get_flow_stats(self):
+        """Returns the current state of the load control as dict:
+
+        {'rate': requests per second or None, 'limit': current concurrency limit
+        or None, 'inflight': requests in flight or None}
+
+        See the section "Load control" in the doc string of this module.
+        """
+        return self._rmtservice.flow_stats()
+
+    def priority(self, priority):
+        """Context manager setting the priority of all requests of the current thread.
+
+            with medservice.priority(constants.PRIORITY_INTERACTIVE):
+                job = medservice.get_shotjob(..)
+
+        `priority` - one of the constants constants.PRIORITY_*. Other threads are
+        not affected. See the section "Load control" in the doc string of this
+        module.
+        """
+        return _PriorityContext(self._rmtservice, priority)
+
+    def set_bandwidth_limits(self, upload, download, burst=None):
+        """Changes the bandwidth limits of this instance at runtime.
+
+        `upload`, `download` (float) - bytes per second. None removes the limit.
+
+        `burst` (float) - bytes that may be transferred at once above the rate.
+        Defaults to one second worth of bytes.
+
+        Running transfers adopt the new limits with their next chunk. See the
+        section "Bandwidth" in the doc string of this module.
+        """
+        self._rmtservice.bandwidth.set_limit(_transfer.UPLOAD, upload, burst)
+        self._rmtservice.bandwidth.set_limit(_transfer.DOWNLOAD, download, burst)
+
+    def get_bandwidth_limits(self):
+        """Returns the dict {'upload': bytes per second or None, 'download': bytes per second or None}. """
+        return self._rmtservice.bandwidth.limits()
+
+    def bandwidth(self, upload=None, download=None):
+        """Context manager limiting each upload and download of the current thread.
+
+            with medservice.bandwidth(upload=2 * 1024 ** 2):
+                medservice.update_shotjob_uploadfile(..)
+
+        `upload`, `download` (float) - bytes per second per operation. None
+        means no limit per operation. The limits of set_bandwidth_limits(..)
+        apply in addition.
+        """
+        return _BandwidthContext(self._rmtservice.bandwidth, upload, download)
+
+    def progress(self, callback):
+        """Context manager reporting the progress of the uploads and downloads of the current thread.
+
+            def callback(direction, nbytes):
+                ..
+            with medservice.progress(callback):
+                medservice.update_shotjob_uploadfile(..)
+
+        `callback` is called by the transferring thread for each chunk with
+        `direction` ('upload' or 'download') and the number of bytes of the
+        chunk. Retried transfers are reported again. Blocking in the callback
+        delays the transfer. The JSON bodies of the other requests are not
+        reported.
+        """
+        return _ProgressContext(self._rmtservice.bandwidth, callback)
+
     def get_project_list(self):
         """ list[ dict{'id': projectId(int), 'name': projectName(str)}, ..] """
         url = _url_from_args("project-list")
-        result_str = self._rmtservice.request(url)
-        return json.loads(result_str)
+        return self._request_json(url)
 
     def get_assetlist_list(self):
         """ list[ dict{'name': assetListName(str), 'id': assetListId(int)}, ..] """
         url = _url_from_args("assetListIC")
-        result_str = self._rmtservice.request(url)
-        return json.loads(result_str)
+        return self._request_json(url)
 
     def get_asset_list(self, asset_list_id=None):
         """ list[ dict{'name': 'assetName(str)', 'id': assetId(int),
@@ -224,20 +705,30 @@ class ClientService:
             url = _url_from_args("assetsICAll")
         else:
             url = _url_from_args("assetList", asset_list_id, "assetsIC")
-        result_str = self._rmtservice.request(url)
-        return json.loads(result_str)
+        return self._request_json(url)
+
+    def iter_asset_list(self, asset_list_id=None):
+        """Same as get_asset_list(..) but returns an iterator yielding the dicts one by one.
+
+        The response is decoded while it is read. So the whole list is never
+        in memory. The iterator occupies a connection until it is exhausted or
+        closed. Please close it (or use contextlib.closing) if you stop early.
+        """
+        if asset_list_id is None:
+            url = _url_from_args("assetsICAll")
+        else:
+            url = _url_from_args("assetList", asset_list_id, "assetsIC")
+        return self._iter_json_array(url)
 
     def get_asset_statuslist(self, asset_list_id):
         """Returns a list with 'Status' objects from the given `asset_list_id` """
         url = _url_from_args("assetList", asset_list_id, "statusList")
-        result_str = self._rmtservice.request(url)
-        return json.loads(result_str, object_hook=_objhook_status)
+        return self._request_json(url, object_hook=_objhook_status)
 
     def get_asset_jobdeflist(self, asset_list_id):
         """Returns a list with 'JobDefinition' objects from the given `asset_list_id` """
         url = _url_from_args("assetList", asset_list_id, "jobDefList")
-        result_str = self._rmtservice.request(url)
-        return json.loads(result_str, object_hook=_objhook_jobdef)
+        return self._request_json(url, object_hook=_objhook_jobdef)
 
     def update_assetlist_addasset(self, asset_list_id, asset_name, custom_id=None):
         """Adds a new Asset to the given `asset_list_id`.
@@ -298,14 +789,14 @@ class ClientService:
         if asset_list_id is not None and asset_id is not None:
             url = _url_from_args(
                 "assetList", asset_list_id, "asset", asset_id, "job", jobordef['id'], jobordef['isDefId'], "object")
-            result_str = self._rmtservice.request(url)
+            result = self._request_json(url, object_hook=_objhook_job)
         elif custom_asset_id is not None:
             url = _url_from_args("assetList", "asset_c", "job", jobordef['id'], jobordef['isDefId'], "object")
             jsondata = json.dumps(dict(customId=custom_asset_id))
-            result_str = self._rmtservice.request(url, body=jsondata)
+            result = self._request_json(url, jsondata, object_hook=_objhook_job)
         else:
             raise Exception(_ERROR_MSG_ASSET_IDS)
-        return json.loads(result_str, object_hook=_objhook_job)
+        return result
 
     def update_assetjob_addglobalmessage(self, msgtext, statusid, asset_list_id=None, asset_id=None,
                                          custom_asset_id=None, job_id=None, jobdef_id=None):
@@ -444,7 +935,8 @@ class ClientService:
         return int(result_str)
 
     def update_assetjob_uploadfile(self, appendage_id, filepath, create_preview, asset_list_id=None,
-                                   asset_id=None, custom_asset_id=None, job_id=None, jobdef_id=None):
+                                   asset_id=None, custom_asset_id=None, job_id=None, jobdef_id=None, data=None,
+                                   checksum=None, manifest=True):
         """To be used for uploads after an 'Appendage' has been added.
 
         This method is used to upload a single file after a successful
@@ -455,10 +947,20 @@ class ClientService:
         The `filepath` for the file to be uploaded can be either a str or a byte-like
         object as expected by the native 'open' function of Python.
 
+        Instead of a `filepath` the content can be passed as `data` (with
+        `filepath`=None): bytes, bytearray, memoryview, a binary file object or
+        an iterable of bytes (sent with chunked transfer encoding). See the
+        section "Uploads from memory" in the doc string of this module.
+
         `create_preview` (bool) - Use TRUE if Medasto shall try to create a preview from the upload.
 
         As for the job identification you specify either the `job_id`('Job'.jobid) OR
         the `jobdef_id`('JobDefinition'.jobdefid).
+
+        `checksum` - True or the name of a hash algorithm (for example 'sha256')
+        in order to hash the file while it is sent. The method then returns the
+        hex digest and writes a manifest next to `filepath` unless `manifest` is
+        False. See the section "Checksums" in the doc string of this module.
         """
         jobordef = _job_or_def_id(jobdef_id, job_id)
         extra_headers = {}
@@ -472,12 +974,15 @@ class ClientService:
         else:
             raise Exception(_ERROR_MSG_ASSET_IDS)
 
-        with open(filepath, 'rb') as file:
-            self._rmtservice.request(url, method='POST', body=file, contenttype='application/octet-stream',
-                                     extra_headers=extra_headers)
+        target = dict(asset_list_id=asset_list_id, asset_id=asset_id, custom_asset_id=custom_asset_id, job_id=job_id,
+                      jobdef_id=jobdef_id)
+        journalentry = self._journal_begin(_uploadjournal.KIND_FILE, appendage_id, filepath, 'asset', target,
+                                           create_preview)
+        return self._upload_file(url, filepath, data, extra_headers, checksum, manifest, journalentry)
 
     def update_assetjob_uploadfolder(self, folderpath, create_preview, appendage_id, asset_list_id=None, asset_id=None,
-                                     custom_asset_id=None, job_id=None, jobdef_id=None):
+                                     custom_asset_id=None, job_id=None, jobdef_id=None, checksum=None,
+                                     manifest=True):
         """To be used for uploads after an 'Appendage' has been added.
 
         This method is used to upload a folder (recursively) after a successful
@@ -494,6 +999,12 @@ class ClientService:
 
         As for the job identification you specify either the `job_id`('Job'.jobid) OR
         the `jobdef_id`('JobDefinition'.jobdefid).
+
+        `checksum` - True or the name of a hash algorithm (for example 'sha256')
+        in order to hash the files while they are sent. The method then returns
+        the dict {relative path: hex digest} of the sent files and adds them to
+        the manifest next to `folderpath` unless `manifest` is False. See the
+        section "Checksums" in the doc string of this module.
         """
         pathlist_filedict = self._get_folder_structure(folderpath)
         pathlist = pathlist_filedict[0]  # relative paths to files and empty folders as expected by the server
@@ -517,19 +1028,12 @@ class ClientService:
         uploadjob_id = uploadjobid_nextfileid[0]
         nextfile_id = int(uploadjobid_nextfileid[1])
 
-        #  A _FOLDER_UPLOAD_ALL_COMPLETE signal returned by the server guarantees that the upload is really complete..
-        while nextfile_id != _FOLDER_UPLOAD_ALL_COMPLETE:
-            if nextfile_id not in filedict:
-                raise Exception("Server request an unknown file id: " + str(nextfile_id))
-            absfilepath = filedict[nextfile_id]
-            if not os.path.isfile(absfilepath):
-                # This can onyl mean that the file has been deleted after the creation of the pathlist for the server.
-                raise Exception(
-                    "Given folder '" + folderpath + "' does not contain the requested file '" + absfilepath) + "'."
-            url = _url_from_args("processAppendageFolderUpload", "uploadJob", uploadjob_id, 'file', nextfile_id)
-            with open(absfilepath, 'rb') as file:
-                nextfile_id = int(
-                    self._rmtservice.request(url, method='POST', body=file, contenttype='application/octet-stream'))
+        target = dict(asset_list_id=asset_list_id, asset_id=asset_id, custom_asset_id=custom_asset_id, job_id=job_id,
+                      jobdef_id=jobdef_id)
+        journalentry = self._journal_begin(_uploadjournal.KIND_FOLDER, appendage_id, folderpath, 'asset', target,
+                                           create_preview, uploadjob_id, nextfile_id, filedict)
+        return self._upload_folder_files(folderpath, uploadjob_id, nextfile_id, filedict, checksum, manifest,
+                                         journalentry)
 
     def update_assetjob_init_imageseq_upload(self, filenamelist, create_preview, appendage_id, asset_list_id=None,
                                              asset_id=None,
@@ -542,7 +1046,8 @@ class ClientService:
 
         `filenamelist` must point to a list containing all file names (str)
         that belong to the image sequence. The items in the list must be really
-        just names and not paths.
+        just names and not paths. An 'imageseq.ImageSequence' can be passed
+        instead. Its folder is then known to the upload journal right away.
 
         `create_preview` (bool) - Use TRUE if Medasto shall try to create a preview from the upload.
 
@@ -552,6 +1057,10 @@ class ClientService:
         The method returns a unique uploadjob_id which is needed for the next
         and final upload step (method upload_imageseq_allfiles(..))
         """
+        folderpath = None
+        if isinstance(filenamelist, imageseq.ImageSequence):
+            folderpath = filenamelist.folderpath
+            filenamelist = filenamelist.filenames
         jobordef = _job_or_def_id(jobdef_id, job_id)
         if asset_list_id is not None and asset_id is not None:
             url = _url_from_args(
@@ -565,6 +1074,10 @@ class ClientService:
         else:
             raise Exception(_ERROR_MSG_ASSET_IDS)
         uploadjob_id = self._rmtservice.request(url, method='POST', body=jsondata)
+        target = dict(asset_list_id=asset_list_id, asset_id=asset_id, custom_asset_id=custom_asset_id, job_id=job_id,
+                      jobdef_id=jobdef_id)
+        self._journal_begin(_uploadjournal.KIND_IMAGESEQ, appendage_id, folderpath, 'asset', target, create_preview,
+                            uploadjob_id)
         return uploadjob_id
 
     def upload_imageseq_onefile(self, uploadjob_id, filepath):
@@ -582,11 +1095,16 @@ class ClientService:
 
         Returns the next image file name to upload.
         """
+        return self._upload_imageseq_file(uploadjob_id, filepath)
+
+    def _upload_imageseq_file(self, uploadjob_id, filepath, checksum=None):
+        """Same as upload_imageseq_onefile(..). The file is hashed into the '_checksum.Checksum' (if given). """
         filename = os.path.basename(filepath)
         extra_headers = {'filename': filename}
         url = _url_from_args("processImageSeqUpload", "uploadJob", uploadjob_id)
         with open(filepath, 'rb') as file:
-            nextitem = self._rmtservice.request(url, method='POST', body=file, contenttype='application/octet-stream',
+            body = file if checksum is None else checksum.wrap(file)
+            nextitem = self._rmtservice.request(url, method='POST', body=body, contenttype='application/octet-stream',
                                                 extra_headers=extra_headers)
         return nextitem
 
@@ -601,7 +1119,7 @@ class ClientService:
         nextitem = self._rmtservice.request(url)
         return nextitem
 
-    def upload_imageseq_allfiles(self, uploadjob_id, folderpath):
+    def upload_imageseq_allfiles(self, uploadjob_id, folderpath, checksum=None, manifest=True):
         """Uploads all files for the given uploadjob_id of an image sequence.
 
         The `uploadjob_id ` must belong to an upload job that was initialized
@@ -623,16 +1141,212 @@ class ClientService:
         This method can also be used to resume a previously cancelled (or crashed)
         upload as long as you have the uploadjob_id. In that case only the
         remaining files will be uploaded.
+
+        `checksum` - True or the name of a hash algorithm (for example 'sha256')
+        in order to hash the image files while they are sent. The method then
+        returns the dict {file name: hex digest} of the sent files and adds them
+        to the manifest next to `folderpath` unless `manifest` is False. See the
+        section "Checksums" in the doc string of this module.
         """
         if not os.path.isdir(folderpath):
             raise Exception("Given path '" + folderpath + "' does not exist or is not a folder.")
-        nextitem = self.upload_imageseq_getnext(uploadjob_id)
-        while nextitem != _IMAGESEQ_UPLOAD_COMPLETE:
-            filepath = os.path.join(folderpath, nextitem)
-            if not os.path.isfile(filepath):
-                raise Exception(
-                    "Given folder '" + folderpath + "' does not contain the requested file '" + nextitem) + "'."
-            nextitem = self.upload_imageseq_onefile(uploadjob_id, filepath)
+        algorithm = _checksum.algorithm_name(checksum) if checksum else None
+        journalentry = None
+        if self._uploadjournal is not None:
+            journalentry = self._uploadjournal.find_uploadjob(uploadjob_id)
+            if journalentry is None:
+                journalentry = self._journal_begin(_uploadjournal.KIND_IMAGESEQ, None, folderpath,
+                                                   uploadjob_id=uploadjob_id)
+            else:
+                self._uploadjournal.set_localpath(journalentry, folderpath)
+        digests = {}
+        try:
+            nextitem = self.upload_imageseq_getnext(uploadjob_id)
+            while nextitem != _IMAGESEQ_UPLOAD_COMPLETE:
+                filepath = os.path.join(folderpath, nextitem)
+                if not os.path.isfile(filepath):
+                    raise Exception(
+                        "Given folder '" + folderpath + "' does not contain the requested file '" + nextitem) + "'."
+                filechecksum = None if algorithm is None else _checksum.Checksum(algorithm)
+                filename = nextitem
+                nextitem = self._upload_imageseq_file(uploadjob_id, filepath, filechecksum)
+                if filechecksum is not None:
+                    digests[filename] = filechecksum.hexdigest()
+            self._journal_finish(journalentry)
+        finally:
+            _write_folder_manifest(folderpath, algorithm, digests, manifest)
+        return digests if algorithm is not None else None
+
+    def _upload_file(self, url, filepath, data, extra_headers, checksum, manifest, journalentry=None):
+        """Uploads a single file (or `data`). Returns the hex digest if `checksum` is set. """
+        filechecksum = _checksum.Checksum(checksum) if checksum else None
+        with _upload_body(filepath, data) as file:
+            body = file if filechecksum is None else filechecksum.wrap(file)
+            self._rmtservice.request(url, method='POST', body=body, contenttype='application/octet-stream',
+                                     extra_headers=extra_headers)
+        self._journal_finish(journalentry)
+        if filechecksum is None:
+            return None
+        if filepath is not None:
+            _write_file_manifest(filepath, filechecksum, manifest)
+        return filechecksum.hexdigest()
+
+    def _upload_folder_files(self, folderpath, uploadjob_id, nextfile_id, filedict, checksum, manifest,
+                             journalentry=None):
+        """Sends the files of a folder upload as requested by the server.
+
+        `filedict` as returned by _get_folder_structure(..). Returns the dict {relative path: hex digest} of
+        the sent files if `checksum` is set.
+        """
+        algorithm = _checksum.algorithm_name(checksum) if checksum else None
+        digests = {}
+        try:
+            #  A _FOLDER_UPLOAD_ALL_COMPLETE signal returned by the server guarantees that the upload is really
+            #  complete..
+            while nextfile_id != _FOLDER_UPLOAD_ALL_COMPLETE:
+                if nextfile_id not in filedict:
+                    raise Exception("Server request an unknown file id: " + str(nextfile_id))
+                absfilepath = filedict[nextfile_id]
+                if not os.path.isfile(absfilepath):
+                    # This can onyl mean that the file has been deleted after the creation of the pathlist for
+                    # the server.
+                    raise Exception(
+                        "Given folder '" + folderpath + "' does not contain the requested file '" + absfilepath) + "'."
+                filechecksum = None if algorithm is None else _checksum.Checksum(algorithm)
+                url = _url_from_args("processAppendageFolderUpload", "uploadJob", uploadjob_id, 'file', nextfile_id)
+                with open(absfilepath, 'rb') as file:
+                    body = file if filechecksum is None else filechecksum.wrap(file)
+                    nextfile_id = int(
+                        self._rmtservice.request(url, method='POST', body=body, contenttype='application/octet-stream'))
+                if filechecksum is not None:
+                    relpath = os.path.relpath(absfilepath, folderpath)
+                    digests[_checksum.relpath_key(*pathlib.PurePath(relpath).parts)] = filechecksum.hexdigest()
+                if journalentry is not None and nextfile_id != _FOLDER_UPLOAD_ALL_COMPLETE:
+                    self._uploadjournal.set_nextfile(journalentry, nextfile_id)
+            self._journal_finish(journalentry)
+        finally:
+            _write_folder_manifest(folderpath, algorithm, digests, manifest)
+        return digests if algorithm is not None else None
+
+    def _download_file(self, url, body, filepath, checksum=None, manifest=True):
+        """Downloads into `filepath` (a path or a writable file object). Returns the hex digest if `checksum` is
+        set.
+        """
+        filechecksum = _checksum.Checksum(checksum) if checksum else None
+        if hasattr(filepath, 'write'):
+            self._rmtservice.download_to(url, filepath, body=body, hasher=filechecksum)
+        else:
+            if os.path.exists(filepath):
+                raise Exception("Given destination filepath '" + filepath + "' already exists.")
+            folderpath = os.path.dirname(filepath)
+            _ensure_folder_existing(folderpath)
+            self._rmtservice.download(url, filepath, body=body, hasher=filechecksum)
+            if filechecksum is not None:
+                _write_file_manifest(filepath, filechecksum, manifest)
+        return None if filechecksum is None else filechecksum.hexdigest()
+
+    def _download_folder_file(self, url, body, folderpath, pathelements, algorithm, digests):
+        """Downloads a file of a folder or image sequence. Adds its hex digest to `digests` if `algorithm` is
+        set.
+        """
+        abspath = os.path.join(folderpath, *pathelements)
+        filechecksum = None if algorithm is None else _checksum.Checksum(algorithm)
+        self._rmtservice.download(url, abspath, body=body, hasher=filechecksum)
+        if filechecksum is not None:
+            digests[_checksum.relpath_key(*pathelements)] = filechecksum.hexdigest()
+
+    def get_pending_uploads(self):
+        """Returns the unfinished uploads of the selected project recorded in the upload journal.
+
+        Each upload is a dict with the keys 'id' (the id of the journal entry),
+        'kind' ('file', 'folder' or 'imageseq'), 'appendage_id', 'localpath',
+        'uploadjob_id', 'scope' ('asset' or 'shot'), 'target' (dict with the
+        asset or shot ids and job_id/jobdef_id), 'create_preview', 'created'
+        and 'updated' (epoch seconds). Returns an empty list if this instance
+        has no upload journal. See the section "Upload journal" in the doc
+        string of this module.
+        """
+        if self._uploadjournal is None:
+            return []
+        return self._uploadjournal.pending(self._rmtservice.current_projectid)
+
+    def resume_pending_uploads(self):
+        """Continues all unfinished uploads of the selected project recorded in the upload journal.
+
+        Returns the list of appendage ids whose uploads have been completed
+        (or were found online already). Image sequence uploads whose folder
+        is unknown (upload_imageseq_allfiles(..) hasn't been called) are
+        skipped. If an upload fails the Exception is raised and the remaining
+        uploads stay in the journal. See the section "Upload journal" in the
+        doc string of this module.
+        """
+        if self._uploadjournal is None:
+            raise Exception("This ClientService has no upload journal (see the argument uploadjournalpath).")
+        completed = []
+        for entry in self._uploadjournal.pending(self._rmtservice.current_projectid):
+            if self._resume_upload(entry):
+                completed.append(entry['appendage_id'])
+        return completed
+
+    def discard_pending_upload(self, entry_id):
+        """Removes an upload (see get_pending_uploads()) from the upload journal. Nothing is sent to the server. """
+        if self._uploadjournal is not None:
+            self._uploadjournal.finish(entry_id)
+
+    def _resume_upload(self, entry):
+        """Continues the upload of the journal `entry`. Returns False if it cannot be resumed (yet). """
+        localpath = entry['localpath']
+        if entry['kind'] == _uploadjournal.KIND_IMAGESEQ:
+            if localpath is None:
+                _remoteservice.RemoteService.logger.info(
+                    "Skipping the upload job " + entry['uploadjob_id'] + ". Its image folder is unknown.")
+                return False
+            self.upload_imageseq_allfiles(entry['uploadjob_id'], localpath)
+        elif entry['kind'] == _uploadjournal.KIND_FOLDER:
+            relpaths = self._uploadjournal.folderfiles(entry['id'])
+            filedict = {fileid: os.path.join(localpath, relpath) for fileid, relpath in relpaths.items()}
+            self._upload_folder_files(localpath, entry['uploadjob_id'], entry['nextfile_id'], filedict, None, True,
+                                      entry['id'])
+        else:
+            if entry['scope'] == 'asset':
+                job = self.get_assetjob(**entry['target'])
+            else:
+                job = self.get_shotjob(**entry['target'])
+            appendage = job.get_appendage(entry['appendage_id'])
+            if appendage is not None and appendage.isonline:
+                self._uploadjournal.finish(entry['id'])
+            elif entry['scope'] == 'asset':
+                self.update_assetjob_uploadfile(entry['appendage_id'], localpath, entry['create_preview'],
+                                                **entry['target'])
+            else:
+                self.update_shotjob_uploadfile(entry['appendage_id'], localpath, entry['create_preview'],
+                                               **entry['target'])
+        return True
+
+    def _journal_begin(self, kind, appendage_id, localpath, scope=None, target=None, create_preview=None,
+                       uploadjob_id=None, nextfile_id=None, filedict=None):
+        """Records an upload from disk in the upload journal (if any). Returns the entry id or None. """
+        if self._uploadjournal is None or (localpath is None and kind != _uploadjournal.KIND_IMAGESEQ):
+            return None
+        relpaths = None
+        if filedict is not None:
+            relpaths = {fileid: os.path.relpath(abspath, localpath) for fileid, abspath in filedict.items()}
+        return self._uploadjournal.begin(kind, self._rmtservice.current_projectid, appendage_id, localpath, scope,
+                                         target, create_preview, uploadjob_id, nextfile_id, relpaths)
+
+    def _journal_finish(self, journalentry):
+        if journalentry is not None:
+            self._uploadjournal.finish(journalentry)
+
+    def _request_json(self, url, body=None, object_hook=None):
+        """Sends a GET request and returns the decoded JSON response. See the section "Conditional requests". """
+        return self._rmtservice.request_json(url, body=body, object_hook=object_hook)
+
+    def _iter_json_array(self, url, body=None, object_hook=None):
+        """Generator yielding the decoded elements of the JSON array returned by the server. """
+        chunks = self._rmtservice.iter_download(url, body=body, accept='application/json')
+        with contextlib.closing(chunks):
+            yield from _jsonstream.iter_array(chunks, object_hook)
 
     def _get_folder_structure(self, folderpath):
         """Returns a tuple ( pathlist, filedict ).
@@ -640,34 +1354,10 @@ class ClientService:
         pathlist contains dictionaries with relative paths from all files and empty directories within folderpath.
         filedict contains absolute paths to all files within the folder. The keys are unique file ids within folderpath.
         """
-        if not os.path.isdir(folderpath):
-            raise Exception("Given path '" + folderpath + "' does not exist or is not a folder.")
-
-        pathlist = []
-        filedict = {}
-        fileid = 1  # server reqires to start counting at 1 or above.
-        for root, dirs, files in os.walk(folderpath, topdown=True, onerror=self._walktree_error_handler):
-            if len(dirs) == 0 and len(files) == 0:
-                relpath = os.path.relpath(root, folderpath)
-                elements = pathlib.PurePath(relpath).parts
-                pathlist.append({'id': fileid, 'elements': elements, 'size': 0, 'isdir': True})
-                fileid += 1
-            else:
-                for name in files:
-                    abspath = os.path.join(root, name)
-                    relpath = os.path.relpath(abspath, folderpath)
-                    elements = pathlib.PurePath(relpath).parts
-                    size = os.path.getsize(abspath)
-                    pathlist.append({'id': fileid, 'elements': elements, 'size': size})
-                    filedict[fileid] = abspath
-                    fileid += 1
-        return pathlist, filedict
-
-    def _walktree_error_handler(self, ex):
-        raise ex  # OSError with filename attribute
+        return self._folderscanner.scan(folderpath)
 
     def update_assetjob_uploadpreview(self, appendage_id, filepath, asset_list_id=None,
-                                      asset_id=None, custom_asset_id=None, job_id=None, jobdef_id=None):
+                                      asset_id=None, custom_asset_id=None, job_id=None, jobdef_id=None, data=None):
         """To be used for preview uploads after an 'Appendage' has been added.
 
         This method can be used to upload a single preview file. It will fail if the
@@ -679,6 +1369,11 @@ class ClientService:
         The `filepath` for the file to be uploaded can be either a str or a byte-like
         object as expected by the native 'open' function of Python.
 
+        Instead of a `filepath` the content can be passed as `data` (with
+        `filepath`=None): bytes, bytearray, memoryview, a binary file object or
+        an iterable of bytes (sent with chunked transfer encoding). See the
+        section "Uploads from memory" in the doc string of this module.
+
         As for the job identification you specify either the `job_id`('Job'.jobid) OR
         the `jobdef_id`('JobDefinition'.jobdefid).
         """
@@ -694,7 +1389,7 @@ class ClientService:
         else:
             raise Exception(_ERROR_MSG_ASSET_IDS)
 
-        with open(filepath, 'rb') as file:
+        with _upload_body(filepath, data) as file:
             self._rmtservice.request(url, method='POST', body=file, contenttype='application/octet-stream',
                                      extra_headers=extra_headers)
 
@@ -873,13 +1568,11 @@ class ClientService:
 
     def get_shot_statuslist(self):
         """Returns a list with 'Status' objects which are valid vor all 'ShotList's. """
-        result_str = self._rmtservice.request('shotStatusList')
-        return json.loads(result_str, object_hook=_objhook_status)
+        return self._request_json('shotStatusList', object_hook=_objhook_status)
 
     def get_shot_jobdeflist(self):
         """Returns a list with 'JobDefinition' objects which are valid vor all 'ShotList's. """
-        result_str = self._rmtservice.request('shotJobDefList')
-        return json.loads(result_str, object_hook=_objhook_jobdef)
+        return self._request_json('shotJobDefList', object_hook=_objhook_jobdef)
 
     def get_textcontainers(self, layer):
         """Returns a list with TextContainers(dictionaries).
@@ -893,8 +1586,7 @@ class ClientService:
         See the LAYER_* constants of this module for valid layer arguments.
         """
         url = _url_from_args("tcList", layer)
-        result_str = self._rmtservice.request(url)
-        return json.loads(result_str)
+        return self._request_json(url)
 
     def get_textpools(self, layer):
         """Returns a list with TextPools(dictionaries).
@@ -911,8 +1603,7 @@ class ClientService:
         See the LAYER_* constants of this module for valid layer arguments.
         """
         url = _url_from_args("tpList", layer)
-        result_str = self._rmtservice.request(url)
-        return json.loads(result_str)
+        return self._request_json(url)
 
     def get_assettextpools(self, layer):
         """Returns a list with AssetTextPools(dictionaries).
@@ -926,16 +1617,14 @@ class ClientService:
         See the LAYER_* constants of this module for valid layer arguments.
         """
         url = _url_from_args('atpList', layer)
-        result_str = self._rmtservice.request(url)
-        return json.loads(result_str)
+        return self._request_json(url)
 
     def get_shotlists(self, incl_stb_fields=False, incl_asset_rel=False):
         """Same as get_shotlist(..) but..
 
         .returns a list of all 'ShotList' objects as list in correct order."""
         url = _url_from_args('shotList', 'list', incl_stb_fields, incl_asset_rel)
-        result_str = self._rmtservice.request(url)
-        return json.loads(result_str, object_hook=_objhook_shotlist)
+        return self._request_json(url, object_hook=_objhook_shotlist)
 
     def get_shotlist(self, shotlist_id, incl_stb_fields=False, incl_asset_rel=False):
         """Returns a 'ShotList' object for the given `shotlist_id`.
@@ -948,16 +1637,14 @@ class ClientService:
         returned object will remain None (saving bandwidth if not needed).
         """
         url = _url_from_args('shotList', shotlist_id, 'object', incl_stb_fields, incl_asset_rel)
-        result_str = self._rmtservice.request(url)
-        return json.loads(result_str, object_hook=_objhook_shotlist)
+        return self._request_json(url, object_hook=_objhook_shotlist)
 
     def get_stages(self, shotlist_id, incl_stb_fields=False, incl_asset_rel=False):
         """Same as get_stage(..) but..
 
         ..returns all 'Stage' objects of the specified `shotlist_id` as list in correct order."""
         url = _url_from_args('shotList', shotlist_id, 'stage', 'list', incl_stb_fields, incl_asset_rel)
-        result_str = self._rmtservice.request(url)
-        return json.loads(result_str, object_hook=_objhook_stage)
+        return self._request_json(url, object_hook=_objhook_stage)
 
     def get_stage(self, shotlist_id=None, stage_id=None, custom_stage_id=None,
                   incl_stb_fields=False, incl_asset_rel=False):
@@ -968,14 +1655,14 @@ class ClientService:
         """
         if shotlist_id is not None and stage_id is not None:
             url = _url_from_args('shotList', shotlist_id, 'stage', stage_id, 'object', incl_stb_fields, incl_asset_rel)
-            result_str = self._rmtservice.request(url)
+            result = self._request_json(url, object_hook=_objhook_stage)
         elif custom_stage_id is not None:
             url = _url_from_args('shotList', 'stage_c', 'object', incl_stb_fields, incl_asset_rel)
             jsondata = json.dumps(dict(customId=custom_stage_id))
-            result_str = self._rmtservice.request(url, body=jsondata)
+            result = self._request_json(url, jsondata, object_hook=_objhook_stage)
         else:
             raise Exception(_ERROR_MSG_STAGE_IDS)
-        return json.loads(result_str, object_hook=_objhook_stage)
+        return result
 
     def get_shots_from_shotlist(self, shotlist_id, incl_stb_fields=False, incl_asset_rel=False):
         """Same as get_shot(..) but..
@@ -983,8 +1670,15 @@ class ClientService:
          ..returns all 'Shot' objects of the specified `shotlist_id` as list in correct order.
          """
         url = _url_from_args('shotList', shotlist_id, 'shots', incl_stb_fields, incl_asset_rel)
-        result_str = self._rmtservice.request(url)
-        return json.loads(result_str, object_hook=_objhook_shot)
+        return self._request_json(url, object_hook=_objhook_shot)
+
+    def iter_shots_from_shotlist(self, shotlist_id, incl_stb_fields=False, incl_asset_rel=False):
+        """Same as get_shots_from_shotlist(..) but returns an iterator yielding the 'Shot' objects one by one.
+
+        See iter_asset_list(..).
+        """
+        url = _url_from_args('shotList', shotlist_id, 'shots', incl_stb_fields, incl_asset_rel)
+        return self._iter_json_array(url, object_hook=_objhook_shot)
 
     def get_shots_from_stage(self, shotlist_id=None, stage_id=None, custom_stage_id=None,
                              incl_stb_fields=False, incl_asset_rel=False):
@@ -995,14 +1689,14 @@ class ClientService:
         if shotlist_id is not None and stage_id is not None:
             url = _url_from_args(
                 'shotList', shotlist_id, 'stage', stage_id, 'shot', 'list', incl_stb_fields, incl_asset_rel)
-            result_str = self._rmtservice.request(url)
+            result = self._request_json(url, object_hook=_objhook_shot)
         elif custom_stage_id is not None:
             url = _url_from_args('shotList', 'stage_c', 'shot', 'list', incl_stb_fields, incl_asset_rel)
             jsondata = json.dumps(dict(customId=custom_stage_id))
-            result_str = self._rmtservice.request(url, body=jsondata)
+            result = self._request_json(url, jsondata, object_hook=_objhook_shot)
         else:
             raise Exception(_ERROR_MSG_STAGE_IDS)
-        return json.loads(result_str, object_hook=_objhook_shot)
+        return result
 
     def get_shot(self, shotlist_id=None, stage_id=None, shot_id=None, custom_shot_id=None,
                  incl_stb_fields=False, incl_asset_rel=False):
@@ -1014,14 +1708,14 @@ class ClientService:
         if shotlist_id is not None and stage_id is not None and shot_id is not None:
             url = _url_from_args(
                 'shotList', shotlist_id, 'stage', stage_id, 'shot', shot_id, 'object', incl_stb_fields, incl_asset_rel)
-            result_str = self._rmtservice.request(url)
+            result = self._request_json(url, object_hook=_objhook_shot)
         elif custom_shot_id is not None:
             url = _url_from_args('shotList', 'stage', 'shot_c', 'object', incl_stb_fields, incl_asset_rel)
             jsondata = json.dumps(dict(customId=custom_shot_id))
-            result_str = self._rmtservice.request(url, body=jsondata)
+            result = self._request_json(url, jsondata, object_hook=_objhook_shot)
         else:
             raise Exception(_ERROR_MSG_SHOT_IDS)
-        return json.loads(result_str, object_hook=_objhook_shot)
+        return result
 
     def get_stbsheets(self, shotlist_id=None, stage_id=None, shot_id=None, custom_shot_id=None, incl_stb_fields=False):
         """Same as get_stbsheet(..) but..
@@ -1031,14 +1725,14 @@ class ClientService:
         if shotlist_id is not None and stage_id is not None and shot_id is not None:
             url = _url_from_args(
                 'shotList', shotlist_id, 'stage', stage_id, 'shot', shot_id, 'stb', 'list', incl_stb_fields)
-            result_str = self._rmtservice.request(url)
+            result = self._request_json(url, object_hook=_objhook_stbsheet)
         elif custom_shot_id is not None:
             url = _url_from_args('shotList', 'stage', 'shot_c', 'stb', 'list', incl_stb_fields)
             jsondata = json.dumps(dict(customId=custom_shot_id))
-            result_str = self._rmtservice.request(url, body=jsondata)
+            result = self._request_json(url, jsondata, object_hook=_objhook_stbsheet)
         else:
             raise Exception(_ERROR_MSG_SHOT_IDS)
-        return json.loads(result_str, object_hook=_objhook_stbsheet)
+        return result
 
     def get_stbsheet(self, stbsheet_id, shotlist_id=None, stage_id=None, shot_id=None, custom_shot_id=None,
                      incl_stb_fields=False):
@@ -1050,14 +1744,14 @@ class ClientService:
         if shotlist_id is not None and stage_id is not None and shot_id is not None:
             url = _url_from_args('shotList', shotlist_id, 'stage', stage_id, 'shot', shot_id, 'stb', stbsheet_id,
                                  'object', incl_stb_fields)
-            result_str = self._rmtservice.request(url)
+            result = self._request_json(url, object_hook=_objhook_stbsheet)
         elif custom_shot_id is not None:
             url = _url_from_args('shotList', 'stage', 'shot_c', 'stb', stbsheet_id, 'object', incl_stb_fields)
             jsondata = json.dumps(dict(customId=custom_shot_id))
-            result_str = self._rmtservice.request(url, body=jsondata)
+            result = self._request_json(url, jsondata, object_hook=_objhook_stbsheet)
         else:
             raise Exception(_ERROR_MSG_SHOT_IDS)
-        return json.loads(result_str, object_hook=_objhook_stbsheet)
+        return result
 
     def get_shotjob(self, shotlist_id=None, stage_id=None, shot_id=None, custom_shot_id=None,
                     job_id=None, jobdef_id=None):
@@ -1070,14 +1764,14 @@ class ClientService:
         if shotlist_id is not None and stage_id is not None and shot_id is not None:
             url = _url_from_args('shotList', shotlist_id, 'stage', stage_id, 'shot', shot_id, 'job',
                                  jobordef['id'], jobordef['isDefId'], 'object')
-            result_str = self._rmtservice.request(url)
+            result = self._request_json(url, object_hook=_objhook_job)
         elif custom_shot_id is not None:
             url = _url_from_args('shotList', 'stage', 'shot_c', 'job', jobordef['id'], jobordef['isDefId'], 'object')
             jsondata = json.dumps(dict(customId=custom_shot_id))
-            result_str = self._rmtservice.request(url, body=jsondata)
+            result = self._request_json(url, jsondata, object_hook=_objhook_job)
         else:
             raise Exception(_ERROR_MSG_SHOT_IDS)
-        return json.loads(result_str, object_hook=_objhook_job)
+        return result
 
     def update_shotjob_addglobalmessage(self, msgtext, statusid, shotlist_id=None, stage_id=None, shot_id=None,
                                         custom_shot_id=None, job_id=None, jobdef_id=None):
@@ -1213,7 +1907,8 @@ class ClientService:
         return int(result_str)
 
     def update_shotjob_uploadfile(self, appendage_id, filepath, create_preview, shotlist_id=None, stage_id=None,
-                                  shot_id=None, custom_shot_id=None, job_id=None, jobdef_id=None):
+                                  shot_id=None, custom_shot_id=None, job_id=None, jobdef_id=None, data=None,
+                                  checksum=None, manifest=True):
         """To be used for uploads after an 'Appendage' has been added.
 
         This method is used to upload a single file after a successful
@@ -1224,10 +1919,20 @@ class ClientService:
         The `filepath` for the file to be uploaded can be either a str or a byte-like
         object as expected by the native 'open' function of Python.
 
+        Instead of a `filepath` the content can be passed as `data` (with
+        `filepath`=None): bytes, bytearray, memoryview, a binary file object or
+        an iterable of bytes (sent with chunked transfer encoding). See the
+        section "Uploads from memory" in the doc string of this module.
+
         `create_preview` (bool) - Use TRUE if Medasto shall try to create a preview from the upload.
 
         As for the job identification you specify either the `job_id`('Job'.jobid) OR
         the `jobdef_id`('JobDefinition'.jobdefid).
+
+        `checksum` - True or the name of a hash algorithm (for example 'sha256')
+        in order to hash the file while it is sent. The method then returns the
+        hex digest and writes a manifest next to `filepath` unless `manifest` is
+        False. See the section "Checksums" in the doc string of this module.
         """
         jobordef = _job_or_def_id(jobdef_id, job_id)
         extra_headers = {}
@@ -1241,12 +1946,15 @@ class ClientService:
         else:
             raise Exception(_ERROR_MSG_SHOT_IDS)
 
-        with open(filepath, 'rb') as file:
-            self._rmtservice.request(url, method='POST', body=file, contenttype='application/octet-stream',
-                                     extra_headers=extra_headers)
+        target = dict(shotlist_id=shotlist_id, stage_id=stage_id, shot_id=shot_id, custom_shot_id=custom_shot_id,
+                      job_id=job_id, jobdef_id=jobdef_id)
+        journalentry = self._journal_begin(_uploadjournal.KIND_FILE, appendage_id, filepath, 'shot', target,
+                                           create_preview)
+        return self._upload_file(url, filepath, data, extra_headers, checksum, manifest, journalentry)
 
     def update_shotjob_uploadfolder(self, folderpath, create_preview, appendage_id, shotlist_id=None, stage_id=None,
-                                    shot_id=None, custom_shot_id=None, job_id=None, jobdef_id=None):
+                                    shot_id=None, custom_shot_id=None, job_id=None, jobdef_id=None, checksum=None,
+                                    manifest=True):
         """To be used for uploads after an 'Appendage' has been added.
 
         This method is used to upload a folder (recursively) after a successful
@@ -1263,6 +1971,12 @@ class ClientService:
 
         As for the job identification you specify either the `job_id`('Job'.jobid) OR
         the `jobdef_id`('JobDefinition'.jobdefid).
+
+        `checksum` - True or the name of a hash algorithm (for example 'sha256')
+        in order to hash the files while they are sent. The method then returns
+        the dict {relative path: hex digest} of the sent files and adds them to
+        the manifest next to `folderpath` unless `manifest` is False. See the
+        section "Checksums" in the doc string of this module.
         """
         pathlist_filedict = self._get_folder_structure(folderpath)
         pathlist = pathlist_filedict[0]  # relative paths to files and empty folders as expected by the server
@@ -1285,19 +1999,12 @@ class ClientService:
         uploadjob_id = uploadjobid_nextfileid[0]
         nextfile_id = int(uploadjobid_nextfileid[1])
 
-        #  A _FOLDER_UPLOAD_ALL_COMPLETE signal returned by the server guarantees that the upload is really complete..
-        while nextfile_id != _FOLDER_UPLOAD_ALL_COMPLETE:
-            if nextfile_id not in filedict:
-                raise Exception("Server request an unknown file id: " + str(nextfile_id))
-            absfilepath = filedict[nextfile_id]
-            if not os.path.isfile(absfilepath):
-                # This can onyl mean that the file has been deleted after the creation of the pathlist for the server.
-                raise Exception(
-                    "Given folder '" + folderpath + "' does not contain the requested file '" + absfilepath) + "'."
-            url = _url_from_args("processAppendageFolderUpload", "uploadJob", uploadjob_id, 'file', nextfile_id)
-            with open(absfilepath, 'rb') as file:
-                nextfile_id = int(self._rmtservice.request(
-                    url, method='POST', body=file, contenttype='application/octet-stream'))
+        target = dict(shotlist_id=shotlist_id, stage_id=stage_id, shot_id=shot_id, custom_shot_id=custom_shot_id,
+                      job_id=job_id, jobdef_id=jobdef_id)
+        journalentry = self._journal_begin(_uploadjournal.KIND_FOLDER, appendage_id, folderpath, 'shot', target,
+                                           create_preview, uploadjob_id, nextfile_id, filedict)
+        return self._upload_folder_files(folderpath, uploadjob_id, nextfile_id, filedict, checksum, manifest,
+                                         journalentry)
 
     def update_shotjob_init_imageseq_upload(self, filenamelist, create_preview, appendage_id, shotlist_id=None,
                                             stage_id=None,
@@ -1310,7 +2017,8 @@ class ClientService:
 
         `filenamelist` must point to a list containing all file names (str)
         that belong to the image sequence. The items in the list must be really
-        just names and not paths.
+        just names and not paths. An 'imageseq.ImageSequence' can be passed
+        instead. Its folder is then known to the upload journal right away.
 
         `create_preview` (bool) - Use TRUE if Medasto shall try to create a preview from the upload.
 
@@ -1320,6 +2028,10 @@ class ClientService:
         The method returns a unique uploadjob_id which is needed for the next
         and final upload step (method upload_imageseq_allfiles(..))
         """
+        folderpath = None
+        if isinstance(filenamelist, imageseq.ImageSequence):
+            folderpath = filenamelist.folderpath
+            filenamelist = filenamelist.filenames
         jobordef = _job_or_def_id(jobdef_id, job_id)
         if shotlist_id is not None and stage_id is not None and shot_id is not None:
             url = _url_from_args('shotList', shotlist_id, 'stage', stage_id, 'shot', shot_id, 'job', jobordef['id'],
@@ -1332,10 +2044,14 @@ class ClientService:
         else:
             raise Exception(_ERROR_MSG_SHOT_IDS)
         uploadjob_id = self._rmtservice.request(url, method='POST', body=jsondata)
+        target = dict(shotlist_id=shotlist_id, stage_id=stage_id, shot_id=shot_id, custom_shot_id=custom_shot_id,
+                      job_id=job_id, jobdef_id=jobdef_id)
+        self._journal_begin(_uploadjournal.KIND_IMAGESEQ, appendage_id, folderpath, 'shot', target, create_preview,
+                            uploadjob_id)
         return uploadjob_id
 
     def update_shotjob_uploadpreview(self, appendage_id, filepath, shotlist_id=None, stage_id=None,
-                                     shot_id=None, custom_shot_id=None, job_id=None, jobdef_id=None):
+                                     shot_id=None, custom_shot_id=None, job_id=None, jobdef_id=None, data=None):
         """To be used for preview uploads after an 'Appendage' has been added.
 
         This method can be used to upload a single preview file. It will fail if the
@@ -1347,6 +2063,11 @@ class ClientService:
         The `filepath` for the file to be uploaded can be either a str or a byte-like
         object as expected by the native 'open' function of Python.
 
+        Instead of a `filepath` the content can be passed as `data` (with
+        `filepath`=None): bytes, bytearray, memoryview, a binary file object or
+        an iterable of bytes (sent with chunked transfer encoding). See the
+        section "Uploads from memory" in the doc string of this module.
+
         As for the job identification you specify either the `job_id`('Job'.jobid) OR
         the `jobdef_id`('JobDefinition'.jobdefid).
         """
@@ -1362,7 +2083,7 @@ class ClientService:
         else:
             raise Exception(_ERROR_MSG_SHOT_IDS)
 
-        with open(filepath, 'rb') as file:
+        with _upload_body(filepath, data) as file:
             self._rmtservice.request(url, method='POST', body=file, contenttype='application/octet-stream',
                                      extra_headers=extra_headers)
 
@@ -1451,19 +2172,24 @@ class ClientService:
             raise Exception(_ERROR_MSG_SHOT_IDS)
 
     def update_stbsheet_setimage(self, stbsheet_id, filepath, shotlist_id=None, stage_id=None,
-                                 shot_id=None, custom_shot_id=None):
+                                 shot_id=None, custom_shot_id=None, data=None, filename=None):
         """Replaces the image on the specified 'StbSheet'.
 
         The `filepath` for the image file to be uploaded. Can be either a str or a
         byte-like object as expected by the native 'open' function of Python.
 
+        Instead of a `filepath` the content can be passed as `data` (with
+        `filepath`=None) together with a `filename` (the server needs its
+        extension). See the section "Uploads from memory" in the doc string of
+        this module.
+
         Please note that the given file is not saved on the server as is but instead
         a converted JPG-image (with probably a lower resolution) will be saved.
 
         If this method returns without Exception then the given file was successfully
         upload, converted and the converted image was set on the 'StbSheet'.
         """
-        filename = os.path.basename(filepath)
+        filename = _upload_filename(filepath, filename)
         extra_headers = {'filename': filename}
         if shotlist_id is not None and stage_id is not None and shot_id is not None:
             url = _url_from_args(
@@ -1474,7 +2200,7 @@ class ClientService:
         else:
             raise Exception(_ERROR_MSG_SHOT_IDS)
 
-        with open(filepath, 'rb') as file:
+        with _upload_body(filepath, data) as file:
             self._rmtservice.request(url, method='PUT', body=file, contenttype='application/octet-stream',
                                      extra_headers=extra_headers)
 
@@ -1571,7 +2297,7 @@ class ClientService:
         self._rmtservice.request(url, method='PUT', body=jsondata)
 
     def update_shot_addstbsheet(self, filepath, position, shotlist_id=None, stage_id=None,
-                                shot_id=None, custom_shot_id=None):
+                                shot_id=None, custom_shot_id=None, data=None, filename=None):
         """Inserts a new 'StbSheet' to he specified 'Shot'.
 
         The `position` is a zero based int. As with indexes of lists it must be
@@ -1582,6 +2308,11 @@ class ClientService:
         The `filepath` for the image file to be uploaded can be either a str or a
         byte-like object as expected by the native 'open' function of Python.
 
+        Instead of a `filepath` the content can be passed as `data` (with
+        `filepath`=None) together with a `filename` (the server needs its
+        extension). See the section "Uploads from memory" in the doc string of
+        this module.
+
         Please note that the given file is NOT saved on the server as is but instead
         a converted JPG-image (with probably a lower resolution) will be saved.
 
@@ -1589,7 +2320,7 @@ class ClientService:
         upload, converted and the converted image was used to create new 'StbSheet'.
         This 'StbSheet' was then added to the 'Shot'.
         """
-        filename = os.path.basename(filepath)
+        filename = _upload_filename(filepath, filename)
         extra_headers = {'filename': filename}
         if shotlist_id is not None and stage_id is not None and shot_id is not None:
             url = _url_from_args('shotList', shotlist_id, 'stage', stage_id, 'shot', shot_id, 'addStb', position)
@@ -1599,7 +2330,7 @@ class ClientService:
         else:
             raise Exception(_ERROR_MSG_SHOT_IDS)
 
-        with open(filepath, 'rb') as file:
+        with _upload_body(filepath, data) as file:
             self._rmtservice.request(url, method='PUT', body=file, contenttype='application/octet-stream',
                                      extra_headers=extra_headers)
 
@@ -1987,7 +2718,8 @@ class ClientService:
     # ******************************************** download  ******************************************************
 
     def download_assetfile(self, filepath, appendage_id, fileversion,
-                           asset_list_id=None, asset_id=None, custom_asset_id=None, job_id=None, jobdef_id=None):
+                           asset_list_id=None, asset_id=None, custom_asset_id=None, job_id=None, jobdef_id=None,
+                           checksum=None, manifest=True):
         """Downloads the file of the specified 'Appendage'.
 
         If the Appendage contains an image sequence or folder then this method
@@ -2002,7 +2734,8 @@ class ClientService:
         `filepath` - The destination file path. Can be either a str or a byte-like
         object as expected by the native 'open' function of Python. The ´filepath´
         must not already exist otherwise an Exception is thrown. Parent folders are
-        created if necessary.
+        created if necessary. Alternatively a writable binary file object (for
+        example an io.BytesIO or a pipe) to which the file is written.
 
         `fileversion` - possible values are the constants constants.FILEVERSION_*.
         Use 'Appendage'.isonline to check whether the ORIGINAL version
@@ -2014,26 +2747,42 @@ class ClientService:
 
         If an Error occurs during downloading the file the incomplete file gets
         deleted but eventually created folders remain.
+
+        `checksum` - True or the name of a hash algorithm (for example 'sha256')
+        in order to hash the file while it is written. The method then returns
+        the hex digest and writes a manifest next to `filepath` unless
+        `manifest` is False (or `filepath` is a file object). See the section
+        "Checksums" in the doc string of this module.
         """
-        jobordef = _job_or_def_id(jobdef_id, job_id)
-        if os.path.exists(filepath):
-            raise Exception("Given destination filepath '" + filepath + "' already exists.")
-        folderpath = os.path.dirname(filepath)
-        _ensure_folder_existing(folderpath)
-        if asset_list_id is not None and asset_id is not None:
-            url = _url_from_args('assetList', asset_list_id, 'asset', asset_id, 'job', jobordef['id'],
-                                 jobordef['isDefId'], 'appendage', appendage_id, 'dl', fileversion)
-            self._rmtservice.download(url, filepath)
-        elif custom_asset_id is not None:
-            url = _url_from_args('assetList', 'asset_c', 'job', jobordef['id'], jobordef['isDefId'],
-                                 'appendage', appendage_id, 'dl', fileversion)
-            jsondata = json.dumps(dict(customId=custom_asset_id))
-            self._rmtservice.download(url, filepath, body=jsondata)
-        else:
-            raise Exception(_ERROR_MSG_ASSET_IDS)
+        url, body = _assetfile_download_args(appendage_id, fileversion, asset_list_id, asset_id, custom_asset_id,
+                                             job_id, jobdef_id)
+        return self._download_file(url, body, filepath, checksum, manifest)
+
+    def open_assetfile(self, appendage_id, fileversion, asset_list_id=None, asset_id=None, custom_asset_id=None,
+                       job_id=None, jobdef_id=None, buffersize=None):
+        """Returns a readable binary stream of the file of the specified 'Appendage'.
+
+        Same as download_assetfile(..) but nothing is written to disk. The
+        stream reads directly from the connection to the server:
+
+            with medservice.open_assetfile(appendage_id, constants.FILEVERSION_THUMB, ..) as stream:
+                image = stream.read()
+
+        The stream (an io.BufferedReader) also provides .iter_chunks() which
+        yields the data in chunks of up to `buffersize` bytes (defaults to the
+        `recvblocksize` of the constructor). Close the stream
+        (or use it as context manager) in order to release the connection.
+        Interrupted transfers are resumed transparently like all other requests
+        (see the section "Error handling / connection problems" in the doc
+        string of this module).
+        """
+        url, body = _assetfile_download_args(appendage_id, fileversion, asset_list_id, asset_id, custom_asset_id,
+                                             job_id, jobdef_id)
+        return self._rmtservice.open_download(url, body=body, buffersize=buffersize)
 
     def download_assetimageseq(self, folderpath, appendage_id,
-                               asset_list_id=None, asset_id=None, custom_asset_id=None, job_id=None, jobdef_id=None):
+                               asset_list_id=None, asset_id=None, custom_asset_id=None, job_id=None, jobdef_id=None,
+                               checksum=None, manifest=True):
         """Downloads files of an image sequence into the specified folder.
 
         This method can only be used to download the original uploaded files
@@ -2055,39 +2804,55 @@ class ClientService:
 
         If an Error occurs during downloading the image sequence already
         downloaded files remain on disk.
+
+        `checksum` - True or the name of a hash algorithm (for example 'sha256')
+        in order to hash the image files while they are written. The method then
+        returns the dict {file name: hex digest} of the downloaded files and
+        adds them to the manifest next to `folderpath` unless `manifest` is
+        False. Skipped files are not hashed. See the section "Checksums" in the
+        doc string of this module.
         """
         jobordef = _job_or_def_id(jobdef_id, job_id)
         _ensure_folder_existing(folderpath)
-        if asset_list_id is not None and asset_id is not None:
-            urlgetlist = _url_from_args('assetList', asset_list_id, 'asset', asset_id, 'job', jobordef['id'],
-                                        jobordef['isDefId'], 'appendage', appendage_id, 'getImageNames')
-            filelist_str = self._rmtservice.request(urlgetlist)
-            filelist = json.loads(filelist_str)
-            urlgetfile = _url_from_args('assetList', asset_list_id, 'asset', asset_id, 'job', jobordef['id'],
-                                        jobordef['isDefId'], 'appendage', appendage_id, 'dl-imageseq')
-            for filename in filelist:
-                filepath = os.path.join(folderpath, filename)
-                if not os.path.exists(filepath):
-                    jsondata = json.dumps(dict(filename=filename))
-                    self._rmtservice.download(urlgetfile, filepath, body=jsondata)
-        elif custom_asset_id is not None:
-            urlgetlist = _url_from_args('assetList', 'asset_c', 'job', jobordef['id'], jobordef['isDefId'],
-                                        'appendage', appendage_id, 'getImageNames')
-            jsondata = json.dumps(dict(customId=custom_asset_id))
-            filelist_str = self._rmtservice.request(urlgetlist, body=jsondata)
-            filelist = json.loads(filelist_str)
-            urlgetfile = _url_from_args('assetList', 'asset_c', 'job', jobordef['id'], jobordef['isDefId'],
-                                        'appendage', appendage_id, 'dl-imageseq')
-            for filename in filelist:
-                filepath = os.path.join(folderpath, filename)
-                if not os.path.exists(filepath):
-                    jsondata = json.dumps(dict(customId=custom_asset_id, filename=filename))
-                    self._rmtservice.download(urlgetfile, filepath, body=jsondata)
-        else:
-            raise Exception(_ERROR_MSG_ASSET_IDS)
+        algorithm = _checksum.algorithm_name(checksum) if checksum else None
+        digests = {}
+        try:
+            if asset_list_id is not None and asset_id is not None:
+                urlgetlist = _url_from_args('assetList', asset_list_id, 'asset', asset_id, 'job', jobordef['id'],
+                                            jobordef['isDefId'], 'appendage', appendage_id, 'getImageNames')
+                filelist_str = self._rmtservice.request(urlgetlist)
+                filelist = json.loads(filelist_str)
+                urlgetfile = _url_from_args('assetList', asset_list_id, 'asset', asset_id, 'job', jobordef['id'],
+                                            jobordef['isDefId'], 'appendage', appendage_id, 'dl-imageseq')
+                for filename in filelist:
+                    filepath = os.path.join(folderpath, filename)
+                    if not os.path.exists(filepath):
+                        jsondata = json.dumps(dict(filename=filename))
+                        self._download_folder_file(urlgetfile, jsondata, folderpath, [filename], algorithm,
+                                                   digests)
+            elif custom_asset_id is not None:
+                urlgetlist = _url_from_args('assetList', 'asset_c', 'job', jobordef['id'], jobordef['isDefId'],
+                                            'appendage', appendage_id, 'getImageNames')
+                jsondata = json.dumps(dict(customId=custom_asset_id))
+                filelist_str = self._rmtservice.request(urlgetlist, body=jsondata)
+                filelist = json.loads(filelist_str)
+                urlgetfile = _url_from_args('assetList', 'asset_c', 'job', jobordef['id'], jobordef['isDefId'],
+                                            'appendage', appendage_id, 'dl-imageseq')
+                for filename in filelist:
+                    filepath = os.path.join(folderpath, filename)
+                    if not os.path.exists(filepath):
+                        jsondata = json.dumps(dict(customId=custom_asset_id, filename=filename))
+                        self._download_folder_file(urlgetfile, jsondata, folderpath, [filename], algorithm,
+                                                   digests)
+            else:
+                raise Exception(_ERROR_MSG_ASSET_IDS)
+        finally:
+            _write_folder_manifest(folderpath, algorithm, digests, manifest)
+        return digests if algorithm is not None else None
 
     def download_assetfolder(self, folderpath, appendage_id,
-                             asset_list_id=None, asset_id=None, custom_asset_id=None, job_id=None, jobdef_id=None):
+                             asset_list_id=None, asset_id=None, custom_asset_id=None, job_id=None, jobdef_id=None,
+                             checksum=None, manifest=True):
         """Downloads files of an appendage folder into the specified folder.
 
         This method can only be used to download the original uploaded files
@@ -2109,6 +2874,13 @@ class ClientService:
 
         If an Error occurs during the download then already downloaded files
         remain on disk.
+
+        `checksum` - True or the name of a hash algorithm (for example 'sha256')
+        in order to hash the files while they are written. The method then
+        returns the dict {relative path: hex digest} of the downloaded files and
+        adds them to the manifest next to `folderpath` unless `manifest` is
+        False. Skipped files are not hashed. See the section "Checksums" in the
+        doc string of this module.
         """
         jobordef = _job_or_def_id(jobdef_id, job_id)
         _ensure_folder_existing(folderpath)
@@ -2131,21 +2903,28 @@ class ClientService:
             raise Exception(_ERROR_MSG_ASSET_IDS)
 
         pathlist = json.loads(pathlist_str)['items']
-        for pathdict in pathlist:
-            pathelements = pathdict['pathElements']
-            isfolder = pathdict['isFolder']
-            abspath = os.path.join(folderpath, *pathelements)
-            if isfolder:
-                _ensure_folder_existing(abspath)
-            else:
-                size = pathdict['size']
-                if not _check_file_samesize_existing(abspath, size):
-                    dctbody['pathElements'] = pathelements
-                    _ensure_folder_existing(os.path.dirname(abspath))
-                    self._rmtservice.download(urlgetfile, abspath, body=json.dumps(dctbody))
+        algorithm = _checksum.algorithm_name(checksum) if checksum else None
+        digests = {}
+        try:
+            for pathdict in pathlist:
+                pathelements = pathdict['pathElements']
+                isfolder = pathdict['isFolder']
+                abspath = os.path.join(folderpath, *pathelements)
+                if isfolder:
+                    _ensure_folder_existing(abspath)
+                else:
+                    size = pathdict['size']
+                    if not _check_file_samesize_existing(abspath, size):
+                        dctbody['pathElements'] = pathelements
+                        _ensure_folder_existing(os.path.dirname(abspath))
+                        self._download_folder_file(urlgetfile, json.dumps(dctbody), folderpath, pathelements,
+                                                   algorithm, digests)
+        finally:
+            _write_folder_manifest(folderpath, algorithm, digests, manifest)
+        return digests if algorithm is not None else None
 
     def download_shotfile(self, filepath, appendage_id, fileversion, shotlist_id=None, stage_id=None, shot_id=None,
-                          custom_shot_id=None, job_id=None, jobdef_id=None):
+                          custom_shot_id=None, job_id=None, jobdef_id=None, checksum=None, manifest=True):
         """Downloads the file of the specified 'Appendage'.
 
         If the Appendage contains an image sequence or folder then this method
@@ -2160,7 +2939,8 @@ class ClientService:
         `filepath` - The destination file path. Can be either a str or a byte-like
         object as expected by the native 'open' function of Python. The ´filepath´
         must not already exist otherwise an Exception is thrown. Parent folders are
-        created if necessary.
+        created if necessary. Alternatively a writable binary file object (for
+        example an io.BytesIO or a pipe) to which the file is written.
 
         `fileversion` - possible values are the constants constants.FILEVERSION_*.
         Use 'Appendage'.isonline to check whether the ORIGINAL version
@@ -2172,26 +2952,30 @@ class ClientService:
 
         If an Error occurs during downloading the file the incomplete file gets
         deleted but eventually created folders remain.
+
+        `checksum` - True or the name of a hash algorithm (for example 'sha256')
+        in order to hash the file while it is written. The method then returns
+        the hex digest and writes a manifest next to `filepath` unless
+        `manifest` is False (or `filepath` is a file object). See the section
+        "Checksums" in the doc string of this module.
         """
-        jobordef = _job_or_def_id(jobdef_id, job_id)
-        if os.path.exists(filepath):
-            raise Exception("Given destination filepath '" + filepath + "' already exists.")
-        folderpath = os.path.dirname(filepath)
-        _ensure_folder_existing(folderpath)
-        if shotlist_id is not None and stage_id is not None and shot_id is not None:
-            url = _url_from_args('shotList', shotlist_id, 'stage', stage_id, 'shot', shot_id, 'job', jobordef['id'],
-                                 jobordef['isDefId'], 'appendage', appendage_id, 'dl', fileversion)
-            self._rmtservice.download(url, filepath)
-        elif custom_shot_id is not None:
-            url = _url_from_args('shotList', 'stage', 'shot_c', 'job', jobordef['id'], jobordef['isDefId'],
-                                 'appendage', appendage_id, 'dl', fileversion)
-            jsondata = json.dumps(dict(customId=custom_shot_id))
-            self._rmtservice.download(url, filepath, body=jsondata)
-        else:
-            raise Exception(_ERROR_MSG_SHOT_IDS)
+        url, body = _shotfile_download_args(appendage_id, fileversion, shotlist_id, stage_id, shot_id, custom_shot_id,
+                                            job_id, jobdef_id)
+        return self._download_file(url, body, filepath, checksum, manifest)
+
+    def open_shotfile(self, appendage_id, fileversion, shotlist_id=None, stage_id=None, shot_id=None,
+                      custom_shot_id=None, job_id=None, jobdef_id=None, buffersize=None):
+        """Returns a readable binary stream of the file of the specified 'Appendage'.
+
+        Same as download_shotfile(..) but nothing is written to disk. See
+        open_assetfile(..) for the details of the returned stream.
+        """
+        url, body = _shotfile_download_args(appendage_id, fileversion, shotlist_id, stage_id, shot_id, custom_shot_id,
+                                            job_id, jobdef_id)
+        return self._rmtservice.open_download(url, body=body, buffersize=buffersize)
 
     def download_shotimageseq(self, folderpath, appendage_id, shotlist_id=None, stage_id=None, shot_id=None,
-                              custom_shot_id=None, job_id=None, jobdef_id=None):
+                              custom_shot_id=None, job_id=None, jobdef_id=None, checksum=None, manifest=True):
         """Downloads of files of an image sequence into the specified folder.
 
         This method can only be used to download the original uploaded files
@@ -2213,39 +2997,56 @@ class ClientService:
 
         If an Error occurs during downloading the image sequence already
         downloaded files remain on disk.
+
+        `checksum` - True or the name of a hash algorithm (for example 'sha256')
+        in order to hash the image files while they are written. The method then
+        returns the dict {file name: hex digest} of the downloaded files and
+        adds them to the manifest next to `folderpath` unless `manifest` is
+        False. Skipped files are not hashed. See the section "Checksums" in the
+        doc string of this module.
         """
         jobordef = _job_or_def_id(jobdef_id, job_id)
         _ensure_folder_existing(folderpath)
-        if shotlist_id is not None and stage_id is not None and shot_id is not None:
-            urlgetlist = _url_from_args('shotList', shotlist_id, 'stage', stage_id, 'shot', shot_id, 'job',
-                                        jobordef['id'], jobordef['isDefId'], 'appendage', appendage_id, 'getImageNames')
-            filelist_str = self._rmtservice.request(urlgetlist)
-            filelist = json.loads(filelist_str)
-            urlgetfile = _url_from_args('shotList', shotlist_id, 'stage', stage_id, 'shot', shot_id, 'job',
-                                        jobordef['id'], jobordef['isDefId'], 'appendage', appendage_id, 'dl-imageseq')
-            for filename in filelist:
-                filepath = os.path.join(folderpath, filename)
-                if not os.path.exists(filepath):
-                    jsondata = json.dumps(dict(filename=filename))
-                    self._rmtservice.download(urlgetfile, filepath, body=jsondata)
-        elif custom_shot_id is not None:
-            urlgetlist = _url_from_args('shotList', 'stage', 'shot_c', 'job', jobordef['id'], jobordef['isDefId'],
-                                        'appendage', appendage_id, 'getImageNames')
-            jsondata = json.dumps(dict(customId=custom_shot_id))
-            filelist_str = self._rmtservice.request(urlgetlist, body=jsondata)
-            filelist = json.loads(filelist_str)
-            urlgetfile = _url_from_args('shotList', 'stage', 'shot_c', 'job', jobordef['id'], jobordef['isDefId'],
-                                        'appendage', appendage_id, 'dl-imageseq')
-            for filename in filelist:
-                filepath = os.path.join(folderpath, filename)
-                if not os.path.exists(filepath):
-                    jsondata = json.dumps(dict(customId=custom_shot_id, filename=filename))
-                    self._rmtservice.download(urlgetfile, filepath, body=jsondata)
-        else:
-            raise Exception(_ERROR_MSG_SHOT_IDS)
+        algorithm = _checksum.algorithm_name(checksum) if checksum else None
+        digests = {}
+        try:
+            if shotlist_id is not None and stage_id is not None and shot_id is not None:
+                urlgetlist = _url_from_args('shotList', shotlist_id, 'stage', stage_id, 'shot', shot_id, 'job',
+                                            jobordef['id'], jobordef['isDefId'], 'appendage', appendage_id,
+                                            'getImageNames')
+                filelist_str = self._rmtservice.request(urlgetlist)
+                filelist = json.loads(filelist_str)
+                urlgetfile = _url_from_args('shotList', shotlist_id, 'stage', stage_id, 'shot', shot_id, 'job',
+                                            jobordef['id'], jobordef['isDefId'], 'appendage', appendage_id,
+                                            'dl-imageseq')
+                for filename in filelist:
+                    filepath = os.path.join(folderpath, filename)
+                    if not os.path.exists(filepath):
+                        jsondata = json.dumps(dict(filename=filename))
+                        self._download_folder_file(urlgetfile, jsondata, folderpath, [filename], algorithm,
+                                                   digests)
+            elif custom_shot_id is not None:
+                urlgetlist = _url_from_args('shotList', 'stage', 'shot_c', 'job', jobordef['id'], jobordef['isDefId'],
+                                            'appendage', appendage_id, 'getImageNames')
+                jsondata = json.dumps(dict(customId=custom_shot_id))
+                filelist_str = self._rmtservice.request(urlgetlist, body=jsondata)
+                filelist = json.loads(filelist_str)
+                urlgetfile = _url_from_args('shotList', 'stage', 'shot_c', 'job', jobordef['id'], jobordef['isDefId'],
+                                            'appendage', appendage_id, 'dl-imageseq')
+                for filename in filelist:
+                    filepath = os.path.join(folderpath, filename)
+                    if not os.path.exists(filepath):
+                        jsondata = json.dumps(dict(customId=custom_shot_id, filename=filename))
+                        self._download_folder_file(urlgetfile, jsondata, folderpath, [filename], algorithm,
+                                                   digests)
+            else:
+                raise Exception(_ERROR_MSG_SHOT_IDS)
+        finally:
+            _write_folder_manifest(folderpath, algorithm, digests, manifest)
+        return digests if algorithm is not None else None
 
     def download_shotfolder(self, folderpath, appendage_id, shotlist_id=None, stage_id=None, shot_id=None,
-                            custom_shot_id=None, job_id=None, jobdef_id=None):
+                            custom_shot_id=None, job_id=None, jobdef_id=None, checksum=None, manifest=True):
         """Downloads files of an appendage folder into the specified folder.
 
         This method can only be used to download the original uploaded files
@@ -2267,6 +3068,13 @@ class ClientService:
 
         If an Error occurs during the download then already downloaded files
         remain on disk.
+
+        `checksum` - True or the name of a hash algorithm (for example 'sha256')
+        in order to hash the files while they are written. The method then
+        returns the dict {relative path: hex digest} of the downloaded files and
+        adds them to the manifest next to `folderpath` unless `manifest` is
+        False. Skipped files are not hashed. See the section "Checksums" in the
+        doc string of this module.
         """
         jobordef = _job_or_def_id(jobdef_id, job_id)
         _ensure_folder_existing(folderpath)
@@ -2291,18 +3099,25 @@ class ClientService:
             raise Exception(_ERROR_MSG_ASSET_IDS)
 
         pathlist = json.loads(pathlist_str)['items']
-        for pathdict in pathlist:
-            pathelements = pathdict['pathElements']
-            isfolder = pathdict['isFolder']
-            abspath = os.path.join(folderpath, *pathelements)
-            if isfolder:
-                _ensure_folder_existing(abspath)
-            else:
-                size = pathdict['size']
-                if not _check_file_samesize_existing(abspath, size):
-                    dctbody['pathElements'] = pathelements
-                    _ensure_folder_existing(os.path.dirname(abspath))
-                    self._rmtservice.download(urlgetfile, abspath, body=json.dumps(dctbody))
+        algorithm = _checksum.algorithm_name(checksum) if checksum else None
+        digests = {}
+        try:
+            for pathdict in pathlist:
+                pathelements = pathdict['pathElements']
+                isfolder = pathdict['isFolder']
+                abspath = os.path.join(folderpath, *pathelements)
+                if isfolder:
+                    _ensure_folder_existing(abspath)
+                else:
+                    size = pathdict['size']
+                    if not _check_file_samesize_existing(abspath, size):
+                        dctbody['pathElements'] = pathelements
+                        _ensure_folder_existing(os.path.dirname(abspath))
+                        self._download_folder_file(urlgetfile, json.dumps(dctbody), folderpath, pathelements,
+                                                   algorithm, digests)
+        finally:
+            _write_folder_manifest(folderpath, algorithm, digests, manifest)
+        return digests if algorithm is not None else None
 
     def download_stbimage(self, filepath, stbsheet_id, shotlist_id=None, stage_id=None, shot_id=None,
                           custom_shot_id=None):
@@ -2311,25 +3126,24 @@ class ClientService:
         `filepath` - The destination file path. Can be either a str or a byte-like
         object as expected by the native 'open' function of Python. The ´filepath´
         must not already exist otherwise an Exception is thrown. Parent folders are
-        created if necessary.
+        created if necessary. Alternatively a writable binary file object (for
+        example an io.BytesIO or a pipe) to which the file is written.
 
         If an Error occurs during downloading the file the incomplete file gets
         deleted but eventually created folders remain.
         """
-        folderpath = os.path.dirname(filepath)
-        _ensure_folder_existing(folderpath)
-        if os.path.exists(filepath):
-            raise Exception("Given destination filepath '" + filepath + "' already exists.")
-        if shotlist_id is not None and stage_id is not None and shot_id is not None:
-            url = _url_from_args(
-                'shotList', shotlist_id, 'stage', stage_id, 'shot', shot_id, 'stbsheet', stbsheet_id, 'dl')
-            self._rmtservice.download(url, filepath)
-        elif custom_shot_id is not None:
-            url = _url_from_args('shotList', 'stage', 'shot_c', 'stbsheet', stbsheet_id, 'dl')
-            jsondata = json.dumps(dict(customId=custom_shot_id))
-            self._rmtservice.download(url, filepath, body=jsondata)
-        else:
-            raise Exception(_ERROR_MSG_SHOT_IDS)
+        url, body = _stbimage_download_args(stbsheet_id, shotlist_id, stage_id, shot_id, custom_shot_id)
+        self._download_file(url, body, filepath)
+
+    def open_stbimage(self, stbsheet_id, shotlist_id=None, stage_id=None, shot_id=None, custom_shot_id=None,
+                      buffersize=None):
+        """Returns a readable binary stream of the image of the specified 'StbSheet'.
+
+        Same as download_stbimage(..) but nothing is written to disk. See
+        open_assetfile(..) for the details of the returned stream.
+        """
+        url, body = _stbimage_download_args(stbsheet_id, shotlist_id, stage_id, shot_id, custom_shot_id)
+        return self._rmtservice.open_download(url, body=body, buffersize=buffersize)
 
             # ************************************************ goodies **********************************************************
 
@@ -2391,6 +3205,82 @@ def _check_file_samesize_existing(filepath, size):
     return False
 
 
+def _assetfile_download_args(appendage_id, fileversion, asset_list_id, asset_id, custom_asset_id, job_id, jobdef_id):
+    """Returns the tuple (url, body) for downloading the file of an asset appendage. """
+    jobordef = _job_or_def_id(jobdef_id, job_id)
+    if asset_list_id is not None and asset_id is not None:
+        url = _url_from_args('assetList', asset_list_id, 'asset', asset_id, 'job', jobordef['id'],
+                             jobordef['isDefId'], 'appendage', appendage_id, 'dl', fileversion)
+        return url, None
+    elif custom_asset_id is not None:
+        url = _url_from_args('assetList', 'asset_c', 'job', jobordef['id'], jobordef['isDefId'],
+                             'appendage', appendage_id, 'dl', fileversion)
+        return url, json.dumps(dict(customId=custom_asset_id))
+    else:
+        raise Exception(_ERROR_MSG_ASSET_IDS)
+
+
+def _shotfile_download_args(appendage_id, fileversion, shotlist_id, stage_id, shot_id, custom_shot_id, job_id,
+                            jobdef_id):
+    """Returns the tuple (url, body) for downloading the file of a shot appendage. """
+    jobordef = _job_or_def_id(jobdef_id, job_id)
+    if shotlist_id is not None and stage_id is not None and shot_id is not None:
+        url = _url_from_args('shotList', shotlist_id, 'stage', stage_id, 'shot', shot_id, 'job', jobordef['id'],
+                             jobordef['isDefId'], 'appendage', appendage_id, 'dl', fileversion)
+        return url, None
+    elif custom_shot_id is not None:
+        url = _url_from_args('shotList', 'stage', 'shot_c', 'job', jobordef['id'], jobordef['isDefId'],
+                             'appendage', appendage_id, 'dl', fileversion)
+        return url, json.dumps(dict(customId=custom_shot_id))
+    else:
+        raise Exception(_ERROR_MSG_SHOT_IDS)
+
+
+def _stbimage_download_args(stbsheet_id, shotlist_id, stage_id, shot_id, custom_shot_id):
+    """Returns the tuple (url, body) for downloading the image of a storyboard sheet. """
+    if shotlist_id is not None and stage_id is not None and shot_id is not None:
+        url = _url_from_args(
+            'shotList', shotlist_id, 'stage', stage_id, 'shot', shot_id, 'stbsheet', stbsheet_id, 'dl')
+        return url, None
+    elif custom_shot_id is not None:
+        url = _url_from_args('shotList', 'stage', 'shot_c', 'stbsheet', stbsheet_id, 'dl')
+        return url, json.dumps(dict(customId=custom_shot_id))
+    else:
+        raise Exception(_ERROR_MSG_SHOT_IDS)
+
+
+@contextlib.contextmanager
+def _upload_body(filepath, data):
+    """Context manager returning the upload body: either the opened `filepath` or the `data`. """
+    if data is not None:
+        if filepath is not None:
+            raise Exception("You must either specify the filepath or the data but not both.")
+        yield data
+    else:
+        with open(filepath, 'rb') as file:
+            yield file
+
+
+def _write_file_manifest(filepath, filechecksum, manifest):
+    if manifest:
+        filepath = os.fsdecode(filepath)
+        _checksum.update_manifest(_checksum.manifest_path(filepath, filechecksum.algorithm),
+                                  {os.path.basename(filepath): filechecksum.hexdigest()})
+
+
+def _write_folder_manifest(folderpath, algorithm, digests, manifest):
+    if manifest and algorithm is not None and len(digests) > 0:
+        _checksum.update_manifest(_checksum.manifest_path(folderpath, algorithm), digests)
+
+
+def _upload_filename(filepath, filename):
+    if filename is not None:
+        return filename
+    if filepath is None:
+        raise Exception("The filename must be specified for uploads from data.")
+    return os.path.basename(filepath)
+
+
 def _job_or_def_id(jobdef_id, job_id):
     if jobdef_id is not None:
         return {'id': jobdef_id, 'isDefId': True}
@@ -2507,6 +3397,50 @@ def _asset_relation_from_rawjson(list_assetlistid_assetids):
     return dct
 
 
+class _PriorityContext:
+
+    def __init__(self, rmtservice, priority):
+        self._rmtservice = rmtservice
+        self._priority = priority
+        self._previous = None
+
+    def __enter__(self):
+        self._previous = self._rmtservice.priority
+        self._rmtservice.priority = self._priority
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._rmtservice.priority = self._previous
+
+
+class _BandwidthContext:
+
+    def __init__(self, limits, upload, download):
+        self._limits = limits
+        self._upload = upload
+        self._download = download
+        self._previous = None
+
+    def __enter__(self):
+        self._previous = self._limits.set_operation_limits(self._upload, self._download)
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._limits.set_operation_limits(*self._previous)
+
+
+class _ProgressContext:
+
+    def __init__(self, limits, callback):
+        self._limits = limits
+        self._callback = callback
+        self._previous = None
+
+    def __enter__(self):
+        self._previous = self._limits.set_progress(self._callback)
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._limits.set_progress(self._previous)
+
+
 def _url_from_args(*args, sep="/"):
     url = ""
     for arg in args:
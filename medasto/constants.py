@@ -29,6 +29,12 @@ APPENDAGETYPE_FOLDER = 2    # ..A folder containing a substrucure with files and
 APPENDAGETYPE_IMAGESEQ = 3  # ..An image sequence. FILEVERSION_PREVIEW will be a video wihtout audio in that case.
 
 
+# priority classes of requests. See ClientService.priority(..)
+PRIORITY_INTERACTIVE = 1    # ..somebody waits for the result (GUI tools)
+PRIORITY_NORMAL = 2         # ..default
+PRIORITY_BULK = 3           # ..background transfers like prefetching thumbnails
+
+
 EMPTYVALUE = -1  # Some methods accept this value in order to remove an entry.
 
 
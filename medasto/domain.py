@@ -210,6 +210,10 @@ class Message:
         self.msgtext = msgtext
         self.author = author
 
+    def get_status_id(self):
+        """Returns the `statusid`. So Messages and 'Appendage's can be treated alike as job entries. """
+        return self.statusid
+
     def __str__(self):
         return _tostring('Message',
                          'msgid', self.msgid,
@@ -360,7 +364,7 @@ class Job:
         else:
             for jobentry in reversed(self.entry_list):
                 if isinstance(jobentry, Appendage):
-                    if jobentry.isfrozen():
+                    if jobentry.isfrozen:
                         continue  # ignore this frozen appendage
                 return jobentry  # could be a GlobalMessage or an Appendage.
         return None
@@ -378,7 +382,7 @@ class Job:
         """
         for jobentry in reversed(self.entry_list):
             if isinstance(jobentry, Appendage):
-                if (not includefrozen) and jobentry.isfrozen():
+                if (not includefrozen) and jobentry.isfrozen:
                     continue  # ignore this frozen appendage
                 return jobentry
         return None
@@ -424,7 +428,7 @@ class Job:
         b) the entry exists but is not of type 'Message' (then it is an 'Appendage').
         """
         for jobentry in self.entry_list:
-            if isinstance(jobentry, Message) and jobentry.messageid == messageid:
+            if isinstance(jobentry, Message) and jobentry.msgid == messageid:
                 return jobentry
         return None
 
@@ -0,0 +1,477 @@
+"""Public module containing a local gateway to the Medasto server.
+
+If several tools on the same workstation talk to Medasto then each of them
+needs its own 'ClientService' and therefore its own login and its own user
+(see the section "Concurrency" in the doc string of the module clientservice).
+The 'GatewayServer' runs in one process and serves all local tools through a
+Unix domain socket. It holds a 'sessionpool.SessionPool' and forwards the
+requests of its clients to the matching project bound session:
+
+    # gateway process
+    pool = medasto.sessionpool.SessionPool("customerid", [('apiuser1', 'pw1'), ('apiuser2', 'pw2')])
+    server = medasto.gateway.GatewayServer("/tmp/medasto.sock", pool)
+    server.serve_forever()
+
+    # any local tool
+    medservice = medasto.gateway.GatewayClientService("/tmp/medasto.sock")
+    medservice.select_project(project_id)
+    shots = medservice.get_shots_from_shotlist(shotlist_id)
+
+'GatewayClientService' is a 'ClientService' and provides all of its service
+methods. Unlike the 'ClientService' each instance (and even each thread) can
+work on its own project because the project is sent along with each request.
+
+The gateway reduces the latency of its clients in two ways:
+    1) Identical reads (GET requests) that arrive at the same time are only
+    sent once to the Medasto server. All clients receive the same response.
+    2) Responses of metadata requests which rarely change (status lists, job
+    definitions, text containers, ..) are cached for `metadatattl` seconds and
+    shared by all clients.
+
+The socket file is created with permissions for the current user only. Unix
+domain sockets are not available on all versions of Windows.
+"""
+import contextlib
+import json
+import os
+import shutil
+import socket
+import socketserver
+import struct
+import tempfile
+import threading
+import time
+from . import _folderscan
+from . import _remoteservice
+from . import _singleflight
+from . import _transfer
+from . import _transportstats
+from . import _uploadjournal
+from . import clientservice
+from . import constants
+
+__author__ = 'Michael Krotky'
+
+# routes (see module _transportstats) whose responses are cached by the gateway
+METADATA_ROUTES = frozenset([
+    'project-list', 'assetListIC', 'assetList/#/statusList', 'assetList/#/jobDefList',
+    'shotStatusList', 'shotJobDefList', 'tcList/#', 'tpList/#', 'atpList/#', 'pathManagerConfig'])
+
+_LENGTH = struct.Struct('>I')
+_CHUNKSIZE = 64 * 1024
+_SPOOL_MAX_SIZE = 8 * 1024 * 1024  # upload bodies up to this size are kept in memory
+
+
+class GatewayServer:
+    """Serves the requests of 'GatewayClientService' instances.
+
+    See the doc string of this module for more info.
+    """
+
+    def __init__(self, socketpath, sessionpool, metadatattl=300):
+        """Binds the socket. Doesn't send any requests to the Medasto server.
+
+        `socketpath` (str) - path of the Unix domain socket. An existing file
+        at this path is replaced.
+
+        `sessionpool` ('sessionpool.SessionPool') - the sessions used for
+        forwarding the requests.
+
+        `metadatattl` (float) - seconds the responses of METADATA_ROUTES are
+        cached. 0 disables the cache.
+        """
+        self.socketpath = socketpath
+        self.metadatattl = metadatattl
+        self._pool = sessionpool
+        self._singleflight = _singleflight.SingleFlight()
+        self._cache = {}  # key: request key, value: (expiry time, response)
+        self._cachelock = threading.Lock()
+        self._counterlock = threading.Lock()
+        self._requests = 0
+        self._cachehits = 0
+
+        if os.path.exists(socketpath):
+            os.remove(socketpath)
+        self._server = _UnixServer(socketpath, _Handler, bind_and_activate=False)
+        self._server.gateway = self
+        try:
+            # restricted before listen() so no other user can connect in between
+            self._server.server_bind()
+            os.chmod(socketpath, 0o600)
+            self._server.server_activate()
+        except:
+            self._server.server_close()
+            raise
+
+    def serve_forever(self):
+        """Handles requests until shutdown() is called. """
+        self._server.serve_forever()
+
+    def start(self):
+        """Runs serve_forever() in a daemon thread and returns that thread. """
+        thread = threading.Thread(target=self.serve_forever, name='medasto-gateway', daemon=True)
+        thread.start()
+        return thread
+
+    def shutdown(self):
+        """Stops serving, closes the socket and closes the sessionpool. """
+        self._server.shutdown()
+        self._server.server_close()
+        self._pool.close()
+        try:
+            os.remove(self.socketpath)
+        except OSError:
+            pass
+
+    def stats(self):
+        """Returns a dict {'requests': int, 'coalesced': int, 'cachehits': int}. """
+        with self._counterlock:
+            return {'requests': self._requests, 'coalesced': self._singleflight.saved,
+                    'cachehits': self._cachehits}
+
+    def _count(self, cachehit=False):
+        with self._counterlock:
+            self._requests += 1
+            if cachehit:
+                self._cachehits += 1
+
+    def _request(self, header, body):
+        """Returns the response (str or bytes) of the forwarded request. """
+        projectid = header['projectid']
+        args = (header['url'], header['method'], body, header['contenttype'], header['accept'],
+                header['headers'], header['decode'])
+        if header['method'] != 'GET' or hasattr(body, 'read'):
+            self._count()
+            return self._forward(projectid, args)
+
+        key = (projectid, header['url'], body, header['contenttype'], header['accept'],
+               json.dumps(header['headers'], sort_keys=True), header['decode'])
+        ismetadata = self.metadatattl > 0 and _transportstats.route_of(header['url']) in METADATA_ROUTES
+        if ismetadata:
+            with self._cachelock:
+                entry = self._cache.get(key)
+                if entry is not None and entry[0] > time.monotonic():
+                    self._count(cachehit=True)
+                    return entry[1]
+        self._count()
+        result = self._singleflight.do(key, lambda: self._forward(projectid, args))
+        if ismetadata:
+            with self._cachelock:
+                self._cache[key] = (time.monotonic() + self.metadatattl, result)
+        return result
+
+    def _forward(self, projectid, args):
+        with self._pool.project(projectid) as service:
+            return service._rmtservice.request(*args)
+
+    def _download(self, header, body, wfile):
+        """Downloads into a temp file and sends it as frames to the client. """
+        self._count()
+        tmpdir = tempfile.mkdtemp(prefix='medasto-gateway-')
+        try:
+            tmppath = os.path.join(tmpdir, 'download')
+            with self._pool.project(header['projectid']) as service:
+                service._rmtservice.download(header['url'], tmppath, header['method'], body, header['contenttype'],
+                                             header['accept'], header['headers'])
+            _send_msg(wfile, {'ok': True, 'kind': 'frames'})
+            with open(tmppath, 'rb') as file:
+                _send_frames(wfile, file)
+        finally:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+    def _select(self, header):
+        # acquiring the project makes sure it exists and the user has access to it
+        with self._pool.project(header['projectid']):
+            pass
+
+
+class GatewayClientService(clientservice.ClientService):
+    """'ClientService' whose requests are served by a local 'GatewayServer'.
+
+    Doesn't need any credentials. Each thread uses its own connection to the
+    gateway and can select its own project. See the doc string of this module
+    for more info.
+    """
+
+    def __init__(self, socketpath, uploadjournalpath=None, scanworkers=None, scancache=False):
+        """Doesn't connect to the gateway until the first service method call.
+
+        `uploadjournalpath` (str), `scanworkers` (int), `scancache` (bool) - see the constructor of 'ClientService'.
+        """
+        self._rmtservice = _GatewayRemoteService(socketpath)
+        if uploadjournalpath is not None:
+            self._uploadjournal = _uploadjournal.UploadJournal(uploadjournalpath)
+        if scanworkers is not None or scancache:
+            self._folderscanner = _folderscan.FolderScanner(scanworkers, scancache)
+
+    def select_project(self, projectid):
+        """Selects the project for all future calls of the current thread. """
+        self._rmtservice.select_project(projectid)
+
+
+class _GatewayRemoteService:
+    """Stands in for the '_remoteservice.RemoteService' of a 'GatewayClientService'. """
+
+    def __init__(self, socketpath):
+        self.socketpath = socketpath
+        self.transport_stats = _transportstats.TransportStats()  # stays empty. The gateway does the transport.
+        self.coalesced_requests = 0  # coalescing happens within the gateway. See GatewayServer.stats()
+        self.bandwidth = _transfer.BandwidthLimits()  # not enforced. The gateway does the transport.
+        self._local = threading.local()
+
+    @property
+    def current_projectid(self):
+        return getattr(self._local, 'projectid', None)
+
+    @property
+    def priority(self):
+        # the gateway doesn't schedule by priority. Kept for ClientService.priority(..)
+        return getattr(self._local, 'priority', constants.PRIORITY_NORMAL)
+
+    @priority.setter
+    def priority(self, priority):
+        self._local.priority = priority
+
+    def flow_stats(self):
+        return {'rate': None, 'limit': None, 'inflight': None, 'connections': None}
+
+    def connect(self):
+        self._connection()
+
+    def close(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            self._local.connection = None
+            connection.close()
+
+    def select_project(self, projectid):
+        self._roundtrip({'op': 'select', 'projectid': projectid}, None)
+        self._local.projectid = projectid
+
+    def request(self, url, method='GET', body=None, contenttype='application/json', accept='application/json',
+                extra_headers=None, decode_response=True):
+        header = {'op': 'request', 'projectid': self.current_projectid, 'url': url, 'method': method,
+                  'contenttype': contenttype, 'accept': accept, 'headers': extra_headers,
+                  'decode': decode_response}
+        response, rfile = self._roundtrip(header, body)
+        if response['kind'] == 'text':
+            return response['text']
+        return b''.join(_recv_frames(rfile))
+
+    def request_json(self, url, method='GET', body=None, object_hook=None):
+        # the gateway caches the metadata itself. See METADATA_ROUTES.
+        return json.loads(self.request(url, method, body), object_hook=object_hook)
+
+    def conditional_stats(self):
+        return None
+
+    def download(self, url, filepath, method='GET', body=None, contenttype='application/json',
+                 accept='application/json, application/octet-stream', extra_headers=None, hasher=None):
+        file = open(filepath, 'xb')
+        try:
+            with file:
+                self.download_to(url, file, method, body, contenttype, accept, extra_headers, hasher=hasher)
+        except:
+            try:
+                os.remove(filepath)
+            except OSError:
+                pass
+            raise
+
+    def download_to(self, url, fileobj, method='GET', body=None, contenttype='application/json',
+                    accept='application/json, application/octet-stream', extra_headers=None, chunksize=None,
+                    hasher=None):
+        with contextlib.closing(self.iter_download(url, method, body, contenttype, accept, extra_headers)) as chunks:
+            for chunk in chunks:
+                if hasher is not None:
+                    hasher.update(chunk)
+                fileobj.write(chunk)
+
+    def iter_download(self, url, method='GET', body=None, contenttype='application/json',
+                      accept='application/json, application/octet-stream', extra_headers=None, chunksize=None,
+                      reusebuffer=False):
+        """Yields the frames sent by the gateway. `chunksize` and `reusebuffer` are ignored. """
+        header = {'op': 'download', 'projectid': self.current_projectid, 'url': url, 'method': method,
+                  'contenttype': contenttype, 'accept': accept, 'headers': extra_headers}
+        response, rfile = self._roundtrip(header, body)
+        complete = False
+        try:
+            for chunk in _recv_frames(rfile):
+                yield chunk
+            complete = True
+        finally:
+            if not complete:
+                self.close()  # the connection is in an undefined state
+
+    def open_download(self, url, method='GET', body=None, contenttype='application/json',
+                      accept='application/json, application/octet-stream', extra_headers=None,
+                      buffersize=None):
+        if buffersize is None:
+            buffersize = _CHUNKSIZE
+        return _transfer.DownloadStream(
+            self.iter_download(url, method, body, contenttype, accept, extra_headers), buffersize)
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = _ClientConnection(self.socketpath)
+            self._local.connection = connection
+        return connection
+
+    def _roundtrip(self, header, body):
+        """Sends the request and returns the tuple (response header, rfile). Raises the remote errors. """
+        try:
+            connection = self._connection()
+            _send_request(connection.wfile, header, body)
+            response = _recv_msg(connection.rfile)
+        except (OSError, EOFError) as ex:
+            self.close()
+            raise _remoteservice.ConnectionMedEx("No connection to the gateway " + self.socketpath) from ex
+        if not response['ok']:
+            raise _exception_from_response(response)
+        return response, connection.rfile
+
+
+class _ClientConnection:
+
+    def __init__(self, socketpath):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self.sock.connect(socketpath)
+        except:
+            self.sock.close()
+            raise
+        self.rfile = self.sock.makefile('rb')
+        self.wfile = self.sock.makefile('wb')
+
+    def close(self):
+        for closeable in (self.rfile, self.wfile, self.sock):
+            try:
+                closeable.close()
+            except OSError:
+                pass
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """Handles all requests of one client connection. """
+
+    def handle(self):
+        gateway = self.server.gateway
+        while True:
+            try:
+                header = _recv_msg(self.rfile)
+            except EOFError:
+                return
+            body = _recv_body(self.rfile, header)
+            try:
+                if header['op'] == 'request':
+                    result = gateway._request(header, body)
+                    if isinstance(result, str):
+                        _send_msg(self.wfile, {'ok': True, 'kind': 'text', 'text': result})
+                    else:
+                        _send_msg(self.wfile, {'ok': True, 'kind': 'frames'})
+                        _send_frames(self.wfile, [result])
+                elif header['op'] == 'download':
+                    gateway._download(header, body, self.wfile)
+                elif header['op'] == 'select':
+                    gateway._select(header)
+                    _send_msg(self.wfile, {'ok': True, 'kind': 'none'})
+                else:
+                    raise Exception("Unknown operation: " + str(header['op']))
+            except (OSError, EOFError):
+                return  # client is gone
+            except Exception as ex:
+                _remoteservice.RemoteService.logger.info("Error while serving a gateway request.", exc_info=True)
+                _send_msg(self.wfile, {'ok': False, 'error': type(ex).__name__, 'message': str(ex)})
+            finally:
+                if hasattr(body, 'close'):
+                    body.close()
+
+
+# ************************************************ wire format **********************************************************
+#
+# Each message is a JSON object preceded by its length (4 bytes, big endian). Binary payloads (upload bodies,
+# downloads, bytes responses) follow the message as frames: length (4 bytes) + data. A frame of length 0 ends them.
+
+
+def _send_msg(wfile, dct):
+    data = json.dumps(dct).encode('UTF-8')
+    wfile.write(_LENGTH.pack(len(data)))
+    wfile.write(data)
+    wfile.flush()
+
+
+def _recv_msg(rfile):
+    data = _read_exactly(rfile, _LENGTH.unpack(_read_exactly(rfile, _LENGTH.size))[0])
+    return json.loads(data.decode('UTF-8'))
+
+
+def _send_frames(wfile, chunks_or_file):
+    if hasattr(chunks_or_file, 'read'):
+        chunks = iter(lambda: chunks_or_file.read(_CHUNKSIZE), b'')
+    else:
+        chunks = chunks_or_file
+    for chunk in chunks:
+        chunk = memoryview(chunk).cast('B')  # the length must be counted in bytes
+        if len(chunk) > 0:
+            wfile.write(_LENGTH.pack(len(chunk)))
+            wfile.write(chunk)
+    wfile.write(_LENGTH.pack(0))
+    wfile.flush()
+
+
+def _recv_frames(rfile):
+    while True:
+        length = _LENGTH.unpack(_read_exactly(rfile, _LENGTH.size))[0]
+        if length == 0:
+            return
+        yield _read_exactly(rfile, length)
+
+
+def _send_request(wfile, header, body):
+    header = dict(header)
+    if body is None:
+        header['body'] = 'none'
+        _send_msg(wfile, header)
+    elif isinstance(body, str):
+        header['body'] = 'text'
+        header['text'] = body
+        _send_msg(wfile, header)
+    else:
+        header['body'] = 'frames'
+        _send_msg(wfile, header)
+        if isinstance(body, (bytes, bytearray, memoryview)):
+            body = [body]
+        _send_frames(wfile, body)  # a file object or an iterable of chunks (list, generator, ..)
+
+
+def _recv_body(rfile, header):
+    """Returns None, a str or a (spooled) temporary file positioned at 0. """
+    kind = header.get('body', 'none')
+    if kind == 'text':
+        return header['text']
+    if kind == 'frames':
+        spool = tempfile.SpooledTemporaryFile(max_size=_SPOOL_MAX_SIZE)
+        for chunk in _recv_frames(rfile):
+            spool.write(chunk)
+        spool.seek(0)
+        return spool
+    return None
+
+
+def _read_exactly(rfile, size):
+    data = rfile.read(size)
+    if len(data) < size:
+        raise EOFError("Connection closed by the other side.")
+    return data
+
+
+def _exception_from_response(response):
+    clazz = getattr(_remoteservice, response['error'], None)
+    if isinstance(clazz, type) and issubclass(clazz, _remoteservice.MedastoException):
+        return clazz(response['message'])
+    return Exception(response['error'] + ": " + response['message'])
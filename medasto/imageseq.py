@@ -0,0 +1,183 @@
+"""Public module finding image sequences in a folder.
+
+The image sequence methods of the 'ClientService' need the names of all images:
+
+    seq = medasto.imageseq.find_sequence("/renders/sh010/comp_v003")
+    appendage_id = medservice.update_shotjob_addappendage_imageseq("comp v003", status_id, seq.name, 24, ..)
+    uploadjob_id = medservice.update_shotjob_init_imageseq_upload(seq, True, appendage_id, ..)
+    medservice.upload_imageseq_allfiles(uploadjob_id, seq.folderpath)
+
+find_sequences(..) groups all files of a folder into 'ImageSequence' objects.
+Files belong to the same sequence if their names only differ in the frame
+number, which is the last group of digits in front of the extension:
+
+    comp_v003.1001.exr, comp_v003.1002.exr, ..  ->  'comp_v003.####.exr' 1001-1100
+
+Padded frame numbers (1001, 0001) keep their width. Unpadded ones (1, 2, .., 10)
+form a sequence with the padding 1. Files without a frame number are ignored.
+
+The frame ranges and gaps of a sequence are available as lists of (first, last)
+tuples and as compact strings like "1001-1049,1051-1100". Note: The server
+expects the complete list of file names. So an 'ImageSequence' is sent as such.
+"""
+import os
+import re
+
+__author__ = 'Michael Krotky'
+
+_FRAME_PATTERN = re.compile(r'^(.*?)(\d+)(\.[^.\d][^.]*)$')
+
+
+class ImageSequence:
+    """Image files of a folder whose names differ only in the frame number.
+
+    Can be passed to update_*_init_imageseq_upload(..) of 'ClientService'
+    instead of the list of file names.
+    """
+
+    def __init__(self, folderpath, prefix, padding, extension, framefiles):
+        """Usually created by find_sequences(..).
+
+        `framefiles` (dict) - key: frame number (int), value: file name.
+        """
+        self.folderpath = folderpath
+        self.prefix = prefix
+        self.padding = padding
+        self.extension = extension
+        self._framefiles = framefiles
+        self.frames = sorted(framefiles)
+
+    @property
+    def name(self):
+        """The prefix without trailing separators or (if empty) the name of the folder. Suitable as `seqname`. """
+        name = self.prefix.rstrip('._- ')
+        return name if name else os.path.basename(os.path.abspath(self.folderpath))
+
+    @property
+    def pattern(self):
+        """The file names with '#' for each digit of the padding ('comp.####.exr'). """
+        return self.prefix + '#' * self.padding + self.extension
+
+    @property
+    def filenames(self):
+        """The names of all images ordered by frame. """
+        return [self._framefiles[frame] for frame in self.frames]
+
+    @property
+    def first(self):
+        return self.frames[0]
+
+    @property
+    def last(self):
+        return self.frames[-1]
+
+    @property
+    def ranges(self):
+        """list[ tuple(first, last), ..] of the contiguous frame ranges. """
+        return _ranges(self.frames)
+
+    @property
+    def gaps(self):
+        """list[ tuple(first, last), ..] of the missing frames between first and last. """
+        ranges = self.ranges
+        return [(ranges[i][1] + 1, ranges[i + 1][0] - 1) for i in range(len(ranges) - 1)]
+
+    def framerange(self):
+        """Returns the frames as compact string like "1001-1049,1051,1053-1100". """
+        return format_ranges(self.ranges)
+
+    def filename(self, frame):
+        """Returns the file name of the given frame or None if the frame is missing. """
+        return self._framefiles.get(frame)
+
+    def filepaths(self):
+        """Returns the paths of all images ordered by frame. """
+        return [os.path.join(self.folderpath, name) for name in self.filenames]
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __iter__(self):
+        return iter(self.filenames)
+
+    def __repr__(self):
+        return "ImageSequence('" + self.pattern + "', " + self.framerange() + ")"
+
+
+def find_sequences(folderpath, extensions=None, minframes=1):
+    """Returns the image sequences (list of 'ImageSequence') in the folder ordered by pattern.
+
+    Subfolders are not searched.
+
+    `extensions` (iterable) - only files with these extensions (like '.exr',
+    case insensitive). None means all.
+
+    `minframes` (int) - sequences with less frames are ignored. Use 2 to
+    skip single files like "notes_v2.txt".
+    """
+    if extensions is not None:
+        extensions = {extension.lower() for extension in extensions}
+    groups = {}
+    with os.scandir(folderpath) as entries:
+        for entry in entries:
+            match = _FRAME_PATTERN.match(entry.name)
+            if match is None or not entry.is_file():
+                continue
+            prefix, digits, extension = match.groups()
+            if extensions is not None and extension.lower() not in extensions:
+                continue
+            padded = len(digits) > 1 and digits[0] == '0'
+            key = (prefix, extension, len(digits) if padded else 0)
+            groups.setdefault(key, {})[int(digits)] = entry.name
+
+    # unpadded numbers of the width of a padded sequence belong to it (1000, 1001 next to 0998, 0999)
+    for (prefix, extension, padding), framefiles in list(groups.items()):
+        if padding == 0:
+            for frame in [frame for frame in framefiles if (prefix, extension, len(str(frame))) in groups]:
+                groups[(prefix, extension, len(str(frame)))][frame] = framefiles.pop(frame)
+
+    sequences = []
+    for (prefix, extension, padding), framefiles in groups.items():
+        if padding == 0 and framefiles:
+            padding = min(len(str(frame)) for frame in framefiles)
+        if framefiles and len(framefiles) >= minframes:
+            sequences.append(ImageSequence(folderpath, prefix, padding, extension, framefiles))
+    sequences.sort(key=lambda sequence: (sequence.pattern, sequence.first))
+    return sequences
+
+
+def find_sequence(folderpath, extensions=None):
+    """Returns the only image sequence in the folder. Raises an Exception if there is none or more than one. """
+    sequences = find_sequences(folderpath, extensions, minframes=1)
+    if len(sequences) != 1:
+        raise Exception("Expected exactly one image sequence in '" + folderpath + "' but found "
+                        + str(len(sequences)) + ": " + ", ".join(sequence.pattern for sequence in sequences))
+    return sequences[0]
+
+
+def format_ranges(ranges):
+    """Returns the list of (first, last) tuples as string like "1001-1049,1051,1053-1100". """
+    return ",".join(str(first) if first == last else str(first) + "-" + str(last) for first, last in ranges)
+
+
+def parse_ranges(text):
+    """Returns the list of frames (int) of a string like "1001-1049,1051,1053-1100". """
+    frames = []
+    for part in text.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        first, sep, last = part.partition('-')
+        frames.extend(range(int(first), int(last if sep else first) + 1))
+    return frames
+
+
+def _ranges(frames):
+    ranges = []
+    for frame in frames:
+        if ranges and frame == ranges[-1][1] + 1:
+            ranges[-1][1] = frame
+        else:
+            ranges.append([frame, frame])
+    return [tuple(r) for r in ranges]
+
@@ -0,0 +1,315 @@
+"""Public module containing a caching HTTP proxy for appendage files.
+
+If many people in the same location open the same file (for example the
+PREVIEW movie of a shot during a review) then each of them downloads it
+separately from the Medasto server. The 'MediaProxyServer' runs on a machine in
+the local network, downloads each file only once and serves it to all clients
+from a disk cache:
+
+    pool = medasto.sessionpool.SessionPool("customerid", [('apiuser1', 'pw1'), ('apiuser2', 'pw2')])
+    proxy = medasto.mediaproxy.MediaProxyServer(('0.0.0.0', 8642), pool, "/var/cache/medasto")
+    proxy.serve_forever()
+
+The clients (players, browsers, ..) request the files with plain HTTP GET:
+
+    /p/<project_id>/shot/<shotlist_id>/<stage_id>/<shot_id>/job/<job_id>/<appendage_id>/<fileversion>
+    /p/<project_id>/shot/<shotlist_id>/<stage_id>/<shot_id>/jobdef/<jobdef_id>/<appendage_id>/<fileversion>
+    /p/<project_id>/asset/<asset_list_id>/<asset_id>/job/<job_id>/<appendage_id>/<fileversion>
+    /p/<project_id>/asset/<asset_list_id>/<asset_id>/jobdef/<jobdef_id>/<appendage_id>/<fileversion>
+
+`fileversion` is one of the constants constants.FILEVERSION_*. Byte ranges
+(the HTTP header "Range") are supported so players can scrub through movies.
+If several clients request the same file which is not cached yet then it is
+downloaded only once and all of them wait for that download.
+
+Note: A file that is not cached yet is downloaded completely before the first
+byte is served, even for a byte range. So scrubbing through a large movie
+stalls on a cold cache until the whole movie has arrived.
+
+The cache is limited to `maxcachesize` bytes. The least recently used files are
+deleted first. Files are identified by project, appendage and file version. So
+it is assumed that the files of an appendage don't change.
+
+The proxy doesn't check any permissions of its clients. Everybody who can reach
+the port can download all appendages the users of the 'SessionPool' can access.
+So bind it to a trusted network only.
+"""
+import collections
+import hashlib
+import http.server
+import os
+import re
+import shutil
+import socketserver
+import tempfile
+import threading
+from . import _remoteservice
+from . import _singleflight
+
+__author__ = 'Michael Krotky'
+
+_PATH_PATTERN = re.compile(
+    r'^/p/(?P<pid>\d+)/(?:shot/(?P<shotlist>\d+)/(?P<stage>\d+)/(?P<shot>\d+)|asset/(?P<assetlist>\d+)/(?P<asset>\d+))'
+    r'/(?P<jobkind>job|jobdef)/(?P<job>\d+)/(?P<appendage>\d+)/(?P<fileversion>\d+)/?$')
+_RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+_CHUNKSIZE = 64 * 1024
+_OPEN_ATTEMPTS = 3  # a file evicted between lookup and open is fetched again
+
+
+class MediaProxyServer:
+    """Serves appendage files to the local network from a disk cache.
+
+    See the doc string of this module for more info.
+    """
+
+    def __init__(self, address, sessionpool, cachedir, maxcachesize=10 * 1024 ** 3):
+        """Binds the HTTP server. Doesn't send any requests to the Medasto server.
+
+        `address` (tuple) - (host, port) to listen on.
+
+        `sessionpool` ('sessionpool.SessionPool') - the sessions used for the
+        downloads.
+
+        `cachedir` (str) - folder of the disk cache. It is created if necessary.
+        Files from a previous run are reused.
+
+        `maxcachesize` (int) - maximum size of the cache in bytes.
+        """
+        self._pool = sessionpool
+        self._cache = _DiskCache(cachedir, maxcachesize)
+        self._singleflight = _singleflight.SingleFlight()
+        self._counterlock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._server = _HTTPServer(address, _Handler)
+        self._server.proxy = self
+        self.address = self._server.server_address
+
+    def serve_forever(self):
+        """Handles requests until shutdown() is called. """
+        self._server.serve_forever()
+
+    def start(self):
+        """Runs serve_forever() in a daemon thread and returns that thread. """
+        thread = threading.Thread(target=self.serve_forever, name='medasto-mediaproxy', daemon=True)
+        thread.start()
+        return thread
+
+    def shutdown(self):
+        """Stops serving and closes the socket. The sessionpool is NOT closed. """
+        self._server.shutdown()
+        self._server.server_close()
+
+    def stats(self):
+        """Returns a dict {'hits': int, 'misses': int, 'coalesced': int, 'files': int, 'cachesize': int}. """
+        files, size = self._cache.usage()
+        with self._counterlock:
+            return {'hits': self._hits, 'misses': self._misses, 'coalesced': self._singleflight.saved,
+                    'files': files, 'cachesize': size}
+
+    def _cached_file(self, match):
+        """Returns the path of the cached file. Downloads it first if necessary. """
+        key = '/'.join((match.group('pid'), match.group('appendage'), match.group('fileversion')))
+        path = self._cache.get(key)
+        with self._counterlock:
+            if path is not None:
+                self._hits += 1
+            else:
+                self._misses += 1
+        if path is None:
+            path = self._singleflight.do(key, lambda: self._fetch(key, match))
+        return path
+
+    def _fetch(self, key, match):
+        path = self._cache.get(key)  # might have been added in the meantime
+        if path is not None:
+            return path
+        tmpdir = tempfile.mkdtemp(prefix='download-', dir=self._cache.cachedir)
+        try:
+            tmppath = os.path.join(tmpdir, 'file')
+            jobargs = {'job_id' if match.group('jobkind') == 'job' else 'jobdef_id': int(match.group('job'))}
+            with self._pool.project(int(match.group('pid'))) as service:
+                if match.group('shotlist') is not None:
+                    service.download_shotfile(tmppath, int(match.group('appendage')), int(match.group('fileversion')),
+                                              shotlist_id=int(match.group('shotlist')),
+                                              stage_id=int(match.group('stage')),
+                                              shot_id=int(match.group('shot')), **jobargs)
+                else:
+                    service.download_assetfile(tmppath, int(match.group('appendage')), int(match.group('fileversion')),
+                                               asset_list_id=int(match.group('assetlist')),
+                                               asset_id=int(match.group('asset')), **jobargs)
+            return self._cache.put(key, tmppath)
+        finally:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+class _DiskCache:
+    """Size bounded LRU cache of files. """
+
+    def __init__(self, cachedir, maxsize):
+        if not os.path.isdir(cachedir):
+            os.makedirs(cachedir, mode=0o700)
+        self.cachedir = cachedir
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()  # key: filename, value: size. Least recently used first.
+        self._size = 0
+        self._load()
+
+    def get(self, key):
+        """Returns the path of the cached file or None. """
+        filename = _filename(key)
+        with self._lock:
+            if filename not in self._entries:
+                return None
+            self._entries.move_to_end(filename)
+        return os.path.join(self.cachedir, filename)
+
+    def put(self, key, srcpath):
+        """Moves the file at `srcpath` into the cache and returns its new path. """
+        filename = _filename(key)
+        path = os.path.join(self.cachedir, filename)
+        size = os.path.getsize(srcpath)
+        os.replace(srcpath, path)
+        with self._lock:
+            self._size += size - self._entries.pop(filename, 0)
+            self._entries[filename] = size
+            self._evict_locked(keep=filename)
+        return path
+
+    def usage(self):
+        """Returns the tuple (number of files, total size in bytes). """
+        with self._lock:
+            return len(self._entries), self._size
+
+    def _evict_locked(self, keep):
+        for filename in list(self._entries):
+            if self._size <= self.maxsize:
+                return
+            if filename == keep:
+                continue
+            try:
+                # files currently being sent stay readable on POSIX systems
+                os.remove(os.path.join(self.cachedir, filename))
+            except OSError:
+                continue
+            self._size -= self._entries.pop(filename)
+
+    def _load(self):
+        entries = []
+        for entry in os.scandir(self.cachedir):
+            if entry.is_dir():
+                shutil.rmtree(entry.path, ignore_errors=True)  # leftovers of interrupted downloads
+            elif entry.name.endswith('.media'):
+                stat = entry.stat()
+                entries.append((stat.st_atime, entry.name, stat.st_size))
+        for atime, filename, size in sorted(entries):
+            self._entries[filename] = size
+            self._size += size
+        with self._lock:
+            self._evict_locked(keep=None)
+
+
+def _filename(key):
+    return hashlib.sha1(key.encode('UTF-8')).hexdigest() + '.media'
+
+
+class _HTTPServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self._serve(send_body=True)
+
+    def do_HEAD(self):
+        self._serve(send_body=False)
+
+    def log_message(self, format, *args):
+        _remoteservice.RemoteService.logger.debug("mediaproxy %s - " + format, self.address_string(), *args)
+
+    def _serve(self, send_body):
+        match = _PATH_PATTERN.match(self.path.split('?')[0])
+        if match is None:
+            return self._send_error(404, "Unknown path.")
+        for attempt in range(_OPEN_ATTEMPTS):
+            try:
+                path = self.server.proxy._cached_file(match)
+            except _remoteservice.InsuffAuthMedEx as ex:
+                return self._send_error(403, str(ex))
+            except Exception as ex:
+                _remoteservice.RemoteService.logger.info("Error while fetching " + self.path, exc_info=True)
+                return self._send_error(502, type(ex).__name__ + ": " + str(ex))
+            try:
+                file = open(path, 'rb')
+                break
+            except FileNotFoundError:
+                continue  # evicted by another request in the meantime. So fetch it again..
+        else:
+            return self._send_error(503, "The file was evicted from the cache before it could be served.")
+
+        with file:
+            size = os.fstat(file.fileno()).st_size
+            start, end = 0, size - 1
+            status = 200
+            byterange = _parse_range(self.headers.get('Range'), size)
+            if byterange is not False:
+                if byterange is None:
+                    self.send_response(416)
+                    self.send_header('Content-Range', 'bytes */' + str(size))
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                start, end = byterange
+                status = 206
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/octet-stream')
+            self.send_header('Accept-Ranges', 'bytes')
+            self.send_header('Content-Length', str(end - start + 1))
+            if status == 206:
+                self.send_header('Content-Range', 'bytes %d-%d/%d' % (start, end, size))
+            self.end_headers()
+            if send_body:
+                file.seek(start)
+                remaining = end - start + 1
+                while remaining > 0:
+                    chunk = file.read(min(_CHUNKSIZE, remaining))
+                    if not chunk:
+                        break
+                    self.wfile.write(chunk)
+                    remaining -= len(chunk)
+
+    def _send_error(self, status, message):
+        data = message.encode('UTF-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/plain; charset=UTF-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(data)
+
+
+def _parse_range(rangeheader, size):
+    """Returns the tuple (first byte, last byte), None if the range isn't satisfiable or False if the whole
+    file has to be sent (no range or a range that isn't supported like multiple ranges).
+    """
+    if rangeheader is None:
+        return False
+    match = _RANGE_PATTERN.match(rangeheader.strip())
+    if match is None or (match.group(1) == '' and match.group(2) == ''):
+        return False
+    if match.group(1) == '':
+        # suffix range: the last n bytes
+        length = min(int(match.group(2)), size)
+        if length == 0:
+            return None
+        return size - length, size - 1
+    start = int(match.group(1))
+    if match.group(2) != '' and int(match.group(2)) < start:
+        return False  # syntactically invalid (RFC 7233). So the header is ignored.
+    end = size - 1 if match.group(2) == '' else min(int(match.group(2)), size - 1)
+    if start >= size:
+        return None
+    return start, end
@@ -0,0 +1,178 @@
+"""Public module containing the 'SessionLeaseManager' class.
+
+Medasto allows only one session per user. If many processes (for example the
+workers of a render farm) each create their own 'ClientService' with the same
+credentials they keep on kicking each other out or fail with
+'UserSessionsExceededMedEx'. The 'SessionLeaseManager' coordinates these
+processes with lock files in a local folder:
+
+    credentials = [('apiuser1', 'pw1'), ('apiuser2', 'pw2')]
+    manager = medasto.sessionlease.SessionLeaseManager("customerid", credentials, "/var/lock/medasto")
+    with manager.lease(project_id) as medservice:
+        medservice.update_shotjob_addglobalmessage(..)
+
+Each pair of credentials has its own lock file. A worker holding the lock of
+a user is the only process that uses this user. When the lease ends the lock
+is released and the session is left in a session cache file within the same
+folder (see the section "Session cache" in the doc string of the module
+clientservice). The next worker leasing this user simply continues with that
+session. So logins only happen when a session has actually expired.
+
+If all users are leased the worker waits. Only one waiting process (the one
+holding the gate lock) polls the user locks. All other waiting processes are
+blocked by the operating system until it is their turn. Locks of crashed
+processes are released by the operating system as well.
+
+All processes must use the same `lockdir` and the same credentials in the same
+order. The folder must be on a local file system unless the network file
+system reliably supports file locks (fcntl.flock / msvcrt.locking).
+"""
+import hashlib
+import os
+import random
+import time
+from . import _filelock
+from . import clientservice
+
+__author__ = 'Michael Krotky'
+
+_GATE_FILENAME = 'gate.lock'
+_SESSIONCACHE_FILENAME = 'sessions.json'
+
+
+class SessionLeaseManager:
+    """Leases one of several API users to the calling process.
+
+    See the doc string of this module for more info.
+    """
+
+    MAX_POLL_INTERVAL = 0.25  # seconds between two polls of the process holding the gate
+
+    def __init__(self, customerid, credentials, lockdir, **serviceargs):
+        """Constructor. Doesn't send any requests to the server.
+
+        `customerid` (str) - unique id of your Medasto account.
+
+        `credentials` (list) - tuples (username, password). These users should
+        not be used anywhere else.
+
+        `lockdir` (str) - folder for the lock files and the session cache. It
+        is created if necessary (readable for the current user only).
+
+        `serviceargs` - further keyword arguments for the constructor of
+        'ClientService' (for example `waitaftererror`).
+        """
+        if len(credentials) == 0:
+            raise Exception("At least one pair of credentials is required.")
+        if not os.path.isdir(lockdir):
+            os.makedirs(lockdir, mode=0o700)
+        self.customerid = customerid
+        self.lockdir = lockdir
+        self._credentials = list(credentials)
+        self._serviceargs = serviceargs
+        self._sessioncachepath = os.path.join(lockdir, _SESSIONCACHE_FILENAME)
+        self._gatepath = os.path.join(lockdir, _GATE_FILENAME)
+
+    def lease(self, projectid=None, timeout=None):
+        """Context manager leasing a 'ClientService' of one of the users.
+
+            with manager.lease(project_id) as medservice:
+                ..
+
+        If `projectid` is not None then this project is selected before the
+        instance is returned.
+
+        Blocks until a user is available. If a `timeout` (seconds) is given
+        and no user became available within that time a TimeoutError is
+        raised.
+        """
+        return _Lease(self, projectid, timeout)
+
+    def acquire(self, projectid=None, timeout=None):
+        """Returns a tuple (ClientService, lease handle).
+
+        The handle must be passed to release(..) once the 'ClientService' is
+        not needed anymore. Prefer the context manager lease(..).
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        index_lock = self._try_lock_any()
+        if index_lock is None:
+            index_lock = self._wait_for_lock(deadline)
+
+        index, lock = index_lock
+        try:
+            username, password = self._credentials[index]
+            service = clientservice.ClientService(self.customerid, username, password,
+                                                  sessioncachepath=self._sessioncachepath, **self._serviceargs)
+            if projectid is not None:
+                service.select_project(projectid)
+        except:
+            lock.release()
+            raise
+        return service, _LeaseHandle(service, lock, username)
+
+    def release(self, handle):
+        """Ends the lease of the given handle (returned by acquire(..)). """
+        try:
+            handle.service.close()
+        finally:
+            handle.lock.release()
+
+    def _try_lock_any(self):
+        """Returns a tuple (index of the credentials, '_filelock.FileLock') or None. """
+        count = len(self._credentials)
+        # start at a random position so the first users aren't always tried first..
+        offset = random.randrange(count)
+        for i in range(count):
+            index = (offset + i) % count
+            lock = _filelock.FileLock(self._lockpath(index))
+            if lock.acquire(blocking=False):
+                return index, lock
+        return None
+
+    def _wait_for_lock(self, deadline):
+        gate = _filelock.FileLock(self._gatepath)
+        remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+        if not gate.acquire(timeout=remaining):
+            raise TimeoutError("No Medasto user available within the given timeout.")
+        try:
+            delay = 0.01
+            while True:
+                index_lock = self._try_lock_any()
+                if index_lock is not None:
+                    return index_lock
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise TimeoutError("No Medasto user available within the given timeout.")
+                time.sleep(delay)
+                delay = min(delay * 2, self.MAX_POLL_INTERVAL)
+        finally:
+            gate.release()
+
+    def _lockpath(self, index):
+        username = self._credentials[index][0]
+        digest = hashlib.sha1((self.customerid + '\0' + username).encode('UTF-8')).hexdigest()
+        return os.path.join(self.lockdir, 'user-' + digest[:16] + '.lock')
+
+
+class _LeaseHandle:
+
+    def __init__(self, service, lock, username):
+        self.service = service
+        self.lock = lock
+        self.username = username
+
+
+class _Lease:
+
+    def __init__(self, manager, projectid, timeout):
+        self._manager = manager
+        self._projectid = projectid
+        self._timeout = timeout
+        self._handle = None
+
+    def __enter__(self):
+        service, self._handle = self._manager.acquire(self._projectid, self._timeout)
+        return service
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._manager.release(self._handle)
@@ -0,0 +1,241 @@
+"""Public module containing the 'SessionPool' class.
+
+A 'ClientService' works on exactly one selected project at a time and Medasto
+allows only one session per user (see the sections "Concurrency" and "Session
+timeout" in the doc string of the module clientservice). Working on several
+projects in parallel therefore requires several users and one 'ClientService'
+per user. The 'SessionPool' manages these instances:
+
+    credentials = [('apiuser1', 'pw1'), ('apiuser2', 'pw2'), ('apiuser3', 'pw3')]
+    pool = medasto.sessionpool.SessionPool("customerid", credentials)
+    with pool.project(project_id) as medservice:
+        shots = medservice.get_shots_from_shotlist(shotlist_id)
+
+Each pair of credentials is used for at most one 'ClientService' so the pool
+never causes a 'UserSessionsExceededMedEx' by itself. A 'ClientService' that is
+bound to a project stays bound after the with-block. So the next lease of the
+same project is served without any request to the server. All threads leasing
+the same project share the same 'ClientService' instance (which is safe as
+long as nobody calls .select_project(..) on it - so don't!).
+
+If a project is requested that has no bound instance then a 'ClientService' is
+created with the next unused credentials. If all credentials are in use then
+the least recently used instance without active leases is switched to the
+requested project. If all instances are leased the caller waits until one
+becomes available.
+
+Instances that have not been leased for `idletimeout` seconds are evicted:
+They lose their project binding and are the first candidates for the next
+project that is requested. The sessions themselves simply expire on the server.
+"""
+import threading
+import time
+from . import clientservice
+
+__author__ = 'Michael Krotky'
+
+
+class SessionPool:
+    """Leases project bound 'ClientService' instances.
+
+    See the doc string of this module for more info.
+    """
+
+    def __init__(self, customerid, credentials, idletimeout=10 * 60, **serviceargs):
+        """Constructor. Doesn't send any requests to the server.
+
+        `customerid` (str) - unique id of your Medasto account.
+
+        `credentials` (list) - tuples (username, password). Each user must be
+        assigned to the service group "ROLESERVICE_API" and should be used by
+        this pool only.
+
+        `idletimeout` (float) - seconds after which an instance without leases
+        loses its project binding. None disables the eviction.
+
+        `serviceargs` - further keyword arguments for the constructor of
+        'ClientService' (for example `waitaftererror` or `sessionkeepalive`).
+        """
+        if len(credentials) == 0:
+            raise Exception("At least one pair of credentials is required.")
+        self.customerid = customerid
+        self.idletimeout = idletimeout
+        self._serviceargs = serviceargs
+        self._slots = [_Slot(username, password) for username, password in credentials]
+        self._condition = threading.Condition()
+        self._closed = False
+
+    def project(self, projectid, timeout=None):
+        """Context manager leasing a 'ClientService' bound to `projectid`.
+
+            with pool.project(project_id) as medservice:
+                ..
+
+        If `projectid` is None then any instance is returned. This is useful
+        for calls that don't depend on a project like .get_project_list().
+
+        See acquire(..) for the `timeout`.
+        """
+        return _Lease(self, projectid, timeout)
+
+    def acquire(self, projectid, timeout=None):
+        """Returns a 'ClientService' with `projectid` selected.
+
+        Every acquire(..) must be followed by a release(..) of the returned
+        instance. Prefer the context manager project(..).
+
+        Blocks until an instance is available. If a `timeout` (seconds) is given
+        and no instance became available within that time a TimeoutError is
+        raised. Errors while creating the 'ClientService' or while selecting the
+        project are raised as they are.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise Exception("The SessionPool has been closed.")
+                self._evict_idle_locked()
+                slot = self._find_slot_locked(projectid)
+                if slot is not None:
+                    slot.leases += 1
+                    slot.lastused = time.monotonic()
+                    if slot.service is not None and (projectid is None or slot.projectid == projectid):
+                        return slot.service
+                    # the slot must be set up (or switched) outside of the lock..
+                    slot.preparing = True
+                    slot.target = projectid
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError("No session available for project " + str(projectid) + ".")
+                self._condition.wait(remaining)
+
+        try:
+            if slot.service is None:
+                slot.service = clientservice.ClientService(
+                    self.customerid, slot.username, slot.password, **self._serviceargs)
+            if projectid is not None and slot.projectid != projectid:
+                slot.projectid = None
+                slot.service.select_project(projectid)
+                slot.projectid = projectid
+        except:
+            with self._condition:
+                slot.leases -= 1
+                slot.preparing = False
+                self._condition.notify_all()
+            raise
+        with self._condition:
+            slot.preparing = False
+            self._condition.notify_all()
+        return slot.service
+
+    def release(self, service):
+        """Returns a 'ClientService' obtained with acquire(..) to the pool. """
+        with self._condition:
+            for slot in self._slots:
+                if slot.service is service and slot.leases > 0:
+                    slot.leases -= 1
+                    slot.lastused = time.monotonic()
+                    self._condition.notify_all()
+                    return
+        raise Exception("The given service doesn't belong to this pool or isn't leased.")
+
+    def evict_idle(self):
+        """Removes the project binding of all instances idle for more than `idletimeout` seconds.
+
+        This happens automatically with each acquire(..). Returns the number of
+        evicted instances.
+        """
+        with self._condition:
+            return self._evict_idle_locked()
+
+    def stats(self):
+        """Returns a list with one dict per credentials:
+
+        {'username': str, 'projectid': int or None, 'leases': int, 'idle': seconds or None}
+        """
+        now = time.monotonic()
+        with self._condition:
+            return [{'username': slot.username, 'projectid': slot.projectid, 'leases': slot.leases,
+                     'idle': None if slot.leases > 0 or slot.service is None else now - slot.lastused}
+                    for slot in self._slots]
+
+    def close(self):
+        """Closes all 'ClientService' instances. Active leases stay usable until they are released. """
+        with self._condition:
+            self._closed = True
+            services = [slot.service for slot in self._slots if slot.service is not None]
+            self._condition.notify_all()
+        for service in services:
+            service.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _find_slot_locked(self, projectid):
+        """Returns the best slot for `projectid` or None if all slots are busy. """
+        idle_bound_other = []
+        unbound = []
+        for slot in self._slots:
+            if slot.preparing:
+                if projectid is not None and slot.target == projectid:
+                    return None  # wait for the slot being set up for the same project
+                continue
+            if slot.service is not None and (projectid is None or slot.projectid == projectid):
+                return slot  # warm instance (possibly shared with other leases)
+            if slot.leases == 0:
+                if slot.service is None or slot.projectid is None:
+                    unbound.append(slot)
+                else:
+                    idle_bound_other.append(slot)
+        # prefer instances that already have a session..
+        unbound.sort(key=lambda slot: slot.service is None)
+        if len(unbound) > 0:
+            return unbound[0]
+        if len(idle_bound_other) > 0:
+            return min(idle_bound_other, key=lambda slot: slot.lastused)
+        return None
+
+    def _evict_idle_locked(self):
+        if self.idletimeout is None:
+            return 0
+        count = 0
+        now = time.monotonic()
+        for slot in self._slots:
+            if slot.leases == 0 and slot.projectid is not None and now - slot.lastused > self.idletimeout:
+                slot.projectid = None
+                count += 1
+        return count
+
+
+class _Slot:
+    """One pair of credentials and the 'ClientService' using it. """
+
+    def __init__(self, username, password):
+        self.username = username
+        self.password = password
+        self.service = None
+        self.projectid = None
+        self.leases = 0
+        self.lastused = time.monotonic()
+        self.preparing = False
+        self.target = None  # projectid while preparing
+
+
+class _Lease:
+
+    def __init__(self, pool, projectid, timeout):
+        self._pool = pool
+        self._projectid = projectid
+        self._timeout = timeout
+        self._service = None
+
+    def __enter__(self):
+        self._service = self._pool.acquire(self._projectid, self._timeout)
+        return self._service
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._pool.release(self._service)
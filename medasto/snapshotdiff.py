@@ -0,0 +1,271 @@
+"""Public module comparing two snapshots of a project.
+
+A 'Snapshot' keeps only the fields needed for the comparison (name, custom id,
+position, text containers and job status) of shotlists, stages, shots, assets
+and jobs, keyed by their ids. It can be saved to a file and loaded later:
+
+    snapshot = medasto.snapshotdiff.Snapshot()
+    snapshot.add_shotlists(medservice.get_shotlists(incl_stb_fields=True))
+    for shotlist in medservice.get_shotlists():
+        snapshot.add_stages(medservice.get_stages(shotlist.shotlist_id, incl_stb_fields=True))
+        snapshot.add_shots(medservice.iter_shots_from_shotlist(shotlist.shotlist_id, incl_stb_fields=True))
+    snapshot.add_assets(medservice.iter_asset_list())
+    snapshot.add_shotjob(shot_id, medservice.get_shotjob(..))
+    snapshot.save("/reports/2026-10-18.snapshot.gz")
+
+    yesterday = medasto.snapshotdiff.Snapshot.load("/reports/2026-10-17.snapshot.gz")
+    for change in medasto.snapshotdiff.diff(yesterday, snapshot):
+        print(change)
+
+diff(..) is a generator yielding one 'Change' per difference (see the CHANGE_*
+constants). Each item of both snapshots is looked up once by its id. So the
+comparison takes linear time no matter how many items there are.
+
+Moves: An item is reported as moved if its parent has changed (a shot moved to
+another stage) or if its order relative to the other items of the same parent
+has changed. Items that only shifted because others were added or removed are
+not reported. If items were reordered the smallest set of items explaining the
+new order is reported (O(n log n) for the reordered parents only).
+
+The items should be added in the order of the getters. Text containers are only
+compared if both snapshots contain them (`incl_stb_fields`=True).
+"""
+import bisect
+import gzip
+import json
+
+from . import domain
+
+__author__ = 'Michael Krotky'
+
+ITEM_SHOTLIST = 'shotlist'
+ITEM_STAGE = 'stage'
+ITEM_SHOT = 'shot'
+ITEM_ASSET = 'asset'
+ITEM_JOB = 'job'  # the id of a job is (ITEM_SHOT or ITEM_ASSET, shot/asset id, jobdef id)
+
+CHANGE_ADDED = 'added'  # `new` is the name of the item.
+CHANGE_REMOVED = 'removed'  # `old` is the name of the item.
+CHANGE_MOVED = 'moved'  # `old`/`new` are tuple(parent id, position).
+CHANGE_RENAMED = 'renamed'  # `old`/`new` are the names.
+CHANGE_CUSTOMID_CHANGED = 'customid_changed'  # `old`/`new` are the custom ids.
+CHANGE_TEXT_CHANGED = 'text_changed'  # `detail` is the textcontainer id, `old`/`new` the texts.
+CHANGE_JOBSTATUS_CHANGED = 'jobstatus_changed'  # `old`/`new` are the status ids of the job.
+
+_FORMAT = 'medasto-snapshot'
+_VERSION = 1
+
+# fields of a record
+_PARENT = 0
+_POSITION = 1
+_NAME = 2
+_CUSTOMID = 3
+_TEXTS = 4
+_STATUS = 5
+
+
+class Change:
+    """A single difference between two snapshots.
+
+    Fields:
+
+    `kind` (str) - one of the CHANGE_* constants.
+    `itemtype` (str) - one of the ITEM_* constants.
+    `itemid` - the id of the item (int, a tuple for jobs).
+    `old`, `new` - previous and current value (see the CHANGE_* constants).
+    `detail` - the textcontainer id for CHANGE_TEXT_CHANGED, otherwise None.
+    """
+
+    __slots__ = ('kind', 'itemtype', 'itemid', 'old', 'new', 'detail')
+
+    def __init__(self, kind, itemtype, itemid, old=None, new=None, detail=None):
+        self.kind = kind
+        self.itemtype = itemtype
+        self.itemid = itemid
+        self.old = old
+        self.new = new
+        self.detail = detail
+
+    def to_list(self):
+        """Returns the fields as list (suitable for json.dumps(..)). """
+        return [self.kind, self.itemtype, self.itemid, self.old, self.new, self.detail]
+
+    def __str__(self):
+        return domain._tostring('Change',
+                                'kind', self.kind,
+                                'itemtype', self.itemtype,
+                                'itemid', self.itemid,
+                                'old', self.old,
+                                'new', self.new,
+                                'detail', self.detail)
+
+
+class Snapshot:
+    """The comparable fields of shotlists, stages, shots, assets and jobs keyed by id. """
+
+    def __init__(self):
+        self._records = {}  # key: tuple(itemtype, itemid), value: tuple(parent, position, name, customid, texts, status)
+
+    def add_shotlists(self, shotlists):
+        """Adds the 'ShotList' objects (iterable). """
+        for shotlist in shotlists:
+            self._add(ITEM_SHOTLIST, shotlist.shotlist_id, None, shotlist.shotlist_position, shotlist.shotlist_name,
+                      shotlist.shotlist_shortname, shotlist.textcontainers)
+
+    def add_stages(self, stages):
+        """Adds the 'Stage' objects (iterable). Their parent is the shotlist. """
+        for stage in stages:
+            self._add(ITEM_STAGE, stage.stage_id, stage.shotlist_id, stage.stage_position, stage.stage_name,
+                      stage.custom_stage_id, stage.textcontainers)
+
+    def add_shots(self, shots):
+        """Adds the 'Shot' objects (iterable, for example iter_shots_from_shotlist(..)). Their parent is the stage. """
+        for shot in shots:
+            self._add(ITEM_SHOT, shot.shot_id, shot.stage_id, shot.shot_position, shot.shot_name,
+                      shot.custom_shot_id, shot.textcontainers)
+
+    def add_assets(self, assets):
+        """Adds the asset dicts (iterable, see get_asset_list(..)). Their parent is the asset list. """
+        for asset in assets:
+            self._add(ITEM_ASSET, asset['id'], asset['assetListId'], None, asset['name'], asset['customId'])
+
+    def add_shotjob(self, shot_id, job):
+        """Adds the 'Job' of the shot. Only its name and status are kept. """
+        self._add_job(ITEM_SHOT, shot_id, job)
+
+    def add_assetjob(self, asset_id, job):
+        """Adds the 'Job' of the asset. Only its name and status are kept. """
+        self._add_job(ITEM_ASSET, asset_id, job)
+
+    def save(self, path):
+        """Writes the snapshot to the file (JSON lines, gzip compressed if the path ends with '.gz'). """
+        with _open(path, 'wt') as file:
+            file.write(json.dumps({'format': _FORMAT, 'version': _VERSION}) + '\n')
+            for (itemtype, itemid), record in self._records.items():
+                file.write(json.dumps([itemtype, itemid] + list(record), separators=(',', ':')) + '\n')
+
+    @classmethod
+    def load(cls, path):
+        """Returns the snapshot read from the file written by save(..). """
+        snapshot = cls()
+        with _open(path, 'rt') as file:
+            header = json.loads(file.readline() or 'null')
+            if not isinstance(header, dict) or header.get('format') != _FORMAT:
+                raise Exception("'" + path + "' is not a snapshot file.")
+            if header.get('version') != _VERSION:
+                raise Exception("Unsupported snapshot version " + str(header.get('version')) + " in '" + path + "'.")
+            for line in file:
+                itemtype, itemid, parent, position, name, customid, texts, status = json.loads(line)
+                if texts is not None:
+                    texts = {int(tcid): text for tcid, text in texts.items()}
+                snapshot._records[(itemtype, _tuple(itemid))] = (_tuple(parent), position, name, customid, texts,
+                                                                 status)
+        return snapshot
+
+    def __len__(self):
+        return len(self._records)
+
+    def __contains__(self, key):
+        """`key` is tuple(itemtype, itemid). """
+        return key in self._records
+
+    def _add_job(self, ownertype, owner_id, job):
+        self._add(ITEM_JOB, (ownertype, owner_id, job.jobdefinition.jobdefid), (ownertype, owner_id), None,
+                  job.jobdefinition.name, None, None, job.get_jobstatus_id())
+
+    def _add(self, itemtype, itemid, parent, position, name, customid, texts=None, status=None):
+        self._records[(itemtype, itemid)] = (parent, position, name, customid, texts, status)
+
+
+def diff(old, new):
+    """Generator yielding the 'Change's that lead from the 'Snapshot' `old` to the 'Snapshot' `new`.
+
+    The changes of each item come in the order of `new`. Then the moves and
+    finally the removed items follow.
+    """
+    oldrecords = old._records
+    siblings = {}  # key: tuple(itemtype, parent), value: list of (new position, old position, itemid)
+    for key, record in new._records.items():
+        itemtype, itemid = key
+        oldrecord = oldrecords.get(key)
+        if oldrecord is None:
+            yield Change(CHANGE_ADDED, itemtype, itemid, None, record[_NAME])
+            continue
+        if record[_NAME] != oldrecord[_NAME]:
+            yield Change(CHANGE_RENAMED, itemtype, itemid, oldrecord[_NAME], record[_NAME])
+        if record[_CUSTOMID] != oldrecord[_CUSTOMID]:
+            yield Change(CHANGE_CUSTOMID_CHANGED, itemtype, itemid, oldrecord[_CUSTOMID], record[_CUSTOMID])
+        if record[_TEXTS] is not None and oldrecord[_TEXTS] is not None and record[_TEXTS] != oldrecord[_TEXTS]:
+            yield from _diff_texts(itemtype, itemid, oldrecord[_TEXTS], record[_TEXTS])
+        if record[_STATUS] != oldrecord[_STATUS]:
+            yield Change(CHANGE_JOBSTATUS_CHANGED, itemtype, itemid, oldrecord[_STATUS], record[_STATUS])
+        if record[_PARENT] != oldrecord[_PARENT]:
+            yield _moved(itemtype, itemid, oldrecord, record)
+        elif record[_POSITION] is not None and oldrecord[_POSITION] is not None:
+            siblings.setdefault((itemtype, record[_PARENT]), []).append(
+                (record[_POSITION], oldrecord[_POSITION], itemid))
+
+    for (itemtype, _), items in siblings.items():
+        for itemid in _reordered(items):
+            yield _moved(itemtype, itemid, oldrecords[(itemtype, itemid)], new._records[(itemtype, itemid)])
+
+    newrecords = new._records
+    for key, oldrecord in oldrecords.items():
+        if key not in newrecords:
+            yield Change(CHANGE_REMOVED, key[0], key[1], oldrecord[_NAME], None)
+
+
+def _diff_texts(itemtype, itemid, oldtexts, newtexts):
+    for tcid, text in newtexts.items():
+        oldtext = oldtexts.get(tcid)
+        if text != oldtext:
+            yield Change(CHANGE_TEXT_CHANGED, itemtype, itemid, oldtext, text, tcid)
+    for tcid, oldtext in oldtexts.items():
+        if tcid not in newtexts and oldtext is not None:
+            yield Change(CHANGE_TEXT_CHANGED, itemtype, itemid, oldtext, None, tcid)
+
+
+def _moved(itemtype, itemid, oldrecord, record):
+    return Change(CHANGE_MOVED, itemtype, itemid, (oldrecord[_PARENT], oldrecord[_POSITION]),
+                  (record[_PARENT], record[_POSITION]))
+
+
+def _reordered(items):
+    """Returns the ids of the fewest items whose relative order has changed.
+
+    `items` - list of (new position, old position, itemid) of the items that kept their parent.
+    """
+    items.sort(key=lambda item: item[0])  # already ordered if added in the order of the getters -> linear
+    oldpositions = [item[1] for item in items]
+    if all(oldpositions[i] < oldpositions[i + 1] for i in range(len(oldpositions) - 1)):
+        return []
+    # all items outside the longest increasing subsequence of old positions have moved
+    tails = []  # tails[k]: old position ending the best subsequence of length k + 1
+    tailindices = []
+    predecessors = [None] * len(items)
+    for index, oldposition in enumerate(oldpositions):
+        k = bisect.bisect_left(tails, oldposition)
+        predecessors[index] = tailindices[k - 1] if k > 0 else None
+        if k == len(tails):
+            tails.append(oldposition)
+            tailindices.append(index)
+        else:
+            tails[k] = oldposition
+            tailindices[k] = index
+    kept = set()
+    index = tailindices[-1]
+    while index is not None:
+        kept.add(index)
+        index = predecessors[index]
+    return [item[2] for index, item in enumerate(items) if index not in kept]
+
+
+def _tuple(value):
+    """JSON turns tuples into lists. Returns lists as tuples again. """
+    return tuple(value) if isinstance(value, list) else value
+
+
+def _open(path, mode):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode, encoding='UTF-8')
+    return open(path, mode, encoding='UTF-8')
@@ -0,0 +1,476 @@
+"""Public module containing a persistent upload queue and the daemon draining it.
+
+Publishing a multi-GB file with update_shotjob_addappendage(..) and
+update_shotjob_uploadfile(..) blocks the caller until the last byte is on the
+server. With the 'UploadQueue' the publishing tool only records what shall be
+uploaded and returns immediately:
+
+    queue = medasto.uploadqueue.UploadQueue("/var/lib/medasto/uploadqueue.db")
+    item_id = queue.enqueue_shotjob(project_id, "/jobs/abc/sh010/comp_v003.mov", "comp v003", status_id,
+                                    shotlist_id=1, stage_id=2, shot_id=3, job_id=4)
+
+The queue is a SQLite file. So its state survives crashes and reboots and
+several processes (all publishing tools of a workstation) can share it. An
+'UploadDaemon' running in one process drains the queue:
+
+    pool = medasto.sessionpool.SessionPool("customerid", [('apiuser1', 'pw1'), ('apiuser2', 'pw2')])
+    daemon = medasto.uploadqueue.UploadDaemon(queue, pool, workers=2, maxuploadrate=50 * 1024 ** 2)
+    daemon.serve_forever()
+
+For each item the daemon adds the 'Appendage' (with the given message and
+status) and uploads the file, folder or image sequence. At most `workers`
+items are uploaded at the same time. The appendage id is stored as soon as the
+appendage exists. So a retry (or the next daemon after a crash) never adds a
+second appendage. Image sequences continue with the missing images. Single
+files and folders are sent again.
+
+Items failing with a connection problem (after the retries of the
+'ClientService' itself) are tried again up to `maxtries` times with growing
+pauses. Other errors (missing files, insufficient permissions, ..) fail the
+item right away. Failed items keep the error message and can be put back into
+the queue with requeue(..).
+
+The progress (bytes sent of the total bytes) is stored in the queue every
+`progressinterval` seconds. So the publishing tools can show it with
+get_item(..). The optional `progress` callback of the daemon receives the same
+information.
+
+Only one daemon may drain a queue at a time: On start the daemon puts items
+left in the state RUNNING by a crashed daemon back into the queue.
+"""
+import json
+import os
+import threading
+import time
+from . import _flowcontrol
+from . import _remoteservice
+from . import _sqlitedb
+from . import _transfer
+from . import constants
+from . import imageseq
+
+__author__ = 'Michael Krotky'
+
+STATE_QUEUED = 'queued'
+STATE_RUNNING = 'running'
+STATE_DONE = 'done'
+STATE_FAILED = 'failed'
+STATE_CANCELLED = 'cancelled'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    state TEXT NOT NULL,
+    projectid INTEGER NOT NULL,
+    scope TEXT NOT NULL,
+    target TEXT NOT NULL,
+    path TEXT NOT NULL,
+    appendage_type INTEGER NOT NULL,
+    msgtext TEXT NOT NULL,
+    statusid INTEGER NOT NULL,
+    create_preview INTEGER NOT NULL,
+    seqname TEXT,
+    fps REAL,
+    filenames TEXT,
+    appendage_id INTEGER,
+    uploadjob_id TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    notbefore REAL NOT NULL DEFAULT 0,
+    error TEXT,
+    bytes_total INTEGER,
+    bytes_sent INTEGER NOT NULL DEFAULT 0,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS items_state ON items (state, notbefore);
+"""
+
+
+class UploadQueue:
+    """Persistent queue of uploads. See the doc string of this module for more info. """
+
+    def __init__(self, path):
+        """`path` (str) - the SQLite file. It is created (including parent folders) if necessary. """
+        self.path = path
+        folderpath = os.path.dirname(os.path.abspath(path))
+        if not os.path.isdir(folderpath):
+            os.makedirs(folderpath)
+        with _sqlitedb.Connection(path) as connection:
+            connection.executescript(_SCHEMA)
+
+    def enqueue_shotjob(self, projectid, path, msgtext, statusid, create_preview=True, appendage_type=None,
+                        seqname=None, fps=None, filenames=None, shotlist_id=None, stage_id=None, shot_id=None,
+                        custom_shot_id=None, job_id=None, jobdef_id=None):
+        """Adds the upload of a new 'Appendage' of a shot 'Job' to the queue. Returns the item id.
+
+        `path` (str) - the file or folder to upload.
+
+        `msgtext` (str), `statusid` (int) - the 'Message' of the new 'Appendage'.
+
+        `appendage_type` (int) - one of the constants.APPENDAGETYPE_*. Defaults
+        to APPENDAGETYPE_FILE for files and APPENDAGETYPE_FOLDER for folders.
+        For APPENDAGETYPE_IMAGESEQ `path` is the folder with the images and
+        `fps` is required. `filenames` (list) defaults to the names of the only
+        image sequence in the folder (see imageseq.find_sequence(..)) and
+        `seqname` to its name.
+
+        See update_shotjob_addappendage(..) of 'ClientService' for the other
+        arguments.
+        """
+        if not ((shotlist_id is not None and stage_id is not None and shot_id is not None)
+                or custom_shot_id is not None):
+            raise Exception("Neither shotlist_id, stage_id and shot_id nor custom_shot_id is specified.")
+        target = dict(shotlist_id=shotlist_id, stage_id=stage_id, shot_id=shot_id, custom_shot_id=custom_shot_id,
+                      job_id=job_id, jobdef_id=jobdef_id)
+        return self._enqueue(projectid, 'shot', target, path, msgtext, statusid, create_preview, appendage_type,
+                             seqname, fps, filenames)
+
+    def enqueue_assetjob(self, projectid, path, msgtext, statusid, create_preview=True, appendage_type=None,
+                         seqname=None, fps=None, filenames=None, asset_list_id=None, asset_id=None,
+                         custom_asset_id=None, job_id=None, jobdef_id=None):
+        """Adds the upload of a new 'Appendage' of an asset 'Job' to the queue. Returns the item id.
+
+        See enqueue_shotjob(..) for the arguments.
+        """
+        if not ((asset_list_id is not None and asset_id is not None) or custom_asset_id is not None):
+            raise Exception("Neither asset_list_id and asset_id nor custom_asset_id is specified.")
+        target = dict(asset_list_id=asset_list_id, asset_id=asset_id, custom_asset_id=custom_asset_id,
+                      job_id=job_id, jobdef_id=jobdef_id)
+        return self._enqueue(projectid, 'asset', target, path, msgtext, statusid, create_preview, appendage_type,
+                             seqname, fps, filenames)
+
+    def get_item(self, item_id):
+        """Returns the item as dict or None.
+
+        Keys: 'id', 'state' (STATE_*), 'projectid', 'scope' ('shot' or 'asset'),
+        'target' (dict with the shot or asset ids and job_id/jobdef_id), 'path',
+        'appendage_type', 'msgtext', 'statusid', 'create_preview', 'seqname',
+        'fps', 'filenames', 'appendage_id' (None until the 'Appendage' exists),
+        'uploadjob_id', 'attempts', 'notbefore' (epoch seconds of the next
+        try), 'error', 'bytes_total', 'bytes_sent', 'created', 'updated'.
+        """
+        items = self._select("WHERE id = ?", (item_id,))
+        return items[0] if len(items) > 0 else None
+
+    def get_items(self, state=None):
+        """Returns all items (or the items in the given state) as dicts, oldest first. See get_item(..). """
+        if state is None:
+            return self._select("", ())
+        return self._select("WHERE state = ?", (state,))
+
+    def cancel(self, item_id):
+        """Cancels a queued item. Returns False if the item isn't queued (anymore). """
+        return self._transition(item_id, (STATE_QUEUED,), STATE_CANCELLED)
+
+    def requeue(self, item_id):
+        """Puts a failed or cancelled item back into the queue. Returns False if it is in another state. """
+        return self._transition(item_id, (STATE_FAILED, STATE_CANCELLED), STATE_QUEUED, attempts=0, notbefore=0,
+                                error=None)
+
+    def purge(self, olderthan=0):
+        """Removes the finished and cancelled items not updated for `olderthan` seconds. Returns their number. """
+        with _sqlitedb.Connection(self.path) as connection:
+            cursor = connection.execute("DELETE FROM items WHERE state IN (?, ?) AND updated <= ?",
+                                        (STATE_DONE, STATE_CANCELLED, time.time() - olderthan))
+            return cursor.rowcount
+
+    def _enqueue(self, projectid, scope, target, path, msgtext, statusid, create_preview, appendage_type,
+                 seqname, fps, filenames):
+        path = os.path.abspath(path)
+        if appendage_type is None:
+            appendage_type = constants.APPENDAGETYPE_FOLDER if os.path.isdir(path) else constants.APPENDAGETYPE_FILE
+        if appendage_type == constants.APPENDAGETYPE_FILE:
+            if not os.path.isfile(path):
+                raise Exception("Given path '" + path + "' does not exist or is not a file.")
+        elif not os.path.isdir(path):
+            raise Exception("Given path '" + path + "' does not exist or is not a folder.")
+        if appendage_type == constants.APPENDAGETYPE_IMAGESEQ:
+            if fps is None:
+                raise Exception("The fps must be specified for image sequences.")
+            if filenames is None:
+                sequence = imageseq.find_sequence(path)
+                filenames = sequence.filenames
+                if seqname is None:
+                    seqname = sequence.name
+            if seqname is None:
+                seqname = os.path.basename(path)
+        now = time.time()
+        with _sqlitedb.Connection(self.path) as connection:
+            cursor = connection.execute(
+                "INSERT INTO items (state, projectid, scope, target, path, appendage_type, msgtext, statusid, "
+                "create_preview, seqname, fps, filenames, created, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (STATE_QUEUED, projectid, scope, json.dumps(target), path, appendage_type, msgtext, statusid,
+                 int(create_preview), seqname, fps, None if filenames is None else json.dumps(filenames), now, now))
+            return cursor.lastrowid
+
+    def _claim(self):
+        """Marks the oldest due item as running and returns it. Returns None if no item is due. """
+        with _sqlitedb.Connection(self.path, immediate=True) as connection:
+            row = connection.execute(
+                "SELECT id FROM items WHERE state = ? AND notbefore <= ? ORDER BY id LIMIT 1",
+                (STATE_QUEUED, time.time())).fetchone()
+            if row is None:
+                return None
+            connection.execute("UPDATE items SET state = ?, attempts = attempts + 1, updated = ? WHERE id = ?",
+                               (STATE_RUNNING, time.time(), row[0]))
+        return self.get_item(row[0])
+
+    def _recover(self):
+        """Puts the items left RUNNING by a crashed daemon back into the queue. """
+        with _sqlitedb.Connection(self.path) as connection:
+            connection.execute("UPDATE items SET state = ?, updated = ? WHERE state = ?",
+                               (STATE_QUEUED, time.time(), STATE_RUNNING))
+
+    def _next_due(self):
+        """Returns the epoch seconds at which the next queued item is due or None. """
+        with _sqlitedb.Connection(self.path) as connection:
+            row = connection.execute("SELECT MIN(notbefore) FROM items WHERE state = ?",
+                                     (STATE_QUEUED,)).fetchone()
+        return row[0]
+
+    def _update(self, item_id, **columns):
+        columns['updated'] = time.time()
+        names = sorted(columns)
+        with _sqlitedb.Connection(self.path) as connection:
+            connection.execute("UPDATE items SET " + ", ".join(name + " = ?" for name in names) + " WHERE id = ?",
+                               [columns[name] for name in names] + [item_id])
+
+    def _transition(self, item_id, fromstates, tostate, **columns):
+        columns['state'] = tostate
+        columns['updated'] = time.time()
+        names = sorted(columns)
+        with _sqlitedb.Connection(self.path) as connection:
+            cursor = connection.execute(
+                "UPDATE items SET " + ", ".join(name + " = ?" for name in names) + " WHERE id = ? AND state IN ("
+                + ", ".join("?" for _ in fromstates) + ")",
+                [columns[name] for name in names] + [item_id] + list(fromstates))
+            return cursor.rowcount == 1
+
+    def _select(self, where, args):
+        with _sqlitedb.Connection(self.path) as connection:
+            cursor = connection.execute("SELECT * FROM items " + where + " ORDER BY id", args)
+            names = [description[0] for description in cursor.description]
+            rows = cursor.fetchall()
+        items = []
+        for row in rows:
+            item = dict(zip(names, row))
+            item['target'] = json.loads(item['target'])
+            item['create_preview'] = bool(item['create_preview'])
+            if item['filenames'] is not None:
+                item['filenames'] = json.loads(item['filenames'])
+            items.append(item)
+        return items
+
+
+class UploadDaemon:
+    """Drains an 'UploadQueue'. See the doc string of this module for more info. """
+
+    def __init__(self, queue, sessionpool, workers=2, maxtries=5, retrydelay=60.0, maxuploadrate=None,
+                 progress=None, progressinterval=1.0, pollinterval=2.0):
+        """Doesn't start any thread. See serve_forever() and start().
+
+        `queue` ('UploadQueue')
+
+        `sessionpool` ('sessionpool.SessionPool') - the sessions used for the uploads.
+
+        `workers` (int) - maximum number of items uploaded at the same time.
+
+        `maxtries` (int) - tries per item for connection problems.
+        `retrydelay` (float) - seconds before the second try. Doubles with each further try.
+
+        `maxuploadrate` (float) - bytes per second of all workers together. None means unlimited.
+
+        `progress` (callable) - called with the item (dict, see UploadQueue.get_item(..)) whenever
+        its state changes and at most every `progressinterval` seconds during the upload. It is
+        called by the worker threads and must not block.
+
+        `pollinterval` (float) - seconds between two looks into the queue when it is empty. Items
+        enqueued by other processes are noticed after at most this time.
+        """
+        self.queue = queue
+        self.workers = workers
+        self.maxtries = maxtries
+        self.retrydelay = retrydelay
+        self.progressinterval = progressinterval
+        self.pollinterval = pollinterval
+        self._pool = sessionpool
+        self._progress = progress
+        self._bucket = None if maxuploadrate is None else _flowcontrol.TokenBucket(maxuploadrate)
+        self._stop = threading.Event()
+        self._stopped = threading.Event()
+        self._stopped.set()
+        self._runlock = threading.Lock()
+        self._starting = False  # start() was called but its thread hasn't entered serve_forever() yet
+
+    def serve_forever(self):
+        """Uploads the queued items until shutdown() is called. Can be called again after shutdown().
+
+        Use start() if shutdown() might be called before this method runs.
+        """
+        with self._runlock:
+            if not self._starting:
+                self._stop.clear()  # a shutdown() of an earlier run. One pending since start() is kept.
+            self._starting = False
+            self._stopped.clear()
+        try:
+            self.queue._recover()
+            threads = [threading.Thread(target=self._work, name='medasto-upload-' + str(i), daemon=True)
+                       for i in range(self.workers)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            self._stopped.set()
+
+    def start(self):
+        """Runs serve_forever() in a daemon thread and returns that thread. """
+        with self._runlock:
+            self._starting = True
+            self._stop.clear()
+            self._stopped.clear()
+        thread = threading.Thread(target=self.serve_forever, name='medasto-uploaddaemon', daemon=True)
+        thread.start()
+        return thread
+
+    def shutdown(self):
+        """Stops taking new items and waits for the running uploads to finish. The sessionpool is NOT closed. """
+        self._stop.set()
+        self._stopped.wait()
+
+    def _work(self):
+        while not self._stop.is_set():
+            item = self.queue._claim()
+            if item is None:
+                self._stop.wait(self._idle_wait())
+                continue
+            self._report(item)
+            try:
+                self._upload(item)
+            except Exception as ex:
+                self._failed(item, ex)
+            else:
+                self.queue._update(item['id'], state=STATE_DONE, error=None)
+                self._report(self.queue.get_item(item['id']))
+
+    def _idle_wait(self):
+        nextdue = self.queue._next_due()
+        if nextdue is None:
+            return self.pollinterval
+        return max(0.0, min(self.pollinterval, nextdue - time.time()))
+
+    def _upload(self, item):
+        progress = _Progress(self, item)
+        with self._pool.project(item['projectid']) as service:
+            with service.progress(progress.transferred):
+                if item['appendage_id'] is None:
+                    item['appendage_id'] = self._add_appendage(service, item)
+                    self.queue._update(item['id'], appendage_id=item['appendage_id'])
+                self._send(service, item)
+        progress.flush()
+
+    def _add_appendage(self, service, item):
+        target = item['target']
+        if item['appendage_type'] == constants.APPENDAGETYPE_IMAGESEQ:
+            if item['scope'] == 'shot':
+                return service.update_shotjob_addappendage_imageseq(item['msgtext'], item['statusid'],
+                                                                    item['seqname'], item['fps'], **target)
+            return service.update_assetjob_addappendage_imageseq(item['msgtext'], item['statusid'], item['seqname'],
+                                                                 item['fps'], **target)
+        filename = os.path.basename(item['path'])
+        if item['scope'] == 'shot':
+            return service.update_shotjob_addappendage(item['appendage_type'], item['msgtext'], item['statusid'],
+                                                       filename, **target)
+        return service.update_assetjob_addappendage(item['appendage_type'], item['msgtext'], item['statusid'],
+                                                    filename, **target)
+
+    def _send(self, service, item):
+        target = item['target']
+        appendage_id = item['appendage_id']
+        if item['appendage_type'] == constants.APPENDAGETYPE_IMAGESEQ:
+            if item['uploadjob_id'] is None:
+                if item['scope'] == 'shot':
+                    uploadjob_id = service.update_shotjob_init_imageseq_upload(
+                        item['filenames'], item['create_preview'], appendage_id, **target)
+                else:
+                    uploadjob_id = service.update_assetjob_init_imageseq_upload(
+                        item['filenames'], item['create_preview'], appendage_id, **target)
+                item['uploadjob_id'] = uploadjob_id
+                self.queue._update(item['id'], uploadjob_id=uploadjob_id)
+            service.upload_imageseq_allfiles(item['uploadjob_id'], item['path'])
+        elif item['appendage_type'] == constants.APPENDAGETYPE_FOLDER:
+            if item['scope'] == 'shot':
+                service.update_shotjob_uploadfolder(item['path'], item['create_preview'], appendage_id, **target)
+            else:
+                service.update_assetjob_uploadfolder(item['path'], item['create_preview'], appendage_id, **target)
+        else:
+            if item['scope'] == 'shot':
+                service.update_shotjob_uploadfile(appendage_id, item['path'], item['create_preview'], **target)
+            else:
+                service.update_assetjob_uploadfile(appendage_id, item['path'], item['create_preview'], **target)
+
+    def _failed(self, item, ex):
+        error = type(ex).__name__ + ": " + str(ex)
+        if _is_transient(ex) and item['attempts'] < self.maxtries:
+            _remoteservice.RemoteService.logger.warning("Upload of queue item " + str(item['id']) + " failed. "
+                                                        "Trying again later.", exc_info=True)
+            notbefore = time.time() + self.retrydelay * 2 ** (item['attempts'] - 1)
+            self.queue._update(item['id'], state=STATE_QUEUED, error=error, notbefore=notbefore)
+        else:
+            _remoteservice.RemoteService.logger.error("Upload of queue item " + str(item['id']) + " failed.",
+                                                      exc_info=True)
+            self.queue._update(item['id'], state=STATE_FAILED, error=error)
+        self._report(self.queue.get_item(item['id']))
+
+    def _report(self, item):
+        if self._progress is not None:
+            try:
+                self._progress(item)
+            except Exception:
+                _remoteservice.RemoteService.logger.warning("Error in the progress callback.", exc_info=True)
+
+
+class _Progress:
+    """Counts the bytes of one item, applies the daemon's bandwidth limit and reports the progress. """
+
+    def __init__(self, daemon, item):
+        self._daemon = daemon
+        self._item = item
+        self._item['bytes_total'] = _total_size(item)
+        self._item['bytes_sent'] = 0
+        self._last = 0.0
+        daemon.queue._update(item['id'], bytes_total=item['bytes_total'], bytes_sent=0)
+
+    def transferred(self, direction, nbytes):
+        if direction != _transfer.UPLOAD:
+            return
+        if self._daemon._bucket is not None:
+            self._daemon._bucket.acquire(nbytes)
+        # retried transfers are counted again. So stay below the total.
+        self._item['bytes_sent'] = min(self._item['bytes_sent'] + nbytes, self._item['bytes_total'])
+        if time.monotonic() - self._last >= self._daemon.progressinterval:
+            self.flush()
+
+    def flush(self):
+        self._last = time.monotonic()
+        self._daemon.queue._update(self._item['id'], bytes_sent=self._item['bytes_sent'])
+        self._daemon._report(dict(self._item))
+
+
+def _total_size(item):
+    path = item['path']
+    if item['appendage_type'] == constants.APPENDAGETYPE_IMAGESEQ:
+        return sum(os.path.getsize(os.path.join(path, name)) for name in item['filenames'])
+    if item['appendage_type'] == constants.APPENDAGETYPE_FOLDER:
+        return sum(os.path.getsize(os.path.join(root, name)) for root, dirs, files in os.walk(path) for name in files)
+    return os.path.getsize(path)
+
+
+def _is_transient(ex):
+    """True if the upload might succeed when it is tried again later. """
+    if isinstance(ex, (_remoteservice.ConnectionMedEx, _remoteservice.UserSessionsExceededMedEx,
+                       _remoteservice.PleaseAuthenticateMedEx)):
+        return True
+    # status codes that aren't recognized (for example 503 while the server is restarted)
+    return type(ex) is _remoteservice.MedastoException
@@ -0,0 +1,324 @@
+"""Public module containing the 'JobWatcher' class.
+
+Reacting to changes of 'Job's (a supervisor adds a 'Message', an 'Appendage'
+gets a new status, ..) usually means fetching the jobs again and again. The
+'JobWatcher' does this in the background and reports what has changed:
+
+    def on_event(event):
+        if event.kind == medasto.watcher.EVENT_MESSAGE_ADDED:
+            print("New message on", event.key, ":", event.entry.msgtext)
+
+    jobwatcher = medasto.watcher.JobWatcher(medservice, on_event)
+    jobwatcher.watch_shotjob(shotlist_id=1, stage_id=2, shot_id=3, job_id=4)
+    jobwatcher.watch_assetjob(custom_asset_id="char_bob", jobdef_id=7)
+    jobwatcher.start()
+    ..
+    jobwatcher.shutdown()
+
+Adaptive intervals: Each job is polled at its own interval. A job that has
+changed is polled again after `mininterval` seconds. Each poll without a change
+multiplies the interval by `backoff` up to `maxinterval`. So recently active
+jobs are watched closely and dormant ones cost little.
+
+Spreading: New jobs start at random offsets within their first interval and
+each interval is varied by up to 10 percent. In addition at most `maxpollrate`
+polls per second are started. So watching thousands of jobs doesn't cause
+bursts of requests.
+
+Events: The first poll of a job only records it. Each following poll compares
+the fetched 'Job' with the previous one and calls the callback with one
+'JobEvent' per difference (see the EVENT_* constants). The callback is called
+by the polling threads. It should return quickly and must not modify the
+'Job's. Errors while polling are logged and the job is tried again after its
+current interval.
+
+Create the 'ClientService' with `conditionalgets`=True: An unchanged job then
+costs a 304 response and no decoding at all.
+"""
+import concurrent.futures
+import heapq
+import itertools
+import random
+import threading
+import time
+from . import _remoteservice
+from . import domain
+
+__author__ = 'Michael Krotky'
+
+EVENT_MESSAGE_ADDED = 'message_added'  # ..a GlobalMessage. `entry` is the 'Message'.
+EVENT_APPENDAGE_ADDED = 'appendage_added'  # `entry` is the 'Appendage'.
+EVENT_APPENDAGE_MESSAGE_ADDED = 'appendage_message_added'  # `entry` is the 'Appendage', `new` the 'Message'.
+EVENT_APPENDAGE_STATUS_CHANGED = 'appendage_status_changed'  # `entry` is the 'Appendage', `old`/`new` status ids.
+EVENT_FROZEN_CHANGED = 'frozen_changed'  # `entry` is the 'Appendage', `old`/`new` the isfrozen flags.
+EVENT_ONLINE_CHANGED = 'online_changed'  # `entry` is the 'Appendage', `old`/`new` the isonline flags.
+EVENT_ENTRY_REMOVED = 'entry_removed'  # `entry` is the removed 'Message' or 'Appendage' of the previous 'Job'.
+EVENT_JOB_STATUS_CHANGED = 'job_status_changed'  # `old`/`new` are the status ids of the 'Job'.
+
+
+class JobEvent:
+    """A single difference between two polls of a watched 'Job'.
+
+    Fields:
+
+    `kind` (str) - one of the EVENT_* constants.
+    `key` (tuple) - the key returned by watch_shotjob(..) or watch_assetjob(..).
+    `job` ('Job') - the newly fetched job.
+    `entry` ('Message' or 'Appendage') - the job entry concerned. None for EVENT_JOB_STATUS_CHANGED.
+    `old`, `new` - previous and current value (see the EVENT_* constants).
+    """
+
+    def __init__(self, kind, key, job, entry=None, old=None, new=None):
+        self.kind = kind
+        self.key = key
+        self.job = job
+        self.entry = entry
+        self.old = old
+        self.new = new
+
+    def __str__(self):
+        return domain._tostring('JobEvent',
+                                'kind', self.kind,
+                                'key', self.key,
+                                'old', self.old,
+                                'new', self.new)
+
+
+class JobWatcher:
+    """Polls 'Job's and reports their changes. See the doc string of this module for more info. """
+
+    def __init__(self, medservice, callback, mininterval=10.0, maxinterval=300.0, backoff=1.5, maxpollrate=10.0,
+                 workers=4):
+        """Doesn't start any thread. See serve_forever() and start().
+
+        `medservice` ('ClientService') - with the project of the jobs selected.
+
+        `callback` (callable) - called with each 'JobEvent'.
+
+        `mininterval`, `maxinterval` (float) - seconds between two polls of the same job.
+        `backoff` (float) - factor applied to the interval after each poll without a change.
+
+        `maxpollrate` (float) - maximum number of polls started per second.
+        `workers` (int) - maximum number of polls at the same time.
+        """
+        self.medservice = medservice
+        self.callback = callback
+        self.mininterval = mininterval
+        self.maxinterval = maxinterval
+        self.backoff = backoff
+        self.maxpollrate = maxpollrate
+        self.workers = workers
+        self._jobs = {}  # key: watch key, value: '_WatchedJob'
+        self._schedule = []  # heap of (due, sequence, key, '_WatchedJob')
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._stop = threading.Event()
+        self._stopped = threading.Event()
+        self._stopped.set()
+        self._runlock = threading.Lock()
+        self._starting = False  # start() was called but its thread hasn't entered serve_forever() yet
+
+    def watch_shotjob(self, shotlist_id=None, stage_id=None, shot_id=None, custom_shot_id=None, job_id=None,
+                      jobdef_id=None):
+        """Starts watching the job. Returns its key. The arguments are the same as for get_shotjob(..). """
+        if not ((shotlist_id is not None and stage_id is not None and shot_id is not None)
+                or custom_shot_id is not None):
+            raise Exception("Neither shotlist_id, stage_id and shot_id nor custom_shot_id is specified.")
+        return self._watch(('shot', shotlist_id, stage_id, shot_id, custom_shot_id, job_id, jobdef_id),
+                           dict(shotlist_id=shotlist_id, stage_id=stage_id, shot_id=shot_id,
+                                custom_shot_id=custom_shot_id, job_id=job_id, jobdef_id=jobdef_id))
+
+    def watch_assetjob(self, asset_list_id=None, asset_id=None, custom_asset_id=None, job_id=None, jobdef_id=None):
+        """Starts watching the job. Returns its key. The arguments are the same as for get_assetjob(..). """
+        if not ((asset_list_id is not None and asset_id is not None) or custom_asset_id is not None):
+            raise Exception("Neither asset_list_id and asset_id nor custom_asset_id is specified.")
+        return self._watch(('asset', asset_list_id, asset_id, custom_asset_id, job_id, jobdef_id),
+                           dict(asset_list_id=asset_list_id, asset_id=asset_id, custom_asset_id=custom_asset_id,
+                                job_id=job_id, jobdef_id=jobdef_id))
+
+    def unwatch(self, key):
+        """Stops watching the job with the given key. A poll in progress still reports its events. """
+        with self._condition:
+            if self._jobs.pop(key, None) is not None:
+                self._schedule = [entry for entry in self._schedule if entry[2] != key]
+                heapq.heapify(self._schedule)
+
+    def watched(self):
+        """Returns the keys of all watched jobs. """
+        with self._condition:
+            return list(self._jobs)
+
+    def get_job(self, key):
+        """Returns the last fetched 'Job' of the given key or None. """
+        with self._condition:
+            watched = self._jobs.get(key)
+        return None if watched is None else watched.job
+
+    def serve_forever(self):
+        """Polls the watched jobs until shutdown() is called. Can be called again after shutdown().
+
+        Use start() if shutdown() might be called before this method runs.
+        """
+        with self._runlock:
+            if not self._starting:
+                self._stop.clear()  # a shutdown() of an earlier run. One pending since start() is kept.
+            self._starting = False
+            self._stopped.clear()
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.workers,
+                                                         thread_name_prefix='medasto-jobwatcher')
+        try:
+            lastpoll = 0.0
+            while not self._stop.is_set():
+                due = self._next_due()
+                if due is None:
+                    continue
+                key, watched = due
+                if self.maxpollrate is not None:
+                    pause = lastpoll + 1.0 / self.maxpollrate - time.monotonic()
+                    if pause > 0 and self._stop.wait(pause):
+                        self._reschedule(key, watched, 0.0)
+                        break
+                lastpoll = time.monotonic()
+                executor.submit(self._poll, key, watched)
+        finally:
+            executor.shutdown()
+            self._stopped.set()
+
+    def start(self):
+        """Runs serve_forever() in a daemon thread and returns that thread. """
+        with self._runlock:
+            self._starting = True
+            self._stop.clear()
+            self._stopped.clear()
+        thread = threading.Thread(target=self.serve_forever, name='medasto-jobwatcher', daemon=True)
+        thread.start()
+        return thread
+
+    def shutdown(self):
+        """Stops polling and waits for the polls in progress. """
+        self._stop.set()
+        with self._condition:
+            self._condition.notify_all()
+        self._stopped.wait()
+
+    def _watch(self, key, args):
+        with self._condition:
+            if key not in self._jobs:
+                watched = self._jobs[key] = _WatchedJob(args, self.mininterval)
+                self._push(key, watched, time.monotonic() + random.uniform(0.0, self.mininterval))
+                self._condition.notify_all()
+        return key
+
+    def _next_due(self):
+        """Waits for the next due job and returns (key, '_WatchedJob'). Returns None if woken up early. """
+        with self._condition:
+            if self._stop.is_set():
+                return None
+            if not self._schedule:
+                self._condition.wait()
+                return None
+            due, sequence, key, watched = self._schedule[0]
+            wait = due - time.monotonic()
+            if wait > 0:
+                self._condition.wait(wait)
+                return None
+            heapq.heappop(self._schedule)
+            if self._jobs.get(key) is not watched:
+                return None  # unwatched (and maybe watched again) in the meantime
+            return key, watched
+
+    def _poll(self, key, watched):
+        with self._condition:
+            if self._jobs.get(key) is not watched:
+                return
+        try:
+            if key[0] == 'shot':
+                job = self.medservice.get_shotjob(**watched.args)
+            else:
+                job = self.medservice.get_assetjob(**watched.args)
+        except Exception:
+            _remoteservice.RemoteService.logger.warning("Error while polling the job " + str(key) + ".",
+                                                        exc_info=True)
+            self._reschedule(key, watched, watched.interval)
+            return
+
+        previous, watched.job = watched.job, job
+        events = [] if previous is None or previous is job else diff_jobs(previous, job, key)
+        if events:
+            watched.interval = self.mininterval
+        elif previous is not None:
+            watched.interval = min(self.maxinterval, watched.interval * self.backoff)
+        self._reschedule(key, watched, watched.interval)
+        for event in events:
+            try:
+                self.callback(event)
+            except Exception:
+                _remoteservice.RemoteService.logger.warning("Error in the callback of the JobWatcher.",
+                                                            exc_info=True)
+
+    def _reschedule(self, key, watched, interval):
+        with self._condition:
+            # a poll that was running while the key got unwatched and watched again must not add a second entry
+            if self._jobs.get(key) is watched:
+                self._push(key, watched, time.monotonic() + interval * random.uniform(0.9, 1.1))
+                self._condition.notify_all()
+
+    def _push(self, key, watched, due):
+        heapq.heappush(self._schedule, (due, next(self._sequence), key, watched))
+
+
+class _WatchedJob:
+
+    def __init__(self, args, interval):
+        self.args = args
+        self.interval = interval
+        self.job = None
+
+
+def diff_jobs(old, new, key=None):
+    """Returns the list of 'JobEvent's that lead from the 'Job' `old` to the 'Job' `new`. """
+    events = []
+    oldmessages = {}
+    oldappendages = {}
+    for entry in old.entry_list:
+        if isinstance(entry, domain.Appendage):
+            oldappendages[entry.appendageid] = entry
+        else:
+            oldmessages[entry.msgid] = entry
+
+    for entry in new.entry_list:
+        if isinstance(entry, domain.Appendage):
+            oldappendage = oldappendages.pop(entry.appendageid, None)
+            if oldappendage is None:
+                events.append(JobEvent(EVENT_APPENDAGE_ADDED, key, new, entry))
+            else:
+                events.extend(_diff_appendage(oldappendage, entry, new, key))
+        elif oldmessages.pop(entry.msgid, None) is None:
+            events.append(JobEvent(EVENT_MESSAGE_ADDED, key, new, entry))
+
+    for entry in old.entry_list:
+        removed = oldappendages if isinstance(entry, domain.Appendage) else oldmessages
+        if (entry.appendageid if isinstance(entry, domain.Appendage) else entry.msgid) in removed:
+            events.append(JobEvent(EVENT_ENTRY_REMOVED, key, new, entry))
+
+    oldstatus = old.get_jobstatus_id()
+    newstatus = new.get_jobstatus_id()
+    if oldstatus != newstatus:
+        events.append(JobEvent(EVENT_JOB_STATUS_CHANGED, key, new, None, oldstatus, newstatus))
+    return events
+
+
+def _diff_appendage(old, new, job, key):
+    events = []
+    oldmsgids = {message.msgid for message in old.msg_list}
+    for message in new.msg_list:
+        if message.msgid not in oldmsgids:
+            events.append(JobEvent(EVENT_APPENDAGE_MESSAGE_ADDED, key, job, new, None, message))
+    if old.get_status_id() != new.get_status_id():
+        events.append(JobEvent(EVENT_APPENDAGE_STATUS_CHANGED, key, job, new, old.get_status_id(),
+                               new.get_status_id()))
+    if old.isfrozen != new.isfrozen:
+        events.append(JobEvent(EVENT_FROZEN_CHANGED, key, job, new, old.isfrozen, new.isfrozen))
+    if old.isonline != new.isonline:
+        events.append(JobEvent(EVENT_ONLINE_CHANGED, key, job, new, old.isonline, new.isonline))
+    return events
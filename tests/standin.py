@@ -0,0 +1,200 @@
+"""A local stand-in for the Medasto server used by the tests and benchmarks.
+
+The 'StandInServer' answers the redirect lookup (plain HTTP) and the API
+requests (HTTPS with a self signed certificate created by the openssl command
+line tool). Logins are always accepted. All other requests are answered by the
+handler functions registered with route(..):
+
+    with standin.StandInServer() as server:
+        server.route(r'^project-list', lambda request: (200, {}, b'[]'))
+        medservice = server.client_service()
+
+The client only speaks TLS 1.0 (see RemoteService._connection) which current
+OpenSSL versions refuse. While a server is running the client uses the
+protocol negotiation of the ssl module instead.
+"""
+import gzip
+import http.server
+import os
+import re
+import shutil
+import socketserver
+import ssl
+import subprocess
+import tempfile
+import threading
+import unittest.mock
+
+from medasto import _remoteservice
+from medasto import clientservice
+
+CUSTOMERID = 'standin'
+
+
+class Request:
+    """A received API request. `rel` is the url relative to the API context, `body` the decompressed body. """
+
+    def __init__(self, method, rel, headers, body, wirelength):
+        self.method = method
+        self.rel = rel
+        self.headers = headers
+        self.body = body
+        self.wirelength = wirelength
+
+
+class StandInServer:
+
+    def __init__(self, gzip_responses=False, refuse_gzip_requests=False):
+        """
+        `gzip_responses` (bool) - compress responses if the client accepts gzip.
+        `refuse_gzip_requests` (bool) - answer compressed request bodies with 415.
+        """
+        self.gzip_responses = gzip_responses
+        self.refuse_gzip_requests = refuse_gzip_requests
+        self.requests = []
+        self._routes = []
+        self._tmpdir = None
+        self._servers = []
+        self._patches = []
+        self._truncate = None
+
+    def route(self, pattern, handler):
+        """`handler` is called with each 'Request' whose `rel` matches the regular expression `pattern`
+        (re.search) and returns (status, headers dict, body bytes). Later routes take precedence.
+        """
+        self._routes.insert(0, (re.compile(pattern), handler))
+
+    def truncate_next(self, nbytes):
+        """Cuts the body of the next API response off after `nbytes` bytes on the wire and closes the connection.
+        The Content-Length header still announces the whole body.
+        """
+        self._truncate = nbytes
+
+    def start(self):
+        """Starts both servers. Raises OSError if the openssl command line tool is missing. """
+        if shutil.which('openssl') is None:
+            raise OSError("The openssl command line tool is needed for the certificate.")
+        self._tmpdir = tempfile.mkdtemp(prefix='medasto-standin-')
+        certpath = os.path.join(self._tmpdir, 'cert.pem')
+        keypath = os.path.join(self._tmpdir, 'key.pem')
+        subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1', '-subj',
+                        '/CN=localhost', '-keyout', keypath, '-out', certpath],
+                       check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(certpath, keypath)
+
+        api = _Server(('127.0.0.1', 0), _ApiHandler)
+        api.standin = self
+        api.socket = context.wrap_socket(api.socket, server_side=True)
+        redirect = _Server(('127.0.0.1', 0), _RedirectHandler)
+        redirect.apiaddress = '127.0.0.1:%d' % api.server_address[1]
+        self._servers = [api, redirect]
+        for server in self._servers:
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        self._patches = [
+            unittest.mock.patch.object(_remoteservice.RemoteService, '_REDIRECT_URL',
+                                       '127.0.0.1:%d' % redirect.server_address[1]),
+            unittest.mock.patch.object(_remoteservice.ssl, 'PROTOCOL_TLSv1', ssl.PROTOCOL_TLS)]
+        for patch in self._patches:
+            patch.start()
+        return self
+
+    def stop(self):
+        for patch in reversed(self._patches):
+            patch.stop()
+        for server in self._servers:
+            server.shutdown()
+            server.server_close()
+        self._patches = []
+        self._servers = []
+        if self._tmpdir is not None:
+            shutil.rmtree(self._tmpdir, ignore_errors=True)
+            self._tmpdir = None
+
+    def client_service(self, **kwargs):
+        """Returns a 'ClientService' logged in to this server. """
+        kwargs.setdefault('waitaftererror', 0)
+        return clientservice.ClientService(CUSTOMERID, 'user', 'password', **kwargs)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def _handle(self, request):
+        self.requests.append(request)
+        for pattern, handler in self._routes:
+            if pattern.search(request.rel):
+                return handler(request)
+        return 200, {}, b''
+
+
+class _Server(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+
+class _RedirectHandler(http.server.BaseHTTPRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        body = (self.server.apiaddress + '/').encode('UTF-8')
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class _ApiHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def handle_request(self):
+        standin = self.server.standin
+        body = self._read_body()
+        wirelength = len(body)
+        if self.headers.get('Content-Encoding') == 'gzip':
+            if standin.refuse_gzip_requests:
+                return self._send(415, {}, b'')
+            body = gzip.decompress(body)
+        if self.headers.get('Authorization', '').startswith('AuthRequest'):
+            return self._send(260, {'SessionId': 'S1', 'UserId': '1'}, b'')
+        prefix = '/' + CUSTOMERID + '/' + _remoteservice.RemoteService._API_CONTEXT + '/'
+        rel = self.path[len(prefix):] if self.path.startswith(prefix) else self.path
+        status, headers, content = standin._handle(Request(self.command, rel, self.headers, body, wirelength))
+        if (standin.gzip_responses and content
+                and 'gzip' in (self.headers.get('Accept-Encoding') or '')):
+            content = gzip.compress(content)
+            headers = dict(headers, **{'Content-Encoding': 'gzip'})
+        self._send(status, headers, content)
+
+    do_GET = do_POST = do_PUT = do_DELETE = handle_request
+
+    def _read_body(self):
+        if self.headers.get('Transfer-Encoding') == 'chunked':
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().strip(), 16)
+                if size == 0:
+                    self.rfile.readline()
+                    return b''.join(chunks)
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+        return self.rfile.read(int(self.headers.get('Content-Length') or 0))
+
+    def _send(self, status, headers, content):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        truncate, self.server.standin._truncate = self.server.standin._truncate, None
+        if truncate is not None:
+            content = content[:truncate]
+            self.close_connection = True
+        self.wfile.write(content)
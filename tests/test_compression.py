@@ -0,0 +1,88 @@
+import gzip
+import io
+import json
+import unittest
+
+from tests import standin
+
+_BLOB = bytes(range(256)) * 4096
+_JSONLIST = [{'id': i, 'name': 'Projekt %d – Übersicht' % i} for i in range(500)]
+
+
+class CompressionTest(unittest.TestCase):
+
+    def start_server(self, **kwargs):
+        server = standin.StandInServer(**kwargs)
+        try:
+            server.start()
+        except OSError as ex:
+            self.skipTest(str(ex))
+        self.addCleanup(server.stop)
+        server.route(r'^project-list', lambda request: (200, {}, json.dumps(_JSONLIST).encode('UTF-8')))
+        server.route(r'/dl/', lambda request: (200, {'Content-Type': 'application/octet-stream'}, _BLOB))
+        server.route(r'addMessage', lambda request: (200, {}, b''))
+        return server
+
+    def client_service(self, server, **kwargs):
+        medservice = server.client_service(**kwargs)
+        self.addCleanup(medservice.close)
+        medservice.select_project(1)
+        return medservice
+
+    def test_gzip_json_response(self):
+        server = self.start_server(gzip_responses=True)
+        medservice = self.client_service(server)
+        before = medservice.get_byte_stats()['received']
+        self.assertEqual(_JSONLIST, medservice.get_project_list())
+        self.assertEqual('gzip', server.requests[-1].headers.get('Accept-Encoding'))
+        after = medservice.get_byte_stats()['received']
+        logical = len(json.dumps(_JSONLIST).encode('UTF-8'))
+        self.assertEqual(logical, after['logical'] - before['logical'])
+        self.assertEqual(len(gzip.compress(json.dumps(_JSONLIST).encode('UTF-8'))),
+                         after['wire'] - before['wire'])
+
+    def test_gzip_download_resumes_after_truncation(self):
+        server = self.start_server(gzip_responses=True)
+        medservice = self.client_service(server)
+        server.truncate_next(len(gzip.compress(_BLOB)) // 2)
+        sink = io.BytesIO()
+        medservice.download_shotfile(sink, 1, 2, shotlist_id=1, stage_id=2, shot_id=3, job_id=4)
+        self.assertEqual(_BLOB, sink.getvalue())
+        self.assertEqual(2, len([request for request in server.requests if '/dl/' in request.rel]))
+
+    def test_refused_compression_falls_back_to_plain_body(self):
+        server = self.start_server(refuse_gzip_requests=True)
+        medservice = self.client_service(server, compressthreshold=16)
+        text = 'Freigabe erteilt. ' * 10
+        medservice.update_assetjob_addglobalmessage(text, 1, asset_list_id=1, asset_id=2, job_id=3)
+        # the refused request never reaches the handler, so only the plain retry is recorded
+        requests = [request for request in server.requests if 'addMessage' in request.rel]
+        self.assertEqual(1, len(requests))
+        self.assertIsNone(requests[0].headers.get('Content-Encoding'))
+        self.assertEqual(text, json.loads(requests[0].body.decode('UTF-8'))['text'])
+        self.assertIsNone(medservice._rmtservice.compress_threshold)
+
+    def test_sent_bytes_on_the_wire_and_logical(self):
+        server = self.start_server()
+        medservice = self.client_service(server, compressthreshold=16)
+        body = json.dumps({'text': 'Änderung übernommen. ' * 20}, ensure_ascii=False)
+        before = medservice.get_byte_stats()['sent']
+        medservice._rmtservice.request('assetList/1/asset/2/addMessage', method='PUT', body=body)
+        after = medservice.get_byte_stats()['sent']
+        request = server.requests[-1]
+        self.assertEqual('gzip', request.headers.get('Content-Encoding'))
+        self.assertEqual(body.encode('UTF-8'), request.body)
+        self.assertEqual(len(body.encode('UTF-8')), after['logical'] - before['logical'])
+        self.assertEqual(request.wirelength, after['wire'] - before['wire'])
+
+    def test_json_body_is_not_reported_as_upload(self):
+        server = self.start_server()
+        medservice = self.client_service(server, compressthreshold=16, maxuploadrate=1.0)
+        reports = []
+        with medservice.progress(lambda direction, nbytes: reports.append(direction)):
+            medservice.update_assetjob_addglobalmessage('x' * 200, 1, asset_list_id=1, asset_id=2, job_id=3)
+        self.assertEqual([], reports)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import threading
+import unittest
+
+from medasto import _flowcontrol
+from medasto import constants
+
+_TIMEOUT = 5.0
+
+
+def _acquire_in_thread(scheduler, priority):
+    """Returns True if scheduler.acquire(priority) returned within _TIMEOUT seconds. """
+    thread = threading.Thread(target=scheduler.acquire, args=(priority,), daemon=True)
+    thread.start()
+    thread.join(_TIMEOUT)
+    return not thread.is_alive()
+
+
+class PrioritySchedulerTest(unittest.TestCase):
+
+    def test_single_connection_serves_all_priorities(self):
+        for priority in _flowcontrol.PriorityScheduler.PRIORITIES:
+            scheduler = _flowcontrol.PriorityScheduler(1)
+            self.assertTrue(_acquire_in_thread(scheduler, priority))
+            scheduler.release(priority)
+
+    def test_defaults_leave_a_shared_connection(self):
+        for maxconnections in range(1, 20):
+            reserved = _flowcontrol.PriorityScheduler(maxconnections).reserved
+            self.assertLess(sum(reserved.values()), maxconnections)
+
+    def test_interactive_keeps_its_reserved_connection(self):
+        scheduler = _flowcontrol.PriorityScheduler(2)
+        self.assertTrue(_acquire_in_thread(scheduler, constants.PRIORITY_BULK))
+        self.assertTrue(_acquire_in_thread(scheduler, constants.PRIORITY_INTERACTIVE))
+
+    def test_reservation_without_shared_connection_is_rejected(self):
+        with self.assertRaises(ValueError):
+            _flowcontrol.PriorityScheduler(2, {constants.PRIORITY_INTERACTIVE: 2})
+        with self.assertRaises(ValueError):
+            _flowcontrol.PriorityScheduler(1, {constants.PRIORITY_NORMAL: 2})
+        with self.assertRaises(ValueError):
+            _flowcontrol.PriorityScheduler(0)
+
+    def test_full_reservation_of_every_priority_is_accepted(self):
+        scheduler = _flowcontrol.PriorityScheduler(3, {constants.PRIORITY_INTERACTIVE: 1,
+                                                       constants.PRIORITY_NORMAL: 1,
+                                                       constants.PRIORITY_BULK: 1})
+        for priority in scheduler.PRIORITIES:
+            self.assertTrue(_acquire_in_thread(scheduler, priority))
+
+
+def _in_thread(function):
+    """Returns True if function() returned within _TIMEOUT seconds. """
+    thread = threading.Thread(target=function, daemon=True)
+    thread.start()
+    thread.join(_TIMEOUT)
+    return not thread.is_alive()
+
+
+class FlowControllerTest(unittest.TestCase):
+
+    def _nested_requests(self, controller, streamed):
+        def run():
+            slot = controller.slot('GET', 'assetsICAll')
+            with slot:
+                if streamed:
+                    slot.response_started()
+                with controller.slot('GET', 'asset/1/job/2'):
+                    pass
+        return _in_thread(run)
+
+    def test_nested_request_with_one_shared_connection(self):
+        controller = _flowcontrol.FlowController(lambda ex: False, scheduler=_flowcontrol.PriorityScheduler(2))
+        self.assertTrue(self._nested_requests(controller, streamed=False))
+        self.assertEqual(0, controller.stats()['connections'][constants.PRIORITY_NORMAL]['inflight'])
+
+    def test_streamed_download_releases_the_concurrency_permit(self):
+        limit = _flowcontrol.AdaptiveConcurrencyLimit(initial=1, minimum=1)
+        controller = _flowcontrol.FlowController(lambda ex: False, concurrencylimit=limit)
+        self.assertTrue(self._nested_requests(controller, streamed=True))
+        self.assertEqual(0, limit.inflight)
+
+    def test_other_threads_still_wait_for_the_limit(self):
+        limit = _flowcontrol.AdaptiveConcurrencyLimit(initial=1, minimum=1)
+        controller = _flowcontrol.FlowController(lambda ex: False, concurrencylimit=limit)
+        entered = threading.Event()
+        with controller.slot('GET', 'shotList/1/shots'):
+            thread = threading.Thread(target=lambda: controller.slot('GET', 'x').__enter__() and entered.set(),
+                                      daemon=True)
+            thread.start()
+            self.assertFalse(entered.wait(0.2))
+        self.assertTrue(entered.wait(_TIMEOUT))
+
+
+if __name__ == '__main__':
+    unittest.main()
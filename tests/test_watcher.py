@@ -0,0 +1,59 @@
+import threading
+import unittest
+
+from medasto import watcher
+
+_TIMEOUT = 5.0
+
+
+class _FakeService:
+    """Returns the same job object for every poll and counts the polls per job id. """
+
+    def __init__(self):
+        self.polls = {}
+        self.polled = threading.Event()
+
+    def get_shotjob(self, **kwargs):
+        self.polls[kwargs['job_id']] = self.polls.get(kwargs['job_id'], 0) + 1
+        self.polled.set()
+        return self
+
+
+class JobWatcherTest(unittest.TestCase):
+
+    def test_rewatch_keeps_a_single_schedule_entry(self):
+        jobwatcher = watcher.JobWatcher(_FakeService(), lambda event: None)
+        key = jobwatcher.watch_shotjob(1, 2, 3, job_id=4)
+        jobwatcher.unwatch(key)
+        self.assertEqual([], jobwatcher._schedule)
+        jobwatcher.watch_shotjob(1, 2, 3, job_id=4)
+        self.assertEqual(1, len(jobwatcher._schedule))
+
+    def test_poll_of_an_unwatched_job_is_not_rescheduled(self):
+        service = _FakeService()
+        jobwatcher = watcher.JobWatcher(service, lambda event: None)
+        key = jobwatcher.watch_shotjob(1, 2, 3, job_id=4)
+        old = jobwatcher._jobs[key]
+        jobwatcher.unwatch(key)
+        jobwatcher.watch_shotjob(1, 2, 3, job_id=4)
+        # the poll was started before unwatch(). It must neither poll nor add an entry for the new watch.
+        jobwatcher._poll(key, old)
+        self.assertEqual({}, service.polls)
+        self.assertEqual(1, len(jobwatcher._schedule))
+
+    def test_serve_forever_after_shutdown(self):
+        service = _FakeService()
+        jobwatcher = watcher.JobWatcher(service, lambda event: None, mininterval=0.01, maxpollrate=None)
+        jobwatcher.start()
+        jobwatcher.shutdown()
+        jobwatcher.watch_shotjob(1, 2, 3, job_id=4)
+        thread = threading.Thread(target=jobwatcher.serve_forever, daemon=True)
+        thread.start()
+        self.assertTrue(service.polled.wait(_TIMEOUT))
+        jobwatcher.shutdown()
+        thread.join(_TIMEOUT)
+        self.assertFalse(thread.is_alive())
+
+
+if __name__ == '__main__':
+    unittest.main()